@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import os
+import time
+import tty
+from pathlib import Path
+
+import serial
+
+BAUD_RATE = 921600
+
+class BoardStream:
+    """
+    One board's serial port, read from the asyncio event loop.
+
+    The port is opened non-blocking and registered with loop.add_reader, so a
+    read only happens when the driver already holds bytes and never stalls the
+    other boards. Each chunk is timestamped on arrival, appended to the board's
+    raw stream file and a line of its chunk index, and put on the shared queue.
+    """
+
+    def __init__(self, name, port, baudrate=BAUD_RATE, out_dir=None):
+        """
+        Parameters:
+        - name (str): Label for the board, used for its output files.
+        - port (str): Serial device, e.g. /dev/ttyUSB1.
+        - baudrate (int): UART baud rate.
+        - out_dir (str or Path): Directory for <name>.bin and <name>.chunks.csv (default is not to write files).
+        """
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.out_dir = None if out_dir is None else Path(out_dir)
+        self.ser = None
+        self.queue = None
+        self.stream_file = None
+        self.index_file = None
+        self.bytes_received = 0
+        self.chunks_received = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def open(self, loop, queue):
+        self.queue = queue
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=0)
+        if self.out_dir is not None:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            self.stream_file = open(self.out_dir / f"{self.name}.bin", 'wb')
+            self.index_file = open(self.out_dir / f"{self.name}.chunks.csv", 'w')
+            self.index_file.write("offset,length,timestamp\n")
+        loop.add_reader(self.ser.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        timestamp = time.time()
+        data = self.ser.read(max(self.ser.in_waiting, 1))
+        if not data:
+            return
+
+        if self.stream_file is not None:
+            self.stream_file.write(data)
+            self.index_file.write(f"{self.bytes_received},{len(data)},{timestamp:.6f}\n")
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.bytes_received += len(data)
+        self.chunks_received += 1
+        self.queue.put_nowait((self.name, timestamp, data))
+
+    def close(self, loop):
+        if self.ser is not None:
+            loop.remove_reader(self.ser.fileno())
+            self.ser.close()
+        for f in (self.stream_file, self.index_file):
+            if f is not None:
+                f.close()
+
+    def stats(self):
+        """Return a dict of bytes, chunks and arrival-based throughput (bytes/s) for this board."""
+        span = (self.last_timestamp or 0) - (self.first_timestamp or 0)
+        return {
+            'bytes': self.bytes_received,
+            'chunks': self.chunks_received,
+            'throughput': self.bytes_received / span if span > 0 else 0.0,
+        }
+
+class MultiBoardCapture:
+    """
+    Concurrent capture from several FPGA boards in one process (POSIX only).
+
+    Usage:
+        async with MultiBoardCapture({'array_a': '/dev/ttyUSB1', 'array_b': '/dev/ttyUSB3'}, out_dir='session') as capture:
+            async for board, timestamp, data in capture:
+                ...
+    """
+
+    def __init__(self, ports, baudrate=BAUD_RATE, out_dir=None):
+        """
+        Parameters:
+        - ports (dict or list): Board name -> serial device, or a list of devices (named board_0, board_1, ...).
+        - baudrate (int): UART baud rate shared by all boards.
+        - out_dir (str or Path): Directory for the per-board stream files (default is not to write files).
+        """
+        if not isinstance(ports, dict):
+            ports = {f"board_{i}": port for i, port in enumerate(ports)}
+        self.boards = {name: BoardStream(name, port, baudrate, out_dir) for name, port in ports.items()}
+        self.queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        for board in self.boards.values():
+            board.open(loop, self.queue)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        loop = asyncio.get_running_loop()
+        for board in self.boards.values():
+            board.close(loop)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Return the next (board name, arrival timestamp, bytes) chunk from any board."""
+        return await self.queue.get()
+
+    async def record(self, duration):
+        """
+        Consume chunks from every board for duration seconds.
+
+        Parameters:
+        - duration (float): Recording length, in seconds.
+
+        Returns:
+        - dict: Board name -> stats dict (see BoardStream.stats).
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        while (remaining := end - loop.time()) > 0:
+            try:
+                await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return {name: board.stats() for name, board in self.boards.items()}
+
+class FakeSerialDevice:
+    """
+    Pseudo-terminal standing in for a board's USB-UART.
+
+    Open .port like a real serial device; bytes passed to write() come out of it.
+    """
+
+    def __init__(self):
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+
+    def write(self, data):
+        os.write(self.master_fd, data)
+
+    def close(self):
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+async def capture_boards(ports, duration, baudrate=BAUD_RATE, out_dir=None):
+    """
+    Record every board in ports for duration seconds, writing per-board streams to out_dir.
+
+    Returns:
+    - dict: Board name -> stats dict (see BoardStream.stats).
+    """
+    async with MultiBoardCapture(ports, baudrate, out_dir) as capture:
+        return await capture.record(duration)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record several FPGA boards concurrently.")
+    parser.add_argument("ports", nargs="+", help="serial devices, optionally as name=device")
+    parser.add_argument("--duration", type=float, default=4, help="seconds to record")
+    parser.add_argument("--baud", type=int, default=BAUD_RATE)
+    parser.add_argument("--out", default="capture_session", help="directory for the per-board streams")
+    args = parser.parse_args()
+
+    ports = dict(port.split("=", 1) if "=" in port else (f"board_{i}", port) for i, port in enumerate(args.ports))
+    for name, stats in asyncio.run(capture_boards(ports, args.duration, args.baud, args.out)).items():
+        print(f"{name}: {stats['bytes']} bytes in {stats['chunks']} chunks, {stats['throughput'] / 1000:.1f} kB/s")
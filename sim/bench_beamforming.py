@@ -0,0 +1,88 @@
+import time
+import numpy as np
+
+from sim_beamforming import delay_and_sum_samples
+
+SAMPLE_RATE = 39062.5
+DURATION = 5 # seconds of audio per benchmark run
+MIC_COUNTS = [4, 8, 16]
+REQUIRED_SPEEDUP = 100
+
+def loop_delay_and_sum(mic_signals, delay_samples):
+    """
+    Reference per-sample delay-and-sum, the loop delay_and_sum used before it was vectorized.
+
+    Parameters:
+    - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+    - delay_samples (list of int): Non-negative delay (in samples) for each microphone.
+
+    Returns:
+    - numpy array: The beamformed output signal.
+    - list of numpy arrays: The delayed microphone signals.
+    """
+    max_len = max(delay_samples[i] + len(mic_signals[i]) for i in range(len(mic_signals)))
+
+    output_signal = np.zeros(int(max_len))
+    delayed_outputs = [np.zeros(int(max_len)) for i in range(len(mic_signals))]
+    sample_idx = 0
+
+    for signal, delay_samples_mic in zip(mic_signals, delay_samples):
+        signal_len = len(signal)
+
+        for i in range (delay_samples_mic, delay_samples_mic + signal_len):
+            delayed_outputs[sample_idx][i] = signal[i-delay_samples_mic]
+            output_signal[i] += signal[i-delay_samples_mic]
+
+        sample_idx += 1
+
+    return output_signal, delayed_outputs
+
+def time_call(func, *args, repeats=1, **kwargs):
+    """Return the best wall-clock time (in seconds) of repeats calls to func, and its last result."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark(mic_counts=MIC_COUNTS, duration=DURATION, sample_rate=SAMPLE_RATE):
+    """
+    Time the reference loop against the vectorized engine and check they agree.
+
+    Parameters:
+    - mic_counts (list of int): Array sizes to benchmark.
+    - duration (float): Length of the synthetic capture, in seconds.
+    - sample_rate (float): Sample rate of the synthetic capture, in Hz.
+
+    Returns:
+    - dict: Speedup of the vectorized engine for each mic count.
+    """
+    rng = np.random.default_rng(0)
+    num_samples = int(duration * sample_rate)
+    speedups = {}
+
+    for num_mics in mic_counts:
+        mic_signals = rng.standard_normal((num_mics, num_samples))
+        delay_samples = [int(i * 7) for i in range(num_mics)]
+
+        loop_time, (loop_out, loop_delayed) = time_call(loop_delay_and_sum, mic_signals, delay_samples)
+        fast_time, (fast_out, fast_delayed) = time_call(delay_and_sum_samples, mic_signals, delay_samples,
+                                                        repeats=5, return_delayed=True)
+
+        assert np.array_equal(loop_out, fast_out), "vectorized output does not match the loop"
+        assert np.array_equal(np.array(loop_delayed), fast_delayed), "vectorized delayed outputs do not match the loop"
+
+        speedups[num_mics] = loop_time / fast_time
+        print(f"{num_mics:2d} mics, {duration} s: loop {loop_time:.3f} s, "
+              f"vectorized {fast_time * 1000:.2f} ms, speedup {speedups[num_mics]:.0f}x")
+
+    return speedups
+
+if __name__ == "__main__":
+    speedups = benchmark()
+    slow = [num_mics for num_mics, speedup in speedups.items() if speedup < REQUIRED_SPEEDUP]
+    if slow:
+        print(f"Speedup below {REQUIRED_SPEEDUP}x for {slow} mics")
+    else:
+        print(f"All configurations at least {REQUIRED_SPEEDUP}x faster")
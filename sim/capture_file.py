@@ -0,0 +1,257 @@
+import struct
+import numpy as np
+from pathlib import Path
+
+# Raw capture layout: a fixed-size little-endian header, then frames of num_mics
+# samples each (interleaved, one frame per sample time) until the end of the file.
+# The sweep index lives next to it in <capture>.sweeps.csv.
+MAGIC = b'BFCAP\0\0\0'
+VERSION = 1
+HEADER_FORMAT = '<8sHdHHh'
+# Padded so the sample block starts on a 64-byte boundary
+HEADER_SIZE = 64
+# Stored in the header when a capture has no single beam angle (e.g. a sweep of several)
+NO_ANGLE = -32768
+
+def sample_dtype(bit_depth):
+    """Return the on-disk sample type for bit_depth: int16 up to 16 bits, int32 (e.g. the 24-bit TDM samples) up to 32."""
+    if bit_depth <= 16:
+        return np.dtype('<i2')
+    if bit_depth <= 32:
+        return np.dtype('<i4')
+    raise ValueError(f"Unsupported bit depth {bit_depth}")
+
+def index_path(path):
+    """Return the path of the sweep index that goes with capture file path."""
+    path = Path(path)
+    return path.with_name(path.name + '.sweeps.csv')
+
+def read_header(path):
+    """
+    Read the header of a raw capture file.
+
+    Returns:
+    - dict: sample_rate, num_mics, bit_depth and angle (None if the capture has no single angle).
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be a capture file")
+    magic, version, sample_rate, num_mics, bit_depth, angle = struct.unpack_from(HEADER_FORMAT, raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a capture file")
+    if version != VERSION:
+        raise ValueError(f"{path} has capture format version {version}, expected {VERSION}")
+    return {
+        'sample_rate': sample_rate,
+        'num_mics': num_mics,
+        'bit_depth': bit_depth,
+        'angle': None if angle == NO_ANGLE else angle,
+    }
+
+class CaptureWriter:
+    """
+    Appends samples to a raw capture file and records sweep boundaries in its index.
+
+    Usage:
+        with CaptureWriter('session.cap', SAMPLE_RATE) as capture:
+            for angle, audio in sweeps.items():
+                capture.add_sweep(audio, angle)
+    """
+
+    def __init__(self, path, sample_rate, num_mics=1, bit_depth=16, angle=None, append=False):
+        """
+        Parameters:
+        - path (str or Path): Capture file to create (overwritten if it exists, unless append).
+        - sample_rate (float): Sample rate of every channel, in Hz.
+        - num_mics (int): Number of interleaved channels per frame.
+        - bit_depth (int): Significant bits per sample (16, or 24 for raw TDM samples).
+        - angle (int): Beam angle of the whole capture, in degrees (default is none).
+        - append (bool): Add to the end of an existing capture and its index instead; its
+          sample rate, mic count and bit depth must match (its header angle is kept).
+        """
+        self.path = Path(path)
+        self.num_mics = num_mics
+        self.dtype = sample_dtype(bit_depth)
+        self.num_frames = 0
+        self.sweeps = []
+
+        if append and self.path.exists():
+            header = read_header(self.path)
+            if (header['sample_rate'], header['num_mics'], header['bit_depth']) != (sample_rate, num_mics, bit_depth):
+                raise ValueError(f"{self.path} holds {header['num_mics']} mics of {header['bit_depth']}-bit samples at "
+                                 f"{header['sample_rate']} Hz, not {num_mics} of {bit_depth}-bit at {sample_rate} Hz")
+            self.file = open(self.path, 'r+b')
+            # Drop a frame cut short (e.g. by a crash), as CaptureFile does, so new frames stay aligned
+            frame_size = self.dtype.itemsize * num_mics
+            self.num_frames = (self.path.stat().st_size - HEADER_SIZE) // frame_size
+            self.file.truncate(HEADER_SIZE + self.num_frames * frame_size)
+            self.file.seek(0, 2)
+            self.sweeps = read_sweeps(self.path)
+            has_index = index_path(self.path).exists()
+            self.index_file = open(index_path(self.path), 'a')
+            if not has_index:
+                self.index_file.write("start,length,angle\n")
+            return
+
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, sample_rate, num_mics, bit_depth,
+                             NO_ANGLE if angle is None else angle)
+        self.file = open(self.path, 'wb')
+        self.file.write(header.ljust(HEADER_SIZE, b'\0'))
+        self.index_file = open(index_path(self.path), 'w')
+        self.index_file.write("start,length,angle\n")
+
+    def write(self, samples):
+        """
+        Append samples to the capture.
+
+        Parameters:
+        - samples (numpy array): (num_samples,) for a single mic or (num_mics, num_samples) array.
+
+        Returns:
+        - int: Number of frames written.
+        """
+        samples = np.asarray(samples)
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+        if samples.shape[0] != self.num_mics:
+            raise ValueError(f"Expected {self.num_mics} mics, got {samples.shape[0]}")
+        # Frames are interleaved on disk, so write the transpose as one contiguous block
+        self.file.write(np.ascontiguousarray(samples.T, dtype=self.dtype).tobytes())
+        self.num_frames += samples.shape[1]
+        return samples.shape[1]
+
+    def add_sweep(self, samples, angle=None):
+        """
+        Append one sweep's samples and record where it starts in the index.
+
+        Parameters:
+        - samples (numpy array): Samples as for write().
+        - angle (int): Beam angle the sweep was recorded at, in degrees.
+        """
+        start = self.num_frames
+        length = self.write(samples)
+        self.sweeps.append({'start': start, 'length': length, 'angle': angle})
+        self.index_file.write(f"{start},{length},{'' if angle is None else angle}\n")
+        self.index_file.flush()
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_sweeps(path):
+    """Return the sweeps recorded in a capture's index as a list of dicts with start, length and angle."""
+    sweeps = []
+    try:
+        with open(index_path(path)) as f:
+            next(f)
+            for line in f:
+                start, length, angle = line.rstrip('\n').split(',')
+                sweeps.append({'start': int(start), 'length': int(length), 'angle': int(angle) if angle else None})
+    except FileNotFoundError:
+        pass
+    return sweeps
+
+class CaptureFile:
+    """
+    A raw capture opened read-only through np.memmap.
+
+    Nothing is read until it is sliced, so sessions far larger than RAM can be
+    sliced, beamformed and plotted a sweep or block at a time.
+
+    Usage:
+        capture = CaptureFile('session.cap')
+        for sweep in capture.sweeps:
+            mic_signals = capture.sweep_signals(sweep)  # (num_mics, length) view
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.header = read_header(self.path)
+        self.sample_rate = self.header['sample_rate']
+        self.num_mics = self.header['num_mics']
+        self.angle = self.header['angle']
+
+        dtype = sample_dtype(self.header['bit_depth'])
+        # A capture cut short mid-frame (e.g. by a crash) keeps its complete frames
+        self.num_frames = (self.path.stat().st_size - HEADER_SIZE) // (dtype.itemsize * self.num_mics)
+        if self.num_frames:
+            self.frames = np.memmap(self.path, dtype=dtype, mode='r', offset=HEADER_SIZE,
+                                    shape=(self.num_frames, self.num_mics))
+        else:
+            self.frames = np.zeros((0, self.num_mics), dtype=dtype)
+        self.sweeps = read_sweeps(self.path)
+
+    def __len__(self):
+        return self.num_frames
+
+    @property
+    def mic_signals(self):
+        """(num_mics, num_frames) view of the whole capture, in the layout the beamformers take."""
+        return self.frames.T
+
+    def signals(self, start=0, stop=None):
+        """Return a (num_mics, stop - start) view of frames [start, stop)."""
+        return self.frames[start:stop].T
+
+    def sweep_signals(self, sweep):
+        """
+        Return the samples of one sweep.
+
+        Parameters:
+        - sweep (dict or int): A sweep from .sweeps, or its position in the list.
+
+        Returns:
+        - numpy array: (num_mics, length) view into the capture.
+        """
+        if not isinstance(sweep, dict):
+            sweep = self.sweeps[sweep]
+        return self.signals(sweep['start'], sweep['start'] + sweep['length'])
+
+    def sweep_at(self, angle):
+        """
+        Return the sweep recorded at an angle (the last one, if it was recorded more than once).
+
+        Parameters:
+        - angle (int): Beam angle, in degrees.
+
+        Returns:
+        - dict: The sweep's start, length and angle, as in .sweeps.
+        """
+        for sweep in reversed(self.sweeps):
+            if sweep['angle'] == angle:
+                return sweep
+        raise ValueError(f"{self.path} has no sweep at {angle} degrees")
+
+    def blocks(self, block_frames, start=0, stop=None):
+        """
+        Iterate over the capture in blocks, e.g. to feed a StreamingBeamformer.
+
+        Yields:
+        - numpy array: (num_mics, block_frames) arrays (the last may be shorter).
+        """
+        stop = self.num_frames if stop is None else min(stop, self.num_frames)
+        for block_start in range(start, stop, block_frames):
+            yield np.array(self.signals(block_start, min(block_start + block_frames, stop)))
+
+def write_capture(path, samples, sample_rate, bit_depth=16, angle=None):
+    """
+    Write samples to a new raw capture file in one call.
+
+    Parameters:
+    - path (str or Path): Capture file to create.
+    - samples (numpy array): (num_samples,) or (num_mics, num_samples) array.
+    - sample_rate (float): Sample rate, in Hz.
+    - bit_depth (int): Significant bits per sample.
+    - angle (int): Beam angle of the capture, in degrees.
+    """
+    samples = np.asarray(samples)
+    num_mics = 1 if samples.ndim == 1 else samples.shape[0]
+    with CaptureWriter(path, sample_rate, num_mics, bit_depth, angle) as capture:
+        capture.write(samples)
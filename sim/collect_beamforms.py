@@ -1,92 +1,103 @@
 import serial
 import numpy as np
 import matplotlib.pyplot as plt
-import wave
 import librosa
 import librosa.display
 import soundfile as sf
 import time
+import os
+import sys
+
+from uart_capture import capture_uart_bytes, print_capture_stats, UartCaptureThread
+from uart_decode import decode_uart_audio, UartAudioDecoder, MultiChannelDecoder, NUM_CHANNELS, multi_frame_len, print_losses
+from capture_file import CaptureWriter
+from wav_export import save_wave
+from sim_beamforming import beamform_scan, scan_beam
 
 # note: we will need to change our BAUD rate to match the clock we run our UART transmission at.
 # we will also need to change SAMPLE_RATE to the correct value.
 # however, we will keep it consistent with the BAUD/sampling rate from the audio sampling lab for now.
 
 # Set up serial communication
-SERIAL_PORT_NAME = "/dev/ttyUSB1"#"/dev/cu.usbserial-88742923021D1"
+SERIAL_PORT_NAME = os.getenv("SERIAL_PORT", "/dev/ttyUSB1") #"/dev/cu.usbserial-88742923021D1"
 BAUD_RATE = 921600
 SAMPLE_RATE = 39062.5 # capturing samples at 8 kHz; will change
 AUDIO_LENGTH = 4 # set to record 6 seconds of audio
 BYTES = 2
+# Multi mic mode (sw[14]): every 4th frame of all 4 raw mics, 2 bytes per mic
+MULTI_SAMPLE_RATE = SAMPLE_RATE / 4
+MULTI_BYTES = multi_frame_len(NUM_CHANNELS)
+MIC_SPACING = 0.35 # m, the spacing angle_delay_lut.sv was generated for
 
-ser = serial.Serial(SERIAL_PORT_NAME,BAUD_RATE)
-print("Serial port initialized")
+# Opened by open_serial() rather than at import, so the helpers here can be imported
+# (e.g. by async_capture sessions) without claiming a board's port
+ser = None
 
-def save_bytes_as_wave(filename, samples):
-    with wave.open(f'{filename}.wav', 'wb') as wf:
-        wf.setframerate(SAMPLE_RATE)
-        wf.setnchannels(1)
-        wf.setsampwidth(BYTES)
-        for sample in samples:
-            wf.writeframes(sample)
-        print(f"Recording saved to {filename}.wav")
+def open_serial(port_name=SERIAL_PORT_NAME):
+    global ser
+    ser = serial.Serial(port_name, BAUD_RATE)
+    print(f"Serial port {port_name} initialized")
+    return ser
 
 def collect_uart_audio():
     """
-    Collects uart audio data for specified length and stores in arrays for mic_0 and mic_1
+    Collects AUDIO_LENGTH seconds of uart audio with bulk reads, decoding each block as it arrives
     """
     print(f"Recording {AUDIO_LENGTH} seconds of audio:")
-    uart_data = []
-    time_start = time.time()
-    for i in range(int(SAMPLE_RATE*AUDIO_LENGTH)):
-        for _ in range(BYTES):
-            val = ser.read(1) # read 2 bytes of sample; 16-bit audio data
-            uart_data.append(val)
-
-        if ((i+1)%int(SAMPLE_RATE)==0):
-            print(f"{round((i+1)/SAMPLE_RATE)} seconds complete")
-
-    time_end = time.time()
-    print(f"Time elapsed: {time_end - time_start}")
-    return uart_data
-
-def convert_uart_to_audio(uart_data_in: list[bytes]):
-    audio_data = []
-    uart_data: list[bytes] = uart_data_in[::-1]
-    while uart_data:
-        audio_sample = 0
-        audio_valid = False
-        # Iterate over the number of bytes
-        for i in range(2):
-            data = None
-            alignment_bit = None
-            
-            # Check the alignment bit of the byte
-            while alignment_bit != i and uart_data:
-                if alignment_bit is not None:
-                    print("Alignment missed")
-
-                uart_byte = uart_data.pop()
-                data = 0b1111111 & ord(uart_byte)
-                alignment_bit = ord(uart_byte) >> 7
-            
-            if data is None:
-                print("No data")
-                audio_valid = False
-                break
-            elif i == 0:
-                audio_sample += data
-            elif i == 1:
-                audio_sample += data << 7
-                audio_valid = True
-        
-        if audio_valid:
-            if audio_sample & (1 << 13):
-                audio_sample -= 1 << 14
-
-            audio_data.append(audio_sample << 2) # shift data to 16 bit
-        else:
-            continue
-              
+    decoder = UartAudioDecoder()
+    audio_chunks = []
+    _, stats = capture_uart_bytes(ser, int(SAMPLE_RATE*AUDIO_LENGTH)*BYTES, progress_bytes=int(SAMPLE_RATE)*BYTES,
+                                  consumer=lambda data: audio_chunks.append(decoder.decode(data)))
+    audio_chunks.append(decoder.flush())
+    print_capture_stats(stats)
+    if decoder.stats['resyncs']:
+        print(f"Alignment missed {decoder.stats['resyncs']} times ({decoder.stats['dropped_bytes']} bytes dropped)")
+    return np.concatenate(audio_chunks)
+
+def collect_multichannel_audio(capture_path=None):
+    """
+    Collects AUDIO_LENGTH seconds of the multi mic stream, decoding each block into per-mic samples as it arrives
+    """
+    print(f"Recording {AUDIO_LENGTH} seconds of {NUM_CHANNELS} mic audio:")
+    # Frames lost on the way are zero filled, so every mic keeps the sender's timeline
+    decoder = MultiChannelDecoder(frame_rate=MULTI_SAMPLE_RATE)
+    audio_chunks = []
+    _, stats = capture_uart_bytes(ser, int(MULTI_SAMPLE_RATE*AUDIO_LENGTH)*MULTI_BYTES, progress_bytes=int(MULTI_SAMPLE_RATE)*MULTI_BYTES,
+                                  consumer=lambda data: audio_chunks.append(decoder.decode(data, time.perf_counter())))
+    audio_chunks.append(decoder.flush())
+    print_capture_stats(stats)
+    if decoder.stats['resyncs']:
+        print(f"Frame sync lost {decoder.stats['resyncs']} times ({decoder.stats['dropped_bytes']} bytes dropped)")
+    print_losses(decoder.stats, MULTI_SAMPLE_RATE)
+    mic_samples = np.concatenate(audio_chunks, axis=1)
+
+    if capture_path is not None:
+        # Open it later with capture_file.CaptureFile to beamform again
+        with CaptureWriter(capture_path, MULTI_SAMPLE_RATE, num_mics=NUM_CHANNELS) as capture:
+            capture.write(mic_samples)
+        print(f"Capture saved to {capture_path}")
+    return mic_samples
+
+def beamform_multichannel(mic_samples, angles, save_audio=True):
+    """
+    Beamforms one multi mic recording to every angle on the host, instead of recording a sweep per angle.
+    Returns the power at each angle and the beam at the loudest one; saved beams are built one angle at a time
+    """
+    power_map, best_beam = beamform_scan(mic_samples, MIC_SPACING, MULTI_SAMPLE_RATE, angles, return_signals=True)
+    for angle, power in zip(angles, power_map):
+        print(f"{angle:3d} deg: {10 * np.log10(max(power, 1e-12)):.1f} dB")
+        if save_audio:
+            beam = scan_beam(mic_samples, MIC_SPACING, MULTI_SAMPLE_RATE, angle)
+            save_wave(f"beam_ang_{angle}", np.round(beam).astype(np.int16), MULTI_SAMPLE_RATE)
+    return power_map, best_beam
+
+def convert_uart_to_audio(uart_data_in: np.ndarray):
+    """
+    Decodes the 2-byte aligned uart stream into int16 audio samples (vectorized; see uart_decode)
+    """
+    audio_data, stats = decode_uart_audio(uart_data_in)
+    if stats['resyncs']:
+        print(f"Alignment missed {stats['resyncs']} times ({stats['dropped_bytes']} bytes dropped)")
     return audio_data
 
 
@@ -96,22 +107,27 @@ def plot_frequencies(audio_signal):
     fft_magnitude = np.abs(np.fft.rfft(audio_signal)) 
 
 
-def collect_sweep(inputs, save_audio = True):
+def collect_sweep(inputs, save_audio = True, capture_path = None):
     all_sweeps = {}
     for _ in range(inputs):
         angle = int(input("Enter the angle the beamformer is set to: "))
-        sweep_data = collect_uart_audio()
+        # collect_uart_audio decodes while it records, so each sweep is only decoded once
+        all_sweeps[angle] = collect_uart_audio()
 
-        all_sweeps[angle] = sweep_data
+    if capture_path is not None:
+        # One raw capture for the whole sweep; open it later with capture_file.CaptureFile
+        with CaptureWriter(capture_path, SAMPLE_RATE) as capture:
+            for angle, audio_data in all_sweeps.items():
+                capture.add_sweep(audio_data, angle)
+        print(f"Sweep saved to {capture_path}")
 
     plt.subplots(inputs, 1, sharey=True)
     count = 1
-    for angle, sweep_data in all_sweeps.items():
+    for angle, audio_data in all_sweeps.items():
         plt.subplot(inputs, 1, count)
-        audio_data = convert_uart_to_audio(sweep_data)
 
         if save_audio:
-            save_bytes_as_wave(f"beam_ang_{angle}", [sample.to_bytes(2, 'little', signed=True) for sample in audio_data])
+            save_wave(f"beam_ang_{angle}", audio_data, SAMPLE_RATE)
 
         normalized_sweep = np.array(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
         librosa.display.waveshow(normalized_sweep, sr=SAMPLE_RATE, label=f'{angle} deg', color='#00000B')
@@ -123,9 +139,8 @@ def collect_sweep(inputs, save_audio = True):
 
     plt.subplots(inputs, 1, sharey=True, sharex=True)
     count = 1
-    for angle, sweep_data in all_sweeps.items():
+    for angle, audio_data in all_sweeps.items():
         plt.subplot(inputs, 1, count)
-        audio_data = convert_uart_to_audio(sweep_data)
 
         n = len(audio_data)
         frequencies = np.fft.rfftfreq(n, d=1/SAMPLE_RATE)  # Frequency range
@@ -143,12 +158,48 @@ def collect_sweep(inputs, save_audio = True):
     plt.tight_layout()
     plt.show()
 
+def monitor_live_audio(window_seconds=1):
+    """
+    Plots the latest window_seconds of audio live while a background thread captures the uart stream
+    """
+    decoder = UartAudioDecoder()
+    window = np.zeros(int(SAMPLE_RATE*window_seconds), dtype=np.int16)
+
+    plt.ion()
+    fig, ax = plt.subplots()
+    line, = ax.plot(np.arange(len(window)) / SAMPLE_RATE, window)
+    ax.set_ylim(-32768, 32767)
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Amplitude")
+
+    with UartCaptureThread(ser) as capture:
+        try:
+            # Plotting runs here while the capture thread keeps reading into its ring buffer
+            for chunk in capture.chunks():
+                window = np.concatenate([window, decoder.decode(chunk)])[-len(window):]
+                line.set_ydata(window)
+                fig.canvas.draw_idle()
+                plt.pause(0.001)
+        except KeyboardInterrupt:
+            pass
+
+    print(f"Captured {capture.bytes_written} bytes at {capture.throughput / 1000:.1f} kB/s, "
+          f"{capture.dropped_bytes} bytes dropped by the plot, {capture.kernel_overruns} possible driver overruns")
+
 # Example usage
 if __name__ == "__main__":
+    # python collect_beamforms.py [port] [--multi]; --multi records all mics once and beamforms on the host
+    args = [arg for arg in sys.argv[1:] if arg != "--multi"]
+    open_serial(args[0] if args else SERIAL_PORT_NAME)
+    if "--multi" in sys.argv:
+        mic_samples = collect_multichannel_audio("multichannel.cap")
+        beamform_multichannel(mic_samples, list(range(0, 181, 15)))
+        sys.exit()
     while True:
         sweeps = int(input("Enter the number of sweeps to collect: "))
         collect_sweep(sweeps)
         # collect_audio(None)
+        # monitor_live_audio()
     # wav_96 = sf.read("beam_ang_96.wav")
     # wav_64 = sf.read("beam_ang_64.wav")
     # wav_32 = sf.read("beam_ang_32.wav")
@@ -0,0 +1,182 @@
+import argparse
+import numpy as np
+
+from sim_beamforming import FRACTIONAL_DELAY_TAPS, beamforming_delay, delay_and_sum_samples
+
+SAMPLE_RATE = 39062.5
+NUM_MICS = 4
+# Mic spacings to compare, in m: 27 breadboard pins (test_receive_audio.py) and the spacing angle_delay_lut.sv was generated for
+SPACINGS = [27 * 2.54e-3, 0.35]
+SOURCE_ANGLES = range(0, 181, 15)
+STEER_ANGLES = np.arange(181)
+BAND = (100, 8000) # Hz, band of the synthetic source
+NUM_SAMPLES = 8192
+FLOOR_DB = -30 # pattern values below this are clipped before comparing
+MODES = ['integer', 'linear', 'sinc']
+
+def band_limited_noise(num_samples, sample_rate=SAMPLE_RATE, band=BAND, seed=0):
+    """
+    Return the spectrum of a periodic white noise source confined to band.
+
+    Parameters:
+    - num_samples (int): Length of one period, in samples.
+    - sample_rate (float): Sample rate, in Hz.
+    - band (tuple of float): Lowest and highest frequency of the source, in Hz.
+    - seed (int): Random seed.
+
+    Returns:
+    - numpy array: rfft of the source, with unit-magnitude bins inside band.
+    """
+    rng = np.random.default_rng(seed)
+    freqs = np.fft.rfftfreq(num_samples, 1 / sample_rate)
+    in_band = (freqs >= band[0]) & (freqs <= band[1])
+    return np.where(in_band, np.exp(2j * np.pi * rng.random(len(freqs))), 0)
+
+def plane_wave(spectrum, source_angle, distance, num_mics=NUM_MICS, sample_rate=SAMPLE_RATE):
+    """
+    Simulate the mic signals for a far-field source, with the exact (fractional) arrival delays.
+
+    The mic that beamforming_delay delays most hears the source first, so steering
+    to source_angle lines every mic up exactly.
+
+    Parameters:
+    - spectrum (numpy array): rfft of one period of the source.
+    - source_angle (float): Direction of the source, in degrees.
+    - distance (float): Distance between microphones, in m.
+    - num_mics (int): Number of microphones.
+    - sample_rate (float): Sample rate, in Hz.
+
+    Returns:
+    - numpy array: (num_mics, num_samples) periodic mic signals.
+    """
+    num_samples = 2 * (len(spectrum) - 1)
+    delays = beamforming_delay(source_angle, distance, num_mics) * sample_rate
+    arrival = delays.max() - delays
+    freqs = np.fft.rfftfreq(num_samples)
+    return np.fft.irfft(spectrum * np.exp(-2j * np.pi * freqs * arrival[:, np.newaxis]), num_samples)
+
+def exact_pattern(spectrum, source_angle, distance, num_mics=NUM_MICS, sample_rate=SAMPLE_RATE, angles=STEER_ANGLES):
+    """
+    Beam pattern of an ideal delay-and-sum with exact delays, computed in the frequency domain.
+
+    Parameters:
+    - spectrum (numpy array): rfft of one period of the source.
+    - source_angle (float): Direction of the source, in degrees.
+    - distance (float): Distance between microphones, in m.
+    - num_mics (int): Number of microphones.
+    - sample_rate (float): Sample rate, in Hz.
+    - angles (array-like): Steering angles, in degrees.
+
+    Returns:
+    - numpy array: Output power at each steering angle, relative to a perfectly aligned sum.
+    """
+    num_samples = 2 * (len(spectrum) - 1)
+    source_delays = beamforming_delay(source_angle, distance, num_mics) * sample_rate
+    steer_delays = beamforming_delay(np.asarray(angles), distance, num_mics) * sample_rate
+    # Residual misalignment of every mic after steering, in samples
+    offsets = steer_delays - source_delays
+    freqs = np.fft.rfftfreq(num_samples)
+    response = np.exp(-2j * np.pi * offsets[:, :, np.newaxis] * freqs).sum(axis=1)
+    power = np.abs(spectrum) ** 2
+    return (np.abs(response) ** 2 * power).sum(axis=1) / (num_mics ** 2 * power.sum())
+
+def scan_pattern(mic_signals, distance, mode, sample_rate=SAMPLE_RATE, angles=STEER_ANGLES, num_taps=FRACTIONAL_DELAY_TAPS):
+    """
+    Beam pattern of the delay-and-sum engine in one delay mode.
+
+    Parameters:
+    - mic_signals (numpy array): (num_mics, num_samples) mic signals.
+    - distance (float): Distance between microphones, in m.
+    - mode (str): 'integer' (delays truncated like delay_and_sum and the FPGA), 'linear' or 'sinc'.
+    - sample_rate (float): Sample rate, in Hz.
+    - angles (array-like): Steering angles, in degrees.
+    - num_taps (int): Filter length for the sinc mode.
+
+    Returns:
+    - numpy array: Output power at each steering angle, relative to a perfectly aligned sum.
+    """
+    num_mics, num_samples = mic_signals.shape
+    delays = beamforming_delay(np.asarray(angles), distance, num_mics) * sample_rate
+    if mode == 'integer':
+        delays = np.trunc(delays)
+    # Skip the samples where some mic has not started contributing yet
+    start = int(np.ceil(np.abs(delays).max())) + num_taps
+    if start >= num_samples:
+        raise ValueError(f"Signals of {num_samples} samples are too short for delays of {start} samples")
+
+    reference = num_mics ** 2 * np.mean(mic_signals[0] ** 2)
+    pattern = np.empty(len(delays))
+    for idx, angle_delays in enumerate(delays):
+        output, _ = delay_and_sum_samples(mic_signals, angle_delays,
+                                          interpolation='linear' if mode == 'integer' else mode, num_taps=num_taps)
+        pattern[idx] = np.mean(output[start:num_samples] ** 2) / reference
+    return pattern
+
+def pattern_db(pattern, floor_db=FLOOR_DB):
+    """Return a power pattern in dB, clipped at floor_db."""
+    return np.maximum(10 * np.log10(np.maximum(pattern, 1e-30)), floor_db)
+
+def peak_angle(pattern, angles=STEER_ANGLES):
+    """Return the steering angle of the main lobe; flat tops (whole-sample delays) give their center."""
+    peak = np.flatnonzero(pattern >= pattern.max() * (1 - 1e-9))
+    return float(np.mean(np.asarray(angles)[peak]))
+
+def compare_modes(distance, num_mics=NUM_MICS, sample_rate=SAMPLE_RATE, source_angles=SOURCE_ANGLES,
+                  num_samples=NUM_SAMPLES, modes=MODES, num_taps=FRACTIONAL_DELAY_TAPS):
+    """
+    Compare the beam patterns of each delay mode against the exact-delay pattern.
+
+    Parameters:
+    - distance (float): Distance between microphones, in m.
+    - num_mics (int): Number of microphones.
+    - sample_rate (float): Sample rate, in Hz.
+    - source_angles (array-like): Source directions to simulate, in degrees.
+    - num_samples (int): Length of each simulated capture.
+    - modes (list of str): Delay modes to compare.
+    - num_taps (int): Filter length for the sinc mode.
+
+    Returns:
+    - dict: For each mode, rms_error_db and max_error_db (pattern error against the
+      exact delays, over all steering and source angles), peak_error_deg (mean main
+      lobe pointing error) and, for the integer mode, steering_states (distinct
+      whole-sample delay sets over 0 to 180 degrees).
+    """
+    spectrum = band_limited_noise(num_samples, sample_rate)
+    errors = {mode: [] for mode in modes}
+    peak_errors = {mode: [] for mode in modes}
+
+    for source_angle in source_angles:
+        mic_signals = plane_wave(spectrum, source_angle, distance, num_mics, sample_rate)
+        exact_db = pattern_db(exact_pattern(spectrum, source_angle, distance, num_mics, sample_rate))
+        for mode in modes:
+            pattern = scan_pattern(mic_signals, distance, mode, sample_rate, num_taps=num_taps)
+            errors[mode].append(pattern_db(pattern) - exact_db)
+            peak_errors[mode].append(abs(peak_angle(pattern) - source_angle))
+
+    results = {}
+    for mode in modes:
+        mode_errors = np.concatenate(errors[mode])
+        results[mode] = {
+            'rms_error_db': float(np.sqrt(np.mean(mode_errors ** 2))),
+            'max_error_db': float(np.abs(mode_errors).max()),
+            'peak_error_deg': float(np.mean(peak_errors[mode])),
+        }
+    if 'integer' in results:
+        int_delays = np.trunc(beamforming_delay(STEER_ANGLES, distance, num_mics) * sample_rate)
+        results['integer']['steering_states'] = len(np.unique(int_delays, axis=0))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare integer and fractional delay beam patterns.")
+    parser.add_argument("--spacing", type=float, nargs="+", default=SPACINGS, help="mic spacings to compare, in m")
+    parser.add_argument("--mics", type=int, default=NUM_MICS)
+    parser.add_argument("--taps", type=int, default=FRACTIONAL_DELAY_TAPS, help="sinc filter length")
+    args = parser.parse_args()
+
+    for distance in args.spacing:
+        results = compare_modes(distance, args.mics, num_taps=args.taps)
+        print(f"{args.mics} mics, {distance * 100:.2f} cm apart, {SAMPLE_RATE} Hz "
+              f"({results['integer']['steering_states']} integer steering states over 0-180 degrees):")
+        for mode, stats in results.items():
+            print(f"  {mode:8s} pattern error {stats['rms_error_db']:5.2f} dB rms, {stats['max_error_db']:5.2f} dB max, "
+                  f"main lobe off by {stats['peak_error_deg']:4.1f} degrees")
@@ -0,0 +1,212 @@
+"""
+Precomputed steering delay tables, cached in memory and on disk.
+
+A table holds the delays of every mic at every angle from 0 to 180 degrees for
+one array geometry (mic count, spacing, sample rate, speed of sound and angle
+resolution). delay_table() keeps recently used tables in an LRU cache and saves
+each one as an .npz file, so angle scans and LUT generation look delays up
+instead of redoing the trig on every call.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+SPEED_OF_SOUND = 343.0 # m/s
+RESOLUTION = 1.0 # degrees between table rows
+CACHE_DIR = Path(os.getenv("DELAY_TABLE_CACHE", Path(__file__).resolve().parent / ".delay_table_cache"))
+CACHE_SIZE = 32
+TABLE_VERSION = 1
+
+def steering_delays(angles, num_mics, spacing, speed_of_sound=SPEED_OF_SOUND):
+    """
+    Compute the delay of every mic for each steering angle, as beamforming_delay does.
+
+    Parameters:
+    - angles (float or numpy array): Steering angle(s), in degrees.
+    - num_mics (int): Number of microphones.
+    - spacing (float): Distance between microphones, in m.
+    - speed_of_sound (float): Speed of sound, in m/s.
+
+    Returns:
+    - numpy array: Delays in seconds, (num_mics,) or (num_angles, num_mics).
+    """
+    mic_index = np.arange(num_mics)
+    angle_cos = np.cos(np.asarray(angles)[..., np.newaxis] * np.pi / 180)
+    return mic_index * spacing * angle_cos / speed_of_sound
+
+def sample_delays(seconds, sample_rate, whole_samples=False):
+    """
+    Convert delays to samples referenced to the earliest mic, optionally truncating them first like the FPGA.
+
+    Parameters:
+    - seconds (numpy array): Delays in seconds, one row per angle.
+    - sample_rate (float): Sample rate, in Hz.
+    - whole_samples (bool): Truncate to whole samples before referencing.
+
+    Returns:
+    - numpy array: Non-negative delays (int64 when whole_samples, float64 otherwise).
+    """
+    delays = seconds * sample_rate
+    if whole_samples:
+        delays = np.trunc(delays).astype(np.int64)
+    return delays - delays.min(axis=-1, keepdims=True)
+
+class DelayTable:
+    """
+    Delays of every mic at every tabulated angle for one array geometry.
+
+    Attributes:
+    - angles (numpy array): (num_angles,) tabulated angles, in degrees, 0 to 180.
+    - seconds (numpy array): (num_angles, num_mics) delays in seconds, as beamforming_delay gives them.
+    - fractional (numpy array): (num_angles, num_mics) delays in samples, referenced to the earliest mic.
+    - integer (numpy array): (num_angles, num_mics) int64 delays truncated to whole samples and
+      referenced to the earliest mic, as delay_and_sum and beamform_scan apply them.
+    - lut (numpy array): (num_angles,) int64 base delay angle_delay_lut.sv stores for each angle
+      (mic 2's delay truncated to whole samples at the integer sample rate, without its sign).
+
+    The arrays are shared between everyone holding the table, so they are read-only.
+    """
+
+    KINDS = ('seconds', 'fractional', 'integer', 'lut')
+
+    def __init__(self, num_mics, spacing, sample_rate, speed_of_sound=SPEED_OF_SOUND, resolution=RESOLUTION, arrays=None):
+        """
+        Parameters:
+        - num_mics (int): Number of microphones.
+        - spacing (float): Distance between microphones, in m.
+        - sample_rate (float): Sample rate, in Hz.
+        - speed_of_sound (float): Speed of sound, in m/s.
+        - resolution (float): Degrees between tabulated angles; must divide 180.
+        - arrays (dict): Previously computed arrays (as loaded from disk) instead of computing them.
+        """
+        steps = 180 / resolution
+        if resolution <= 0 or not np.isclose(steps, round(steps)):
+            raise ValueError(f"Angle resolution must divide 180 degrees, got {resolution}")
+        self.num_mics = num_mics
+        self.spacing = spacing
+        self.sample_rate = sample_rate
+        self.speed_of_sound = speed_of_sound
+        self.resolution = resolution
+
+        if arrays is None:
+            angles = np.arange(round(steps) + 1) * resolution
+            seconds = steering_delays(angles, num_mics, spacing, speed_of_sound)
+            # generate_lut.py truncates the sample rate before scaling
+            lut_base = spacing * np.cos(angles * np.pi / 180) / speed_of_sound * int(sample_rate)
+            arrays = {
+                'angles': angles,
+                'seconds': seconds,
+                'fractional': sample_delays(seconds, sample_rate),
+                'integer': sample_delays(seconds, sample_rate, whole_samples=True),
+                'lut': np.abs(np.trunc(lut_base)).astype(np.int64),
+            }
+        for name in ('angles',) + self.KINDS:
+            array = np.array(arrays[name])
+            array.setflags(write=False)
+            setattr(self, name, array)
+
+    @property
+    def key(self):
+        """The geometry this table was computed for."""
+        return table_key(self.num_mics, self.spacing, self.sample_rate, self.speed_of_sound, self.resolution)
+
+    def lookup(self, angles, kind='fractional'):
+        """
+        Delays for arbitrary steering angles: table rows where the angle is tabulated, computed otherwise.
+
+        Parameters:
+        - angles (float or array-like): Steering angle(s), in degrees.
+        - kind (str): 'seconds', 'fractional', 'integer' or 'lut'.
+
+        Returns:
+        - numpy array: (num_mics,) delays for a single angle, (num_angles, num_mics)
+          for several ('lut' gives one base delay per angle).
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown delay kind {kind!r}, expected one of {self.KINDS}")
+        angles = np.asarray(angles, dtype=np.float64)
+        rows = np.round(angles / self.resolution)
+        on_table = np.isclose(rows * self.resolution, angles) & (rows >= 0) & (rows < len(self.angles))
+        if np.all(on_table):
+            return getattr(self, kind)[rows.astype(np.int64)]
+
+        if kind == 'lut':
+            raise ValueError("LUT delays are only tabulated at whole multiples of the resolution")
+        seconds = steering_delays(angles, self.num_mics, self.spacing, self.speed_of_sound)
+        if kind == 'seconds':
+            return seconds
+        return sample_delays(seconds, self.sample_rate, whole_samples=(kind == 'integer'))
+
+def table_key(num_mics, spacing, sample_rate, speed_of_sound=SPEED_OF_SOUND, resolution=RESOLUTION):
+    """Normalize a geometry into the hashable key tables are cached under."""
+    return (int(num_mics), float(spacing), float(sample_rate), float(speed_of_sound), float(resolution))
+
+def cache_path(key, cache_dir=CACHE_DIR):
+    """Return the .npz file a table with this key is saved to."""
+    num_mics, spacing, sample_rate, speed_of_sound, resolution = key
+    return Path(cache_dir) / f"delays_{num_mics}mic_{spacing!r}m_{sample_rate!r}hz_{speed_of_sound!r}mps_{resolution!r}deg.npz"
+
+def save_table(table, path):
+    """Write a table to an .npz file, replacing it atomically so concurrent readers never see half a file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(partial, 'wb') as file:
+        np.savez(file, version=TABLE_VERSION, key=np.array(table.key, dtype=np.float64),
+                 **{name: getattr(table, name) for name in ('angles',) + DelayTable.KINDS})
+    os.replace(partial, path)
+
+def load_table(key, path):
+    """
+    Read a table saved by save_table.
+
+    Returns:
+    - DelayTable or None: The table, or None when the file is missing, from another
+      format version or for a different geometry.
+    """
+    try:
+        with np.load(path) as data:
+            if int(data['version']) != TABLE_VERSION or tuple(data['key']) != tuple(float(value) for value in key):
+                return None
+            arrays = {name: data[name] for name in ('angles',) + DelayTable.KINDS}
+    except (OSError, KeyError, ValueError):
+        return None
+    return DelayTable(*key, arrays=arrays)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_table(key, cache_dir):
+    if cache_dir is None:
+        return DelayTable(*key)
+    path = cache_path(key, cache_dir)
+    table = load_table(key, path)
+    if table is None:
+        table = DelayTable(*key)
+        try:
+            save_table(table, path)
+        except OSError:
+            pass # a read-only checkout still gets the in-memory cache
+    return table
+
+def delay_table(num_mics, spacing, sample_rate, speed_of_sound=SPEED_OF_SOUND, resolution=RESOLUTION, cache_dir=CACHE_DIR):
+    """
+    Return the delay table for an array geometry, from memory, disk or computed on first use.
+
+    Parameters:
+    - num_mics (int): Number of microphones.
+    - spacing (float): Distance between microphones, in m.
+    - sample_rate (float): Sample rate, in Hz.
+    - speed_of_sound (float): Speed of sound, in m/s.
+    - resolution (float): Degrees between tabulated angles.
+    - cache_dir (str or Path): Directory of saved tables (None keeps them in memory only).
+
+    Returns:
+    - DelayTable: The (shared, read-only) table.
+    """
+    return _cached_table(table_key(num_mics, spacing, sample_rate, speed_of_sound, resolution),
+                         None if cache_dir is None else str(cache_dir))
+
+def clear_cache():
+    """Drop every table held in memory (saved files are kept)."""
+    _cached_table.cache_clear()
@@ -0,0 +1,307 @@
+import time
+import numpy as np
+
+from delay_tables import delay_table
+from sim_beamforming import beamform_scan, delay_and_sum_samples
+
+SAMPLE_RATE = 39062.5
+BLOCK_SIZE = 1024
+# Samples ((steering angles + mics) x blocks x fft_len) one overlap-add batch may hold at once
+BATCH_ELEMENTS = 1 << 22
+WINDOWS = ['boxcar', 'hann']
+
+def analysis_window(window, block_size, hop):
+    """
+    Return an analysis window whose copies, hop samples apart, add up to exactly one.
+
+    Parameters:
+    - window (str): 'boxcar' or 'hann' (periodic).
+    - block_size (int): Window length, a multiple of hop.
+    - hop (int): Distance between blocks, in samples.
+
+    Returns:
+    - numpy array: (block_size,) window.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window {window!r}, expected one of {WINDOWS}")
+    if hop <= 0 or block_size % hop:
+        raise ValueError(f"hop ({hop}) must divide block_size ({block_size})")
+    if window == 'boxcar':
+        weights = np.ones(block_size)
+    else:
+        weights = np.hanning(block_size + 1)[:-1]
+
+    overlap = weights.reshape(-1, hop).sum(axis=0)
+    if not np.allclose(overlap, overlap[0]):
+        raise ValueError(f"A {window} window of {block_size} samples does not overlap-add to a constant at hop {hop}")
+    return weights / overlap[0]
+
+class FrequencyBeamformer:
+    """
+    Overlap-add delay-and-sum beamformer that delays each mic with a phase shift per rfft bin.
+
+    The recording is cut into windowed blocks, hop samples apart, whose copies add
+    up to the original signal. Each block is zero-padded to fft_len, long enough
+    for the largest delay the array can need, so a phase shift is a linear (not
+    circular) delay of the block and adding the delayed blocks back together is
+    exactly the delayed recording. Whole-sample delays reproduce
+    delay_and_sum_samples to rounding error. Fractional delays come for free, as
+    band-limited interpolation of each block; a hann window with overlapping
+    blocks keeps the interpolation ringing at the block edges small.
+
+    Steering vectors are cached per angle, and scan() transforms each batch of
+    blocks once and reuses its spectra for every steering angle.
+    """
+
+    def __init__(self, num_mics, distance_between_microphones, sr=SAMPLE_RATE, block_size=BLOCK_SIZE, hop=None,
+                 window=None, fractional=True):
+        """
+        Parameters:
+        - num_mics (int): Number of microphones.
+        - distance_between_microphones (float): Distance between microphones, in m.
+        - sr (float): Sample rate of the recordings, in Hz.
+        - block_size (int): Samples per block.
+        - hop (int): Samples between block starts (default is block_size, no overlap).
+        - window (str): 'boxcar' or 'hann' (default is boxcar without overlap, hann with it).
+        - fractional (bool): Use the exact delays instead of truncating them to whole
+          samples like delay_and_sum and the FPGA.
+        """
+        hop = block_size if hop is None else hop
+        window = ('boxcar' if hop == block_size else 'hann') if window is None else window
+        self.num_mics = num_mics
+        self.distance = distance_between_microphones
+        self.sr = sr
+        self.block_size = block_size
+        self.hop = hop
+        self.fractional = fractional
+        self.window = analysis_window(window, block_size, hop)
+
+        self.table = delay_table(num_mics, distance_between_microphones, sr)
+        # Steering straight along the array (0 degrees) needs the largest delay
+        self.max_delay = int(np.ceil(self.table.fractional.max()))
+        self.fft_len = 1 << (block_size + self.max_delay - 1).bit_length()
+        self.freqs = np.fft.rfftfreq(self.fft_len)
+        self.steering = {}
+
+    def delays(self, angle):
+        """Return the delays (in samples, referenced to the earliest mic) the beamformer applies at angle."""
+        return self.table.lookup(angle, 'fractional' if self.fractional else 'integer')
+
+    def steering_vector(self, angle):
+        """
+        Return the per-bin phase shifts that steer the array to angle, computing them on first use.
+
+        Parameters:
+        - angle (float): Steering angle, in degrees.
+
+        Returns:
+        - numpy array: (num_mics, fft_len // 2 + 1) complex phase shifts.
+        """
+        angle = float(angle)
+        if angle not in self.steering:
+            delays = self.delays(angle)
+            self.steering[angle] = np.exp(-2j * np.pi * delays[:, np.newaxis] * self.freqs)
+        return self.steering[angle]
+
+    def num_blocks(self, num_samples):
+        """Return how many blocks cover num_samples samples, with the front padded so every sample is in the same number of blocks."""
+        lead = self.block_size - self.hop
+        return (lead + num_samples - 1) // self.hop + 1
+
+    def block_spectra(self, mic_signals, first=0, last=None):
+        """
+        Window and transform blocks of a recording.
+
+        Parameters:
+        - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+        - first (int): First block to transform.
+        - last (int): Block to stop before (default is the end of the recording).
+
+        Returns:
+        - numpy array: (num_mics, last - first, fft_len // 2 + 1) block spectra.
+        """
+        mic_signals = np.asarray(mic_signals, dtype=np.float64)
+        num_mics, num_samples = mic_signals.shape
+        if num_mics != self.num_mics:
+            raise ValueError(f"Expected {self.num_mics} mics, got {num_mics}")
+        last = self.num_blocks(num_samples) if last is None else min(last, self.num_blocks(num_samples))
+
+        # Block k starts hop * k samples into the recording padded with block_size - hop zeros in front
+        lead = self.block_size - self.hop
+        seg_start = first * self.hop - lead
+        segment = np.zeros((num_mics, max(last - first - 1, 0) * self.hop + self.block_size))
+        copy_start, copy_stop = max(seg_start, 0), min(seg_start + segment.shape[1], num_samples)
+        if copy_stop > copy_start:
+            segment[:, copy_start - seg_start:copy_stop - seg_start] = mic_signals[:, copy_start:copy_stop]
+
+        blocks = np.lib.stride_tricks.sliding_window_view(segment, self.block_size, axis=1)[:, ::self.hop][:, :last - first]
+        return np.fft.rfft(blocks * self.window, self.fft_len)
+
+    def overlap_add(self, mic_signals, steering):
+        """
+        Steer a recording with per-bin phase shifts and overlap-add it back, a batch of blocks at a time.
+
+        Only one batch of blocks (about BATCH_ELEMENTS samples over the mics and
+        steering vectors) and the fft_len - hop samples the next batch still adds to
+        are held, so memory does not grow with the length of the recording.
+
+        Parameters:
+        - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+        - steering (numpy array): (num_steers, num_mics, fft_len // 2 + 1) phase shifts.
+
+        Yields:
+        - int: Index of the first output sample of the segment (negative while in the front padding).
+        - numpy array: (num_steers, segment_len) finished beamformed (summed) output samples.
+        """
+        num_samples = np.shape(mic_signals)[1]
+        num_blocks = self.num_blocks(num_samples)
+        lead = self.block_size - self.hop
+        batch = max(1, BATCH_ELEMENTS // ((len(steering) + self.num_mics) * self.fft_len))
+
+        pending = np.zeros((len(steering), self.fft_len - self.hop))
+        for first in range(0, num_blocks, batch):
+            last = min(first + batch, num_blocks)
+            spectra = self.block_spectra(mic_signals, first, last)
+            blocks = np.fft.irfft(np.einsum('mkf,smf->skf', spectra, steering), self.fft_len)
+
+            output = np.zeros((len(steering), (last - first - 1) * self.hop + self.fft_len))
+            output[:, :len(pending[0])] += pending
+            for block in range(last - first):
+                output[:, block * self.hop:block * self.hop + self.fft_len] += blocks[:, block]
+            # Later blocks start at last * hop, so everything before it is finished
+            done = (last - first) * self.hop
+            pending = output[:, done:]
+            yield first * self.hop - lead, output[:, :done]
+        yield num_blocks * self.hop - lead, pending
+
+    def beamform(self, mic_signals, angle):
+        """
+        Steer the array to one angle.
+
+        Parameters:
+        - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+        - angle (float): Steering angle, in degrees.
+
+        Returns:
+        - numpy array: The beamformed (summed) output signal, the same length as delay_and_sum_samples gives.
+        """
+        num_samples = np.shape(mic_signals)[1]
+        out_len = num_samples + int(np.ceil(self.delays(angle).max()))
+        output_signal = np.zeros(out_len)
+        for start, segment in self.overlap_add(mic_signals, self.steering_vector(angle)[np.newaxis]):
+            lo, hi = max(start, 0), min(start + segment.shape[1], out_len)
+            if hi > lo:
+                output_signal[lo:hi] = segment[0, lo - start:hi - start]
+        return output_signal
+
+    def scan(self, mic_signals, angles=range(181), return_signals=False):
+        """
+        Beamform one recording toward every steering angle, transforming each block only once.
+
+        Each angle's power is summed as the overlap-add finishes its samples, so no
+        angle's whole output is ever held.
+
+        Parameters:
+        - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+        - angles (array-like): Steering angles to scan, in degrees (default is 0 to 180).
+        - return_signals (bool): Also return the beamformed signal at the angle with the most power.
+
+        Returns:
+        - numpy array: (num_angles,) mean power of the beamformed output at each angle,
+          averaged over the samples where every mic contributes, as in beamform_scan.
+        - numpy array or None: (num_samples,) beamformed output at the first angle with the
+          most power (sum divided by the number of mics), or None when return_signals is False.
+        """
+        num_samples = np.shape(mic_signals)[1]
+        if self.max_delay >= num_samples:
+            raise ValueError(f"Recording of {num_samples} samples is shorter than the largest delay ({self.max_delay} samples)")
+
+        angles = np.asarray(angles).reshape(-1)
+        power_map = np.zeros(len(angles))
+        if not len(angles):
+            return power_map, (np.zeros(num_samples) if return_signals else None)
+        first_sample = int(np.ceil(max(self.delays(angle).max() for angle in angles)))
+        steering = np.stack([self.steering_vector(angle) for angle in angles])
+        for start, segment in self.overlap_add(mic_signals, steering):
+            lo, hi = max(start, first_sample), min(start + segment.shape[1], num_samples)
+            if hi > lo:
+                power_map += np.sum((segment[:, lo - start:hi - start] / self.num_mics) ** 2, axis=1)
+        power_map /= num_samples - first_sample
+
+        if not return_signals:
+            return power_map, None
+        best_angle = angles[np.argmax(power_map)]
+        return power_map, self.beamform(mic_signals, best_angle)[:num_samples] / self.num_mics
+
+def validate(num_mics=4, distance=0.35, duration=2, sr=SAMPLE_RATE, block_size=BLOCK_SIZE):
+    """
+    Check the frequency-domain engine against the time-domain path and time an angle scan.
+
+    Parameters:
+    - num_mics (int): Number of microphones.
+    - distance (float): Distance between microphones, in m.
+    - duration (float): Length of the synthetic recording, in seconds.
+    - sr (float): Sample rate, in Hz.
+    - block_size (int): Samples per block.
+
+    Returns:
+    - dict: Worst relative error of whole-sample and fractional steering, and the
+      time and relative power map error of 181-angle scans against beamform_scan
+      (whole samples) and a loop over the sinc interpolator (fractional).
+    """
+    rng = np.random.default_rng(0)
+    num_samples = int(duration * sr)
+    # Band-limited noise, so interpolating fractional delays is well defined
+    spectrum = np.fft.rfft(rng.standard_normal((num_mics, num_samples)))
+    spectrum[:, np.fft.rfftfreq(num_samples) > 0.4] = 0
+    mic_signals = np.fft.irfft(spectrum, num_samples)
+    angles = np.arange(181)
+
+    def relative_error(output, reference):
+        return float(np.abs(output - reference).max() / np.abs(reference).max())
+
+    results = {'integer_error': 0.0, 'fractional_error': 0.0}
+    integer = FrequencyBeamformer(num_mics, distance, sr, block_size, fractional=False)
+    fractional = FrequencyBeamformer(num_mics, distance, sr, block_size, block_size // 2)
+    for angle in range(0, 181, 15):
+        reference, _ = delay_and_sum_samples(mic_signals, integer.delays(angle))
+        results['integer_error'] = max(results['integer_error'], relative_error(integer.beamform(mic_signals, angle), reference))
+        reference, _ = delay_and_sum_samples(mic_signals, fractional.delays(angle), interpolation='sinc')
+        # Both ends only see part of the mics' interpolation filters; compare the middle
+        edge = fractional.max_delay + 64
+        results['fractional_error'] = max(results['fractional_error'], relative_error(
+            fractional.beamform(mic_signals, angle)[edge:-edge], reference[edge:-edge]))
+
+    results['integer_time_scan'], (time_power, _) = time_scan(beamform_scan, mic_signals, distance, sr, angles)
+    results['integer_freq_scan'], (freq_power, _) = time_scan(integer.scan, mic_signals, angles)
+    results['integer_scan_error'] = relative_error(freq_power, time_power)
+
+    results['fractional_time_scan'], time_power = time_scan(sinc_scan, mic_signals, fractional, angles)
+    results['fractional_freq_scan'], (freq_power, _) = time_scan(fractional.scan, mic_signals, angles)
+    results['fractional_scan_error'] = relative_error(freq_power, time_power)
+    return results
+
+def sinc_scan(mic_signals, beamformer, angles):
+    """Time-domain reference for FrequencyBeamformer.scan: one sinc-interpolated delay_and_sum_samples call per angle."""
+    num_samples = mic_signals.shape[1]
+    start = int(np.ceil(max(beamformer.delays(angle).max() for angle in angles)))
+    power_map = np.empty(len(angles))
+    for idx, angle in enumerate(angles):
+        output, _ = delay_and_sum_samples(mic_signals, beamformer.delays(angle), interpolation='sinc')
+        power_map[idx] = np.mean((output[start:num_samples] / beamformer.num_mics) ** 2)
+    return power_map
+
+def time_scan(func, *args):
+    """Return the wall-clock time (in seconds) of one call to func, and its result."""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    results = validate()
+    print(f"Whole-sample delays: max error {results['integer_error']:.1e} of full scale against delay_and_sum_samples")
+    print(f"Fractional delays: max error {results['fractional_error']:.1e} of full scale against the sinc interpolator")
+    for mode, reference in [('integer', 'beamform_scan'), ('fractional', 'sinc delay_and_sum_samples')]:
+        print(f"181-angle {mode} scan: {reference} {results[mode + '_time_scan']:.2f} s, "
+              f"FrequencyBeamformer {results[mode + '_freq_scan']:.2f} s, "
+              f"power maps differ by {results[mode + '_scan_error']:.1e}")
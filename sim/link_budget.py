@@ -0,0 +1,262 @@
+import argparse
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from uart_capture import KERNEL_BUFFER_SIZE, UART_BITS_PER_BYTE, capture_uart_bytes
+from uart_decode import SEQUENCE_PERIOD, as_byte_array, find_frames, frame_sequence, missing_frames, multi_frame_len
+
+CLOCK_FREQ = 100_000_000 # Hz, clk_100mhz driving uart_transmit
+BAUD_RATE = 921600
+SAMPLE_RATE = 39062.5
+PAYLOAD_BITS = 7 # bits of sample data per UART byte; bit 7 is the alignment bit
+BYTE_GAP_CYCLES = 2 # idle cycles uart_byte_transmit adds between the bytes of a frame
+MIC_COUNTS = [1, 2, 4, 8]
+SAMPLE_BITS = [14, 16, 24]
+DECIMATIONS = [1, 2, 4]
+SEQUENCE_BYTES = 1 # the sequence number byte that leads every multi mic frame
+
+def frame_bytes(num_mics, sample_bits, payload_bits=PAYLOAD_BITS, overhead_bytes=0):
+    """Return the UART bytes in one frame carrying a sample of every mic, packed payload_bits per byte."""
+    return math.ceil(num_mics * sample_bits / payload_bits) + overhead_bytes
+
+def link_budget(num_mics=1, sample_bits=14, sample_rate=SAMPLE_RATE, decimation=1, baud_rate=BAUD_RATE, overhead_bytes=0,
+                clock_freq=CLOCK_FREQ, byte_gap_cycles=BYTE_GAP_CYCLES):
+    """
+    Model whether a stream of frames fits through the UART link.
+
+    The wire rate counts every byte as UART_BITS_PER_BYTE bits at the nominal
+    baud rate. The transmitter rate follows the RTL: uart_transmit holds each bit
+    for floor(clock_freq / baud_rate) cycles, and uart_byte_transmit idles
+    byte_gap_cycles between bytes. top_level drops a sample that arrives while
+    the previous frame is still going out, so an overloaded link does not back
+    up; it sends only every delivered_every-th frame.
+
+    Parameters:
+    - num_mics (int): Samples per frame.
+    - sample_bits (int): Bits per sample.
+    - sample_rate (float): TDM frame rate, in Hz.
+    - decimation (int): Send one frame out of every decimation frames.
+    - baud_rate (int): UART baud rate.
+    - overhead_bytes (int): Extra bytes per frame (sync, sequence numbers, ...).
+    - clock_freq (float): Clock driving uart_transmit, in Hz.
+    - byte_gap_cycles (int): Idle cycles between bytes of a frame.
+
+    Returns:
+    - dict: frame_bytes, frame_rate (frames/s offered), required_baud, utilization (of the
+      nominal line rate), tx_utilization (of the RTL transmitter's time), headroom
+      (1 - the larger of the two), fits, delivered_every, delivered_rate (frames/s),
+      max_frame_rate and baud_error (the transmitter's actual bit rate against baud_rate).
+    """
+    num_bytes = frame_bytes(num_mics, sample_bits, overhead_bytes=overhead_bytes)
+    frame_rate = sample_rate / decimation
+    required_baud = num_bytes * UART_BITS_PER_BYTE * frame_rate
+
+    bit_cycles = int(clock_freq // baud_rate)
+    frame_time = num_bytes * (UART_BITS_PER_BYTE * bit_cycles + byte_gap_cycles) / clock_freq
+    tx_utilization = frame_time * frame_rate
+    utilization = required_baud / baud_rate
+    delivered_every = max(math.ceil(tx_utilization), 1)
+
+    return {
+        'frame_bytes': num_bytes,
+        'frame_rate': frame_rate,
+        'required_baud': required_baud,
+        'utilization': utilization,
+        'tx_utilization': tx_utilization,
+        'headroom': 1 - max(utilization, tx_utilization),
+        'fits': max(utilization, tx_utilization) <= 1,
+        'delivered_every': delivered_every,
+        'delivered_rate': frame_rate / delivered_every,
+        'max_frame_rate': 1 / frame_time,
+        'baud_error': clock_freq / bit_cycles / baud_rate - 1,
+    }
+
+def budget_table(mic_counts=MIC_COUNTS, sample_bits=SAMPLE_BITS, decimations=DECIMATIONS, sample_rate=SAMPLE_RATE,
+                 baud_rate=BAUD_RATE, overhead_bytes=None):
+    """
+    Print link_budget for every combination of mic count, sample width and decimation.
+
+    Parameters:
+    - overhead_bytes (int): Extra bytes per frame; by default the frames top_level sends,
+      with SEQUENCE_BYTES more for several mics (9 bytes for 4 mics of 14 bits) and none for one.
+
+    Returns:
+    - dict: (num_mics, sample_bits, decimation) -> link_budget results.
+    """
+    results = {}
+    if overhead_bytes is None:
+        overhead = "bytes include the sequence number of multi mic frames"
+    else:
+        overhead = f"bytes include {overhead_bytes} overhead bytes per frame"
+    print(f"{baud_rate} baud, {sample_rate} Hz frames, {overhead}")
+    print(" mics  bits  decim  bytes  frame rate  line use  tx use  headroom  delivered")
+    for num_mics in mic_counts:
+        extra = (SEQUENCE_BYTES if num_mics > 1 else 0) if overhead_bytes is None else overhead_bytes
+        for bits in sample_bits:
+            for decimation in decimations:
+                budget = link_budget(num_mics, bits, sample_rate, decimation, baud_rate, extra)
+                results[(num_mics, bits, decimation)] = budget
+                delivered = "all" if budget['fits'] else f"1 in {budget['delivered_every']}"
+                print(f"{num_mics:5d} {bits:5d} {decimation:6d} {budget['frame_bytes']:6d} {budget['frame_rate']:10.1f} "
+                      f"{budget['utilization'] * 100:8.1f}% {budget['tx_utilization'] * 100:6.1f}% "
+                      f"{budget['headroom'] * 100:8.1f}%  {delivered}")
+    return results
+
+def load_chunk_index(path):
+    """
+    Read the .chunks.csv index async_capture writes next to a raw stream.
+
+    Returns:
+    - numpy array: Stream offset of the end of each chunk, in bytes.
+    - numpy array: Arrival time of each chunk, in seconds.
+    """
+    index = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    return index[:, 0] + index[:, 1], index[:, 2]
+
+def stream_frame_len(num_mics):
+    """Bytes per frame as top_level sends them: 2 for the beamformed stream, or a multi mic frame with its sequence number."""
+    return 2 if num_mics == 1 else multi_frame_len(num_mics)
+
+def profile_stream(uart_data, num_mics=1, sample_rate=SAMPLE_RATE, decimation=1, chunk_ends=None, chunk_times=None,
+                   baud_rate=BAUD_RATE):
+    """
+    Measure what actually arrived over the link in a live or recorded capture.
+
+    Frames are found the way the decoders find them (2 bytes per mic, after a
+    sequence number byte when there are several mics, the last one with its
+    alignment bit set). With chunk arrival times, resyncs are placed on
+    the capture's timeline and the time between reads is checked against how
+    long the driver buffer takes to fill at the line rate; a longer wait may have
+    overrun it.
+
+    Parameters:
+    - uart_data (bytes-like or numpy array): Raw bytes received over UART.
+    - num_mics (int): Mics per frame (1 for the beamformed stream).
+    - sample_rate (float): TDM frame rate, in Hz.
+    - decimation (int): Frames the FPGA skips between sent frames, plus one.
+    - chunk_ends (numpy array): Stream offset of the end of each read chunk.
+    - chunk_times (numpy array): Arrival time of each chunk, in seconds.
+    - baud_rate (int): UART baud rate.
+
+    Returns:
+    - dict: bytes, frames, dropped_bytes, resyncs, for several mics sequence_missing and
+      sequence_gaps (frames lost, counted from the sequence numbers, and the gaps they
+      fell in), and, with chunk times, duration (s),
+      received_rate (bytes/s), line_utilization, frame_rate (decoded frames/s),
+      missing_frames (expected over the duration minus decoded), resync_times (s),
+      max_read_gap (s) and overrun_gaps (reads further apart than the driver buffer lasts).
+    """
+    uart_bytes = as_byte_array(uart_data)
+    frame_len = stream_frame_len(num_mics)
+    starts, resyncs, _ = find_frames(uart_bytes, frame_len)
+    stats = {
+        'bytes': len(uart_bytes),
+        'frames': len(starts),
+        'dropped_bytes': len(uart_bytes) - len(starts) * frame_len,
+        'resyncs': resyncs,
+    }
+    if num_mics > 1:
+        missing = missing_frames(frame_sequence(uart_bytes, starts))
+        stats['sequence_missing'] = int(missing.sum())
+        stats['sequence_gaps'] = int((missing > 0).sum())
+    if chunk_times is None or len(chunk_times) < 2:
+        return stats
+
+    chunk_ends = np.asarray(chunk_ends, dtype=np.float64)
+    chunk_times = np.asarray(chunk_times, dtype=np.float64) - chunk_times[0]
+    # Bytes of the first chunk arrived before its timestamp, so the rate is measured from there on
+    duration = chunk_times[-1]
+    received = chunk_ends[-1] - chunk_ends[0]
+    line_rate = baud_rate / UART_BITS_PER_BYTE
+
+    ends = np.flatnonzero(uart_bytes >> 7)
+    gaps = np.diff(ends, prepend=-1)
+    resync_offsets = ends[1:][gaps[1:] != frame_len]
+    read_gaps = np.diff(chunk_times)
+
+    stats.update({
+        'duration': duration,
+        'received_rate': received / duration if duration > 0 else 0.0,
+        'line_utilization': received / duration / line_rate if duration > 0 else 0.0,
+        'frame_rate': received / frame_len / duration if duration > 0 else 0.0,
+        'missing_frames': max(int(round(duration * sample_rate / decimation)) - int(received // frame_len), 0),
+        'resync_times': np.interp(resync_offsets, chunk_ends, chunk_times),
+        'max_read_gap': float(read_gaps.max()),
+        'overrun_gaps': int((read_gaps > KERNEL_BUFFER_SIZE / line_rate).sum()),
+    })
+    return stats
+
+def profile_recording(stream_path, num_mics=1, sample_rate=SAMPLE_RATE, decimation=1, baud_rate=BAUD_RATE):
+    """Profile a raw stream written by async_capture, using its .chunks.csv index when present."""
+    stream_path = Path(stream_path)
+    index_file = stream_path.with_suffix(".chunks.csv")
+    chunk_ends, chunk_times = load_chunk_index(index_file) if index_file.exists() else (None, None)
+    return profile_stream(np.fromfile(stream_path, dtype=np.uint8), num_mics, sample_rate, decimation,
+                          chunk_ends, chunk_times, baud_rate)
+
+def profile_live(ser, duration, num_mics=1, sample_rate=SAMPLE_RATE, decimation=1):
+    """Capture duration seconds from an open serial port, timestamping each read, and profile it."""
+    chunk_ends, chunk_times = [], []
+    received = [0]
+
+    def on_chunk(data):
+        received[0] += len(data)
+        chunk_ends.append(received[0])
+        chunk_times.append(time.perf_counter())
+
+    num_bytes = int(duration * sample_rate / decimation) * stream_frame_len(num_mics)
+    uart_bytes, _ = capture_uart_bytes(ser, num_bytes, consumer=on_chunk)
+    return profile_stream(uart_bytes, num_mics, sample_rate, decimation, chunk_ends, chunk_times, ser.baudrate)
+
+def print_profile(stats, num_mics=1, sample_rate=SAMPLE_RATE, decimation=1):
+    """Print the statistics returned by profile_stream."""
+    print(f"{stats['bytes']} bytes, {stats['frames']} frames, {stats['dropped_bytes']} bytes dropped, {stats['resyncs']} resyncs")
+    if 'sequence_missing' in stats:
+        print(f"Sequence numbers show {stats['sequence_missing']} frames missing in {stats['sequence_gaps']} gaps "
+              f"(each gap counted modulo {SEQUENCE_PERIOD} frames)")
+    if 'duration' in stats:
+        print(f"Received {stats['received_rate'] / 1000:.1f} kB/s over {stats['duration']:.2f} s "
+              f"({stats['line_utilization'] * 100:.1f}% of the line), {stats['frame_rate']:.1f} frames/s "
+              f"of {sample_rate / decimation:.1f} expected, about {stats['missing_frames']} frames missing")
+        print(f"Longest wait between reads {stats['max_read_gap'] * 1000:.1f} ms, "
+              f"{stats['overrun_gaps']} waits long enough to overrun the driver buffer")
+        if len(stats['resync_times']):
+            print("Resyncs at (s): " + ", ".join(f"{t:.3f}" for t in stats['resync_times'][:20]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UART link budget and capture profiler.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    budget = commands.add_parser("budget", help="tabulate which mic/bit/rate combinations fit the link")
+    budget.add_argument("--mics", type=int, nargs="+", default=MIC_COUNTS)
+    budget.add_argument("--bits", type=int, nargs="+", default=SAMPLE_BITS)
+    budget.add_argument("--decimation", type=int, nargs="+", default=DECIMATIONS)
+    budget.add_argument("--rate", type=float, default=SAMPLE_RATE)
+    budget.add_argument("--baud", type=int, default=BAUD_RATE)
+    budget.add_argument("--overhead", type=int, default=None,
+                        help="extra bytes per frame (default the sequence number byte of multi mic frames, none for one mic)")
+
+    for name, help_text in [("profile", "profile a raw stream recorded by async_capture"),
+                            ("live", "capture from a serial port and profile it")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("source", help="stream file" if name == "profile" else "serial port")
+        command.add_argument("--mics", type=int, default=1, help="mics per frame (4 for the multi mic mode)")
+        command.add_argument("--decimation", type=int, default=1, help="4 for the multi mic mode")
+        command.add_argument("--rate", type=float, default=SAMPLE_RATE)
+        command.add_argument("--baud", type=int, default=BAUD_RATE)
+    commands.choices["live"].add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    if args.command == "budget":
+        budget_table(args.mics, args.bits, args.decimation, args.rate, args.baud, args.overhead)
+    elif args.command == "profile":
+        stats = profile_recording(args.source, args.mics, args.rate, args.decimation, args.baud)
+        print_profile(stats, args.mics, args.rate, args.decimation)
+    else:
+        import serial
+        with serial.Serial(args.source, args.baud) as ser:
+            stats = profile_live(ser, args.duration, args.mics, args.rate, args.decimation)
+        print_profile(stats, args.mics, args.rate, args.decimation)
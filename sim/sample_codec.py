@@ -0,0 +1,346 @@
+"""
+Lossless delta + Rice coding of the UART audio stream, in independent blocks.
+
+This module is also the specification for an FPGA-side encoder in front of
+uart_byte_transmit; encode_blocks is the bit-exact reference.
+
+Stream format. Samples are signed SAMPLE_BITS-bit values (the [23:10] fields the
+FPGA sends today). Each block holds block_len samples of every mic. For each mic,
+in order, the block's bit string (MSB first) carries:
+
+- k: K_BITS bits, the Rice parameter of this mic's block.
+- the first sample: SAMPLE_BITS bits, two's complement.
+- for each later sample, u = zigzag(x[n] - x[n-1]) (0, -1, 1, -2, ... -> 0, 1, 2, 3, ...),
+  coded with q = u >> k:
+  - if q < Q_MAX: q one bits, a zero bit, then the low k bits of u;
+  - otherwise (escape): Q_MAX one bits, then u in SAMPLE_BITS + 1 bits.
+
+k is the value from 0 to SAMPLE_BITS + 1 that makes the mic's block shortest,
+taking the smallest on ties. After the last mic comes the CRC-16 of every bit of
+the block before it (polynomial CRC_POLY, x^16 + x^12 + x^5 + 1, starting from zero,
+as a serial LFSR computes it while the bits go out). The block is padded with zero bits to a multiple of 7 and
+sent 7 bits per UART byte, MSB first in bits [6:0]. Bit 7 (the alignment bit) is
+set only on the last byte of a block, as in the other framings; it is the sync
+marker that lets the receiver find block boundaries and decode every block on its own.
+"""
+import argparse
+
+import numpy as np
+
+from link_budget import BAUD_RATE, PAYLOAD_BITS, SAMPLE_RATE, link_budget
+from uart_decode import SAMPLE_BITS, as_byte_array
+
+BLOCK_LEN = 64 # samples per mic in a block
+K_BITS = 5
+Q_MAX = 16 # unary length that marks an escaped (raw) code
+CRC_BITS = 16
+CRC_POLY = 0x11021
+ALIGNMENT_BIT = 0x80
+
+def zigzag(values):
+    """Map signed integers to non-negative ones: 0, -1, 1, -2, ... -> 0, 1, 2, 3, ..."""
+    values = np.asarray(values, dtype=np.int64)
+    return (values << 1) ^ (values >> 63)
+
+def unzigzag(values):
+    """Invert zigzag."""
+    values = np.asarray(values, dtype=np.int64)
+    return (values >> 1) ^ -(values & 1)
+
+def rice_lengths(u, k, sample_bits=SAMPLE_BITS):
+    """Bits taken by the Rice (or escape) code of each u with parameter k (arrays broadcast)."""
+    q = u >> k
+    return np.where(q < Q_MAX, q + 1 + k, Q_MAX + sample_bits + 1)
+
+def pack_fields(ones, stop, width, value):
+    """
+    Concatenate bit fields into one bit string.
+
+    Field i is ones[i] one bits, then stop[i] zero bits, then the low width[i] bits of
+    value[i], MSB first.
+
+    Returns:
+    - numpy array: uint8 array of bits.
+    """
+    lengths = ones + stop + width
+    offsets = np.cumsum(lengths) - lengths
+    bits = np.zeros(int(lengths.sum()), dtype=np.uint8)
+
+    ones_before = np.cumsum(ones) - ones
+    bits[np.repeat(offsets, ones) + np.arange(int(ones.sum())) - np.repeat(ones_before, ones)] = 1
+
+    max_width = int(width.max()) if len(width) else 0
+    column = np.arange(max_width)
+    in_field = column < width[:, np.newaxis]
+    shift = np.maximum(width[:, np.newaxis] - 1 - column, 0)
+    field_bits = (value[:, np.newaxis] >> shift) & 1
+    positions = (offsets + ones + stop)[:, np.newaxis] + column
+    bits[positions[in_field]] = field_bits[in_field]
+    return bits
+
+def split_blocks(mic_samples, block_len=BLOCK_LEN):
+    """
+    Cut (num_mics, num_samples) samples into (num_blocks, num_mics, block_len) blocks.
+
+    A partial last block is filled by repeating its last sample, which codes in one bit per sample.
+    """
+    mic_samples = np.atleast_2d(np.asarray(mic_samples, dtype=np.int64))
+    num_mics, num_samples = mic_samples.shape
+    num_blocks = -(-num_samples // block_len)
+    padded = np.empty((num_mics, num_blocks * block_len), dtype=np.int64)
+    padded[:, :num_samples] = mic_samples
+    if num_samples:
+        padded[:, num_samples:] = mic_samples[:, -1:]
+    return padded.reshape(num_mics, num_blocks, block_len).transpose(1, 0, 2)
+
+def crc_table(num_bits):
+    """CRC of a single one bit followed by d zero bits, for d from 0 to num_bits - 1 (the CRC is linear in the bits)."""
+    table = np.empty(num_bits, dtype=np.int64)
+    remainder = CRC_POLY & ((1 << CRC_BITS) - 1)
+    for distance in range(num_bits):
+        table[distance] = remainder
+        remainder <<= 1
+        if remainder >> CRC_BITS:
+            remainder ^= CRC_POLY
+    return table
+
+def block_crcs(bits, starts, lengths):
+    """
+    CRC of each run of bits[start:start + length], XORing the table entry of every one bit.
+
+    Returns:
+    - numpy array: int64 CRC of each run.
+    """
+    width = int(lengths.max()) if len(lengths) else 0
+    column = np.arange(width)
+    index = np.minimum(starts[:, np.newaxis] + column, len(bits) - 1)
+    distance = lengths[:, np.newaxis] - 1 - column
+    table = crc_table(width)
+    ones = (column < lengths[:, np.newaxis]) & (bits[index] == 1)
+    return np.bitwise_xor.reduce(np.where(ones, table[np.maximum(distance, 0)], 0), axis=1)
+
+def encode_blocks(mic_samples, block_len=BLOCK_LEN, sample_bits=SAMPLE_BITS):
+    """
+    Encode samples into the compressed UART byte stream.
+
+    Parameters:
+    - mic_samples (numpy array): (num_mics, num_samples) or (num_samples,) signed sample_bits-bit samples.
+    - block_len (int): Samples per mic in each block.
+    - sample_bits (int): Bits per sample.
+
+    Returns:
+    - numpy array: uint8 UART bytes (empty when there are no samples).
+    - numpy array: Bytes in each block.
+    """
+    limit = 1 << (sample_bits - 1)
+    blocks = split_blocks(mic_samples, block_len)
+    if blocks.size and (blocks.min() < -limit or blocks.max() >= limit):
+        raise ValueError(f"Samples do not fit in {sample_bits} bits")
+    num_blocks, num_mics, _ = blocks.shape
+    if not num_blocks:
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64)
+    u = zigzag(np.diff(blocks, axis=2))
+
+    # Pick the k that makes each mic's block shortest (argmin takes the smallest on ties)
+    ks = np.arange(sample_bits + 2)
+    costs = rice_lengths(u[..., np.newaxis], ks, sample_bits).sum(axis=2)
+    k = np.argmin(costs, axis=2)
+
+    # One row of fields per mic block: k, the first sample, then the codes
+    k_codes = k[..., np.newaxis]
+    q = u >> k_codes
+    escape = q >= Q_MAX
+    shape = (num_blocks, num_mics, block_len + 1)
+    ones = np.zeros(shape, dtype=np.int64)
+    stop = np.zeros(shape, dtype=np.int64)
+    width = np.empty(shape, dtype=np.int64)
+    value = np.empty(shape, dtype=np.int64)
+    width[..., 0], value[..., 0] = K_BITS, k
+    width[..., 1], value[..., 1] = sample_bits, blocks[..., 0] & ((1 << sample_bits) - 1)
+    ones[..., 2:] = np.where(escape, Q_MAX, q)
+    stop[..., 2:] = ~escape
+    width[..., 2:] = np.where(escape, sample_bits + 1, k_codes)
+    value[..., 2:] = u
+
+    # Leave room for the CRC, then zero padding to whole UART bytes
+    code_bits = (ones + stop + width).reshape(num_blocks, -1).sum(axis=1)
+    block_bits = code_bits + CRC_BITS
+    padding = -block_bits % PAYLOAD_BITS
+    zeros = np.zeros((num_blocks, 1), dtype=np.int64)
+    trailer = [zeros, zeros, (block_bits + padding - code_bits)[:, np.newaxis], zeros]
+    ones, stop, width, value = (np.concatenate([field.reshape(num_blocks, -1), extra], axis=1).reshape(-1)
+                                for field, extra in zip((ones, stop, width, value), trailer))
+    bits = pack_fields(ones, stop, width, value)
+
+    code_starts = np.cumsum(block_bits + padding) - (block_bits + padding)
+    crcs = block_crcs(bits, code_starts, code_bits)
+    column = np.arange(CRC_BITS)
+    bits[(code_starts + code_bits)[:, np.newaxis] + column] = (crcs[:, np.newaxis] >> (CRC_BITS - 1 - column)) & 1
+
+    payload = bits.reshape(-1, PAYLOAD_BITS)
+    uart_bytes = (payload << np.arange(PAYLOAD_BITS - 1, -1, -1)).sum(axis=1).astype(np.uint8)
+    block_bytes = (block_bits + padding) // PAYLOAD_BITS
+    uart_bytes[np.cumsum(block_bytes) - 1] |= ALIGNMENT_BIT
+    return uart_bytes, block_bytes
+
+def read_bits(bits, rows, positions, widths, max_width):
+    """Read a widths-bit MSB-first value at positions of each row of a 2D bit array (positions past the end read 0)."""
+    column = np.arange(max_width)
+    index = np.minimum(positions[:, np.newaxis] + column, bits.shape[1] - 1)
+    in_field = column < widths[:, np.newaxis]
+    field_bits = np.where(in_field, bits[rows[:, np.newaxis], index], 0).astype(np.int64)
+    return (field_bits << np.maximum(widths[:, np.newaxis] - 1 - column, 0)).sum(axis=1)
+
+def decode_blocks(uart_data, num_mics=1, block_len=BLOCK_LEN, sample_bits=SAMPLE_BITS):
+    """
+    Decode the compressed UART byte stream.
+
+    Blocks are found from the alignment bits and decoded in parallel, one code
+    position at a time. A block whose CRC does not match, whose codes do not
+    fill exactly its own bytes (bytes lost or corrupted inside it) or whose
+    padding is not zero is dropped; the next block decodes normally.
+
+    Parameters:
+    - uart_data (bytes-like or numpy array): Raw bytes received over UART.
+    - num_mics (int): Mics per block.
+    - block_len (int): Samples per mic in each block.
+    - sample_bits (int): Bits per sample.
+
+    Returns:
+    - numpy array: (num_mics, num_good_blocks * block_len) int64 samples.
+    - dict: Decode statistics: blocks, bad_blocks and dropped_bytes (bad blocks and bytes
+      after the last block end).
+    """
+    uart_bytes = as_byte_array(uart_data)
+    ends = np.flatnonzero(uart_bytes & ALIGNMENT_BIT)
+    starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+    num_blocks = len(ends)
+    block_bits = (ends + 1 - starts) * PAYLOAD_BITS
+    stats = {'blocks': num_blocks, 'bad_blocks': 0, 'dropped_bytes': len(uart_bytes) - (int(ends[-1]) + 1 if num_blocks else 0)}
+    if not num_blocks:
+        return np.zeros((num_mics, 0), dtype=np.int64), stats
+
+    # Payload bits of the whole stream, then one zero-padded row per block
+    stream_bits = ((uart_bytes[:, np.newaxis] >> np.arange(PAYLOAD_BITS - 1, -1, -1)) & 1).astype(np.uint8).reshape(-1)
+    width = int(block_bits.max()) + 1
+    column = np.arange(width)
+    index = starts[:, np.newaxis] * PAYLOAD_BITS + column
+    bits = np.where(column < block_bits[:, np.newaxis], stream_bits[np.minimum(index, len(stream_bits) - 1)], 0).astype(np.uint8)
+
+    # Length of the run of ones starting at every bit
+    zero_at = np.where(bits == 0, column, width)
+    next_zero = np.minimum.accumulate(zero_at[:, ::-1], axis=1)[:, ::-1]
+    ones_run = next_zero - column
+
+    rows = np.arange(num_blocks)
+    position = np.zeros(num_blocks, dtype=np.int64)
+    valid = np.ones(num_blocks, dtype=bool)
+    blocks = np.empty((num_blocks, num_mics, block_len), dtype=np.int64)
+    wide = sample_bits + 1
+    for mic in range(num_mics):
+        k = read_bits(bits, rows, position, np.full(num_blocks, K_BITS), K_BITS)
+        valid &= k <= sample_bits + 1
+        k = np.minimum(k, sample_bits + 1)
+        position += K_BITS
+        first = read_bits(bits, rows, position, np.full(num_blocks, sample_bits), sample_bits)
+        blocks[:, mic, 0] = first - ((first >> (sample_bits - 1)) << sample_bits)
+        position += sample_bits
+
+        u = np.empty((num_blocks, block_len - 1), dtype=np.int64)
+        for n in range(block_len - 1):
+            q = np.minimum(ones_run[rows, np.minimum(position, width - 1)], Q_MAX)
+            escape = q >= Q_MAX
+            position += q + ~escape
+            code_width = np.where(escape, wide, k)
+            low = read_bits(bits, rows, position, code_width, wide)
+            u[:, n] = np.where(escape, low, (q << k) | low)
+            position += code_width
+        blocks[:, mic, 1:] = blocks[:, mic, :1] + np.cumsum(unzigzag(u), axis=1)
+
+    # The CRC must match and end in the block's last byte (only padding may follow)
+    crcs = block_crcs(stream_bits, starts * PAYLOAD_BITS, np.minimum(position, block_bits))
+    received_crcs = read_bits(bits, rows, position, np.full(num_blocks, CRC_BITS), CRC_BITS)
+    position += CRC_BITS
+    valid &= (position <= block_bits) & (block_bits - position < PAYLOAD_BITS)
+    valid &= crcs == received_crcs
+    # The padding is outside the CRC, so check it is still zero
+    padding_bits = np.clip(block_bits - position, 0, PAYLOAD_BITS - 1)
+    valid &= read_bits(bits, rows, position, padding_bits, PAYLOAD_BITS - 1) == 0
+    stats['bad_blocks'] = int((~valid).sum())
+    stats['dropped_bytes'] += int((block_bits[~valid] // PAYLOAD_BITS).sum())
+    return blocks[valid].transpose(1, 0, 2).reshape(num_mics, -1), stats
+
+def evaluate_codec(mic_samples, sample_rate=SAMPLE_RATE, block_len=BLOCK_LEN, sample_bits=SAMPLE_BITS, baud_rate=BAUD_RATE):
+    """
+    Compress a recording, check it decodes back exactly, and compare its link use with the raw framing.
+
+    Each block is budgeted as one link_budget frame, so the transmitter overheads
+    (bit timing and byte gaps) are the same as for the raw frames.
+
+    Parameters:
+    - mic_samples (numpy array): (num_mics, num_samples) signed sample_bits-bit samples.
+    - sample_rate (float): Frame rate of the samples, in Hz.
+    - block_len (int): Samples per mic in each block.
+    - sample_bits (int): Bits per sample.
+    - baud_rate (int): UART baud rate.
+
+    Returns:
+    - dict: bits_per_sample (payload bits on the wire), compression_ratio (raw frame bytes over
+      compressed bytes), lossless (whether decoding reproduced the input), and the link_budget
+      results raw, mean (for the mean block size) and peak (as if every block were the largest).
+    """
+    mic_samples = np.atleast_2d(np.asarray(mic_samples, dtype=np.int64))
+    num_mics, num_samples = mic_samples.shape
+    uart_bytes, block_bytes = encode_blocks(mic_samples, block_len, sample_bits)
+    decoded, _ = decode_blocks(uart_bytes, num_mics, block_len, sample_bits)
+
+    block_rate = sample_rate / block_len
+    raw = link_budget(num_mics, sample_bits, sample_rate, baud_rate=baud_rate)
+    padded_samples = len(block_bytes) * block_len
+    return {
+        'bits_per_sample': len(uart_bytes) * PAYLOAD_BITS / (padded_samples * num_mics),
+        'compression_ratio': raw['frame_bytes'] * padded_samples / len(uart_bytes),
+        'lossless': bool(np.array_equal(decoded[:, :num_samples], mic_samples)),
+        'raw': raw,
+        'mean': link_budget(1, block_bytes.mean() * PAYLOAD_BITS, block_rate, baud_rate=baud_rate),
+        'peak': link_budget(1, block_bytes.max() * PAYLOAD_BITS, block_rate, baud_rate=baud_rate),
+    }
+
+def load_samples(path, sample_bits=SAMPLE_BITS):
+    """
+    Load a recording as signed sample_bits-bit samples: a capture_file capture or a 16-bit WAV.
+
+    The host stores the 14-bit fields shifted up to the file's bit depth, so they are shifted back down.
+
+    Returns:
+    - numpy array: (num_mics, num_samples) samples.
+    - float: Sample rate, in Hz.
+    """
+    if str(path).endswith(".wav"):
+        import wave
+        with wave.open(str(path), 'rb') as wav:
+            sample_rate = wav.getframerate()
+            frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').reshape(-1, wav.getnchannels())
+        samples, bit_depth = frames.T, 16
+    else:
+        from capture_file import CaptureFile
+        capture = CaptureFile(path)
+        sample_rate = capture.sample_rate
+        samples, bit_depth = np.asarray(capture.mic_signals), capture.header['bit_depth']
+    return samples.astype(np.int64) >> max(bit_depth - sample_bits, 0), sample_rate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the delta + Rice codec on recorded captures.")
+    parser.add_argument("recordings", nargs="+", help=".cap captures or 16-bit .wav files")
+    parser.add_argument("--block", type=int, default=BLOCK_LEN, help="samples per mic in each block")
+    args = parser.parse_args()
+
+    for path in args.recordings:
+        mic_samples, sample_rate = load_samples(path)
+        stats = evaluate_codec(mic_samples, sample_rate, args.block)
+        print(f"{path}: {mic_samples.shape[0]} mics at {sample_rate} Hz, {stats['bits_per_sample']:.2f} bits/sample, "
+              f"ratio {stats['compression_ratio']:.2f}, {'lossless' if stats['lossless'] else 'DECODE MISMATCH'}")
+        for name in ('raw', 'mean', 'peak'):
+            budget = stats[name]
+            print(f"  {name:>4}: link {budget['utilization'] * 100:5.1f}%, transmitter {budget['tx_utilization'] * 100:5.1f}%, "
+                  f"{'fits' if budget['fits'] else 'does not fit'}")
@@ -1,8 +1,11 @@
 import numpy as np
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
-import soundfile as sf
+
+from delay_tables import delay_table, steering_delays
+
+# Taps of the windowed-sinc fractional delay filters (odd, so whole-sample delays stay exact)
+FRACTIONAL_DELAY_TAPS = 31
+# Samples beamform_scan sums at a time for every delay group
+SCAN_BLOCK_SIZE = 8192
 
 def beamforming_delay(angle, distance_between_microphones, num_microphones):
     """
@@ -10,53 +13,384 @@ def beamforming_delay(angle, distance_between_microphones, num_microphones):
     based on the desired steering angle and the number of microphones in the array.
 
     Args:
-        angle: the desired steering angle in degrees.
+        angle: the desired steering angle in degrees, or an array of angles.
         distance_between_microphones: the distance between microphones.
         num_microphones: the number of microphones.
 
     Returns:
-        np.ndarray: An array of time delays in seconds for each microphone.
+        np.ndarray: An array of time delays in seconds for each microphone,
+        with shape (num_angles, num_microphones) when an array of angles is given.
+    """
+
+    # Calculate the delay for each microphone (and each angle, if several are given)
+    return steering_delays(angle, num_microphones, distance_between_microphones)
+
+
+def split_delays(delays, num_mics):
+    """
+    Reference delays (in samples) to the earliest mic and split them into whole and fractional parts.
+
+    Parameters:
+    - delays (array-like of int or float): Delay (in samples) for each microphone.
+    - num_mics (int): Number of microphones the delays should cover.
+
+    Returns:
+    - numpy array: Non-negative whole-sample delays (int64).
+    - numpy array: Fractional part of each delay, in [0, 1).
+    """
+    delays = np.asarray(delays, dtype=np.float64).reshape(-1)
+    if len(delays) != num_mics:
+        raise ValueError(f"Expected {num_mics} delays, got {len(delays)}")
+    if num_mics and delays.min() < 0:
+        delays = delays - delays.min()
+
+    int_delays = np.floor(delays).astype(np.int64)
+    return int_delays, delays - int_delays
+
+
+def accumulator_dtype(signal_dtype, frac_delays):
+    """Pick the dtype used to sum delayed mics: exact int64 for integer audio and whole-sample delays, float otherwise."""
+    if np.any(frac_delays) or not np.issubdtype(signal_dtype, np.integer):
+        return np.result_type(signal_dtype, np.float64)
+    return np.dtype(np.int64)
+
+
+def fractional_delay_filters(frac_delays, num_taps=FRACTIONAL_DELAY_TAPS):
+    """
+    Blackman-windowed sinc FIR filters delaying by a fraction of a sample.
+
+    Each filter also delays by (num_taps - 1) // 2 whole samples, its center tap.
+
+    Parameters:
+    - frac_delays (array-like of float): Fractional delay for each microphone, in [0, 1).
+    - num_taps (int): Filter length (odd, at least 3).
+
+    Returns:
+    - numpy array: (num_mics, num_taps) filter taps, each normalized to unit DC gain.
+    """
+    if num_taps < 3 or num_taps % 2 == 0:
+        raise ValueError(f"num_taps must be odd and at least 3, got {num_taps}")
+    frac_delays = np.asarray(frac_delays, dtype=np.float64).reshape(-1)
+    taps = np.arange(num_taps) - (num_taps - 1) // 2
+    filters = np.sinc(taps[np.newaxis, :] - frac_delays[:, np.newaxis]) * np.blackman(num_taps)
+    return filters / filters.sum(axis=1, keepdims=True)
+
+
+def sinc_delay_and_sum(mic_signals, int_delays, frac_delays, out_len, return_delayed=False, num_taps=FRACTIONAL_DELAY_TAPS):
+    """
+    Delay-and-sum with windowed-sinc fractional delays, filtering every mic in one batched FFT.
+
+    Each mic's whole-sample delay is folded into its filter as a linear phase, and
+    the FFT is long enough that the circular convolution never wraps.
+
+    Parameters:
+    - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+    - int_delays (numpy array): Non-negative whole-sample delay for each microphone.
+    - frac_delays (numpy array): Fractional delay for each microphone, in [0, 1).
+    - out_len (int): Output length.
+    - return_delayed (bool): Also return the per-mic delayed signals.
+    - num_taps (int): Fractional delay filter length.
+
+    Returns:
+    - numpy array: The beamformed (summed) output signal.
+    - numpy array or None: (num_mics, out_len) delayed mic signals, or None when return_delayed is False.
+    """
+    num_samples = mic_signals.shape[1]
+    center = (num_taps - 1) // 2
+    fft_len = num_samples + int(int_delays.max()) + num_taps - 1
+
+    filters = np.fft.rfft(fractional_delay_filters(frac_delays, num_taps), fft_len)
+    shifts = np.exp(-2j * np.pi * np.fft.rfftfreq(fft_len)[np.newaxis, :] * int_delays[:, np.newaxis])
+    spectra = np.fft.rfft(mic_signals, fft_len) * filters * shifts
+
+    # Drop the filters' center-tap delay so the output lines up with the other modes
+    if return_delayed:
+        delayed_outputs = np.fft.irfft(spectra, fft_len)[:, center:center + out_len]
+        return delayed_outputs.sum(axis=0), delayed_outputs
+    return np.fft.irfft(spectra.sum(axis=0), fft_len)[center:center + out_len], None
+
+
+def delay_and_sum_samples(mic_signals, delays, return_delayed=False, interpolation='linear', num_taps=FRACTIONAL_DELAY_TAPS):
     """
+    Vectorized delay-and-sum engine working directly in samples.
 
-    # Calculate the delay for each microphone
-    delays = np.array([(i * distance_between_microphones * np.cos(angle * np.pi / 180) / 343) for i in range(num_microphones)])
+    Each microphone row is added into the output with a single slice operation,
+    so the cost is a handful of numpy calls per mic instead of a Python-level
+    loop per sample. Integer delays are applied as pure slice offsets; fractional
+    delays are split into an integer offset plus a linear interpolation between
+    neighbouring samples, or with interpolation='sinc' a windowed-sinc fractional
+    delay filter (see sinc_delay_and_sum). Negative delays (steering angles past
+    90 degrees) are referenced to the earliest microphone, the same way
+    angle_delay_lut.sv reverses its delays, so every applied offset is non-negative.
 
-    return delays
+    Parameters:
+    - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+    - delays (array-like of int or float): Delay (in samples) to apply to each microphone.
+    - return_delayed (bool): Also return the per-mic delayed signals.
+    - interpolation (str): 'linear' or 'sinc' handling of fractional delays.
+    - num_taps (int): Filter length for interpolation='sinc'.
 
+    Returns:
+    - numpy array: The beamformed (summed) output signal of length num_samples + max delay.
+    - numpy array or None: (num_mics, output length) array of delayed mic signals,
+      or None when return_delayed is False.
+    """
+    mic_signals = np.asarray(mic_signals)
+    if mic_signals.ndim == 1:
+        mic_signals = mic_signals[np.newaxis, :]
+    num_mics, num_samples = mic_signals.shape
+
+    if interpolation not in ('linear', 'sinc'):
+        raise ValueError(f"Unknown interpolation {interpolation!r}")
+    int_delays, frac_delays = split_delays(delays, num_mics)
+    dtype = accumulator_dtype(mic_signals.dtype, frac_delays)
+
+    out_len = num_samples + (int(np.ceil((int_delays + frac_delays).max())) if num_mics else 0)
+    if interpolation == 'sinc' and np.any(frac_delays):
+        return sinc_delay_and_sum(mic_signals, int_delays, frac_delays, out_len, return_delayed, num_taps)
+    output_signal = np.zeros(out_len, dtype=dtype)
+    delayed_outputs = np.zeros((num_mics, out_len), dtype=dtype) if return_delayed else None
+
+    for mic, (delay, frac) in enumerate(zip(int_delays, frac_delays)):
+        # Write into the per-mic row if requested, otherwise straight into the sum
+        target = delayed_outputs[mic] if return_delayed else output_signal
+        if frac == 0:
+            target[delay:delay + num_samples] += mic_signals[mic]
+        else:
+            target[delay:delay + num_samples] += (1 - frac) * mic_signals[mic]
+            target[delay + 1:delay + 1 + num_samples] += frac * mic_signals[mic]
+
+    if return_delayed:
+        output_signal = delayed_outputs.sum(axis=0)
+
+    return output_signal, delayed_outputs
 
-def delay_and_sum(mic_signals, delays):
+
+def delay_and_sum(mic_signals, delays, sr=44100, fractional=False):
     """
     Perform delay-and-sum beamforming on multiple microphone signals.
     
     Parameters:
     - mic_signals (list of numpy arrays): List of audio signals from different microphones.
     - delays (list of float): Time delays (in seconds) to apply to each signal.
+    - sr (float): Sample rate of the signals (default is 44100 Hz).
+    - fractional (bool): Apply the exact delays with windowed-sinc fractional delay
+      filters instead of truncating them to whole samples like the FPGA does.
 
     Returns:
     - numpy array: The beamformed output signal.
+    - numpy array: (num_mics, output length) array of the delayed microphone signals.
     """
 
-    # Find the maximum length of the input signals
-    max_len = max((delays[i] * 44100) + len(mic_signals[i]) for i in range(len(mic_signals)))
+    # Calculate the number of samples to delay (truncated to whole samples unless fractional)
+    if fractional:
+        delay_samples = np.asarray(delays, dtype=np.float64) * sr
+    else:
+        delay_samples = np.array([int(delay * sr) for delay in delays])
 
-    # Apply delays (in samples) and sum
-    output_signal = np.zeros(int(max_len))
-    delayed_outputs = [np.zeros(int(max_len)) for i in range(len(mic_signals))]
-    sample_idx = 0
+    # Pad mismatched recordings to a common length; the padding only adds
+    # trailing zeros, which are trimmed back off the output below
+    signal_lens = [len(signal) for signal in mic_signals]
+    max_len = max(signal_lens)
+    mic_array = np.zeros((len(mic_signals), max_len), dtype=np.result_type(*mic_signals))
+    for signal_idx, signal in enumerate(mic_signals):
+        mic_array[signal_idx, :len(signal)] = signal
 
-    for signal, delay in zip(mic_signals, delays):
+    output_signal, delayed_outputs = delay_and_sum_samples(mic_array, delay_samples, return_delayed=True,
+                                                           interpolation='sinc' if fractional else 'linear')
 
-        # Calculate the number of samples to delay
-        delay_samples = int(delay * 44100)  # Assuming 44.1 KHz sample rate
-        signal_len = len(signal)
+    out_len = int(max(np.ceil(delay_samples - min(delay_samples.min(), 0)) + signal_lens))
+    output_signal = output_signal[:out_len].astype(np.float64)
+    delayed_outputs = delayed_outputs[:, :out_len].astype(np.float64)
 
-        for i in range (delay_samples, delay_samples + signal_len):
-            delayed_outputs[sample_idx][i] = signal[i-delay_samples]
-            output_signal[i] += signal[i-delay_samples]
+    return output_signal, delayed_outputs
 
-        sample_idx += 1
 
-    return output_signal, delayed_outputs
+class StreamingBeamformer:
+    """
+    Block-based delay-and-sum beamformer with memory bounded by the largest delay.
+
+    Like delay_bram.sv, each mic writes its samples into a fixed-depth ring buffer
+    and the delayed samples are read back at (write address - delay), wrapping
+    around the buffer. Chunks of any size can be pushed in; each call returns as
+    many output samples as it was given, and flush() returns the tail still held
+    in the buffers. Concatenating every output reproduces delay_and_sum_samples
+    on the whole recording exactly, including the summation order.
+    """
+
+    def __init__(self, delays, num_mics=None, depth=2048):
+        """
+        Parameters:
+        - delays (array-like of int or float): Delay (in samples) to apply to each microphone.
+        - num_mics (int): Number of microphones (default is the number of delays).
+        - depth (int): Ring buffer entries per mic (default matches the 2048-entry delay BRAM).
+        """
+        num_mics = len(delays) if num_mics is None else num_mics
+        self.int_delays, self.frac_delays = split_delays(delays, num_mics)
+        self.num_mics = num_mics
+        self.depth = depth
+        # Oldest sample a read can reach back to, including the interpolation tap
+        self.history = int(self.int_delays.max()) + int(np.any(self.frac_delays)) if num_mics else 0
+        self.tail = int(np.ceil((self.int_delays + self.frac_delays).max())) if num_mics else 0
+        if self.history >= depth:
+            raise ValueError(f"Delay of {self.history} samples does not fit in a {depth}-entry ring buffer")
+
+        self.ring = None
+        self.write_addr = 0
+        self.samples_in = 0
+
+    def _allocate(self, signal_dtype):
+        dtype = accumulator_dtype(signal_dtype, self.frac_delays)
+        self.ring = np.zeros((self.num_mics, self.depth), dtype=dtype)
+
+    def _process_block(self, block):
+        num_samples = block.shape[1]
+        write_addrs = (self.write_addr + np.arange(num_samples)) % self.depth
+        self.ring[:, write_addrs] = block
+
+        output_signal = np.zeros(num_samples, dtype=self.ring.dtype)
+        for mic, (delay, frac) in enumerate(zip(self.int_delays, self.frac_delays)):
+            delayed = self.ring[mic].take(write_addrs - delay, mode='wrap')
+            if frac == 0:
+                output_signal += delayed
+            else:
+                output_signal += (1 - frac) * delayed
+                output_signal += frac * self.ring[mic].take(write_addrs - delay - 1, mode='wrap')
+
+        self.write_addr = (self.write_addr + num_samples) % self.depth
+        self.samples_in += num_samples
+        return output_signal
+
+    def process(self, chunk):
+        """
+        Push a chunk of samples through the beamformer.
+
+        Parameters:
+        - chunk (numpy array): (num_mics, chunk_len) array of new microphone samples.
+
+        Returns:
+        - numpy array: The next chunk_len samples of the beamformed output.
+        """
+        chunk = np.asarray(chunk)
+        if chunk.ndim == 1:
+            chunk = chunk[np.newaxis, :]
+        if chunk.shape[0] != self.num_mics:
+            raise ValueError(f"Expected {self.num_mics} mics, got {chunk.shape[0]}")
+        if self.ring is None:
+            self._allocate(chunk.dtype)
+
+        # Never write so far ahead that still-needed history gets overwritten
+        block_len = self.depth - self.history
+        outputs = [self._process_block(chunk[:, start:start + block_len])
+                   for start in range(0, chunk.shape[1], block_len)]
+        return np.concatenate(outputs) if outputs else np.zeros(0, dtype=self.ring.dtype)
+
+    def flush(self):
+        """
+        Drain the delayed samples still held in the ring buffers.
+
+        Returns:
+        - numpy array: The final samples of the beamformed output (one per sample of delay).
+        """
+        if self.ring is None:
+            self._allocate(np.float64)
+        return self.process(np.zeros((self.num_mics, self.tail), dtype=self.ring.dtype))
+
+    def stream(self, chunks):
+        """
+        Beamform an iterable of chunks lazily, yielding output chunks followed by the flushed tail.
+
+        Parameters:
+        - chunks (iterable of numpy arrays): (num_mics, chunk_len) arrays of microphone samples.
+
+        Yields:
+        - numpy array: Beamformed output chunks.
+        """
+        for chunk in chunks:
+            yield self.process(chunk)
+        yield self.flush()
+
+
+def scan_beam(mic_signals, distance_between_microphones, sr, angle):
+    """
+    Beamform a recording toward one steering angle, exactly as beamform_scan measures it.
+
+    Parameters:
+    - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+    - distance_between_microphones (float): Distance between microphones, in m.
+    - sr (float): Sample rate of the recording, in Hz.
+    - angle (float): Steering angle, in degrees.
+
+    Returns:
+    - numpy array: (num_samples,) beamformed output (sum divided by the number of mics).
+    """
+    mic_signals = np.asarray(mic_signals, dtype=np.float64)
+    num_mics, num_samples = mic_signals.shape
+    delays = delay_table(num_mics, distance_between_microphones, sr).lookup(angle, 'integer')
+    output_signal, _ = delay_and_sum_samples(mic_signals, delays)
+    return output_signal[:num_samples] / num_mics
+
+
+def beamform_scan(mic_signals, distance_between_microphones, sr=44100, angles=range(181), return_signals=False,
+                  block_size=SCAN_BLOCK_SIZE):
+    """
+    Beamform one multi-channel recording toward every steering angle in a single pass.
+
+    Delays are looked up for all angles at once in the cached delay table for the
+    array (see delay_tables.py) and truncated to whole samples like delay_and_sum.
+    Angles that round to the same set of integer delays are grouped, so each
+    distinct delay set is only summed once. The recording is walked in blocks of
+    block_size samples; every group reads its shifted copies of each mic out of
+    strided views of the block and only its summed power is kept, so memory does
+    not grow with the length of the recording.
+
+    Parameters:
+    - mic_signals (numpy array): (num_mics, num_samples) array of microphone signals.
+    - distance_between_microphones (float): Distance between microphones, in m.
+    - sr (float): Sample rate of the recording, in Hz.
+    - angles (array-like): Steering angles to scan, in degrees (default is 0 to 180).
+    - return_signals (bool): Also return the beamformed signal at the angle with the most power.
+    - block_size (int): Output samples summed at a time.
+
+    Returns:
+    - numpy array: (num_angles,) mean power of the beamformed output at each angle,
+      averaged over the samples where every mic contributes.
+    - numpy array or None: (num_samples,) beamformed output at the first angle with the
+      most power (sum divided by the number of mics, see scan_beam), or None when
+      return_signals is False.
+    """
+    mic_signals = np.asarray(mic_signals, dtype=np.float64)
+    num_mics, num_samples = mic_signals.shape
+    if block_size <= 0:
+        raise ValueError(f"block_size must be positive, got {block_size}")
+
+    # (num_angles, num_mics) integer delays, referenced to the earliest mic per angle
+    delay_samples = delay_table(num_mics, distance_between_microphones, sr).lookup(angles, 'integer')
+    max_delay = int(delay_samples.max())
+    if max_delay >= num_samples:
+        raise ValueError(f"Recording of {num_samples} samples is shorter than the largest delay ({max_delay} samples)")
+
+    # Many angles share the same integer delays; only beamform each distinct set once
+    delay_groups, angle_group = np.unique(delay_samples, axis=0, return_inverse=True)
+    angle_group = angle_group.reshape(-1)
+
+    # Only samples every mic contributes to count, so each block starts at least max_delay in
+    group_energy = np.zeros(len(delay_groups))
+    for start in range(max_delay, num_samples, block_size):
+        stop = min(start + block_size, num_samples)
+        block = np.zeros((len(delay_groups), stop - start))
+        for mic in range(num_mics):
+            # Row k of shifted is the block of the mic signal delayed by (max_delay - k) samples
+            shifted = np.lib.stride_tricks.sliding_window_view(mic_signals[mic, start - max_delay:stop], stop - start)
+            block += shifted[max_delay - delay_groups[:, mic]]
+        block /= num_mics
+        group_energy += np.einsum('gn,gn->g', block, block)
+
+    power_map = (group_energy / (num_samples - max_delay))[angle_group]
+    if not return_signals:
+        return power_map, None
+    best_angle = np.asarray(angles).reshape(-1)[np.argmax(power_map)]
+    return power_map, scan_beam(mic_signals, distance_between_microphones, sr, best_angle)
 
 
 def load_audio(file_paths, sr=44100):
@@ -70,6 +404,8 @@ def load_audio(file_paths, sr=44100):
     Returns:
     - List of numpy arrays containing the audio data.
     """
+    import librosa
+
     mic_signals = []
     for path in file_paths:
         signal, _ = librosa.load(path, sr=sr)  # Load with specified sample rate
@@ -85,11 +421,16 @@ def save_audio(output_signal, output_path, sr=44100):
     - output_path (str): The path where to save the output.
     - sr (int): The sample rate of the audio.
     """
+    import soundfile as sf
+
     # Use soundfile to save the audio file
     sf.write(output_path, output_signal, sr)
 
 # Example usage
 if __name__ == "__main__":
+    import librosa.display
+    import matplotlib.pyplot as plt
+
     # Load the audio signals from different microphones
     file_paths = ['secret_revealed.wav', 'secret_revealed.wav']
     mic_signals = load_audio(file_paths)
@@ -1,7 +1,8 @@
 import serial
 import numpy as np
 import matplotlib.pyplot as plt
-import wave
+
+from wav_export import save_wave
 
 # note: we will need to change our BAUD rate to match the clock we run our UART transmission at.
 # we will also need to change SAMPLE_RATE to the correct value.
@@ -24,17 +25,11 @@ for i in range(SAMPLE_RATE*AUDIO_LENGTH):
         print(f"{(i+1)/SAMPLE_RATE} seconds complete")
     ypoints.append(val)
 
-# save audio to wavefile
-with wave.open('output.wav','wb') as wf:
-    wf.setframerate(SAMPLE_RATE)
-    wf.setnchannels(1)
-    wf.setsampwidth(2) # 16 bits = 2 byte sample width
-    samples = bytearray(ypoints)
-    wf.writeframes(samples)
-    print("Recording saved to output.wav")
+# Convert to numpy array for processing (the samples were read as unsigned 16-bit values)
+audio_samples = np.array(ypoints, dtype=np.uint16).view(np.int16)
 
-# Convert to numpy array for processing
-audio_samples = np.array(ypoints, dtype=np.int16)
+# save audio to wavefile
+save_wave('output', audio_samples, SAMPLE_RATE)
 
 # Plot the audio samples
 plt.plot(audio_samples)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The sim scripts import each other by module name, as when run from sim/
+sys.path.append(str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,49 @@
+import asyncio
+import csv
+
+import numpy as np
+import pytest
+
+from async_capture import FakeSerialDevice, capture_boards
+
+def board_stream(seed, num_bytes):
+    """Distinct random bytes for each board, so mixed up streams show"""
+    return np.random.default_rng(seed).integers(0, 256, size=num_bytes, dtype=np.uint8).tobytes()
+
+async def feed(device, data, piece=97):
+    """Write data to a fake board a piece at a time, as a UART would trickle it in"""
+    await asyncio.sleep(0.05)
+    for start in range(0, len(data), piece):
+        device.write(data[start:start + piece])
+        await asyncio.sleep(0.002)
+
+@pytest.fixture
+def devices():
+    devices = [FakeSerialDevice(), FakeSerialDevice()]
+    yield devices
+    for device in devices:
+        device.close()
+
+def test_capture_two_boards(devices, tmp_path):
+    streams = {'array_a': board_stream(0, 20_000), 'array_b': board_stream(1, 15_000)}
+    ports = {name: device.port for name, device in zip(streams, devices)}
+
+    async def run():
+        stats, *_ = await asyncio.gather(capture_boards(ports, 1.5, out_dir=tmp_path),
+                                         *(feed(device, data) for device, data in zip(devices, streams.values())))
+        return stats
+    stats = asyncio.run(run())
+
+    for name, data in streams.items():
+        assert stats[name]['bytes'] == len(data)
+        assert (tmp_path / f"{name}.bin").read_bytes() == data
+        # The chunk index covers the stream in order, without gaps or overlaps
+        with open(tmp_path / f"{name}.chunks.csv") as index_file:
+            rows = list(csv.DictReader(index_file))
+        assert len(rows) == stats[name]['chunks']
+        offsets = [int(row['offset']) for row in rows]
+        lengths = [int(row['length']) for row in rows]
+        assert offsets == list(np.cumsum([0] + lengths[:-1]))
+        assert sum(lengths) == len(data)
+        timestamps = [float(row['timestamp']) for row in rows]
+        assert timestamps == sorted(timestamps)
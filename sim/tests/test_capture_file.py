@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from capture_file import HEADER_SIZE, CaptureFile, CaptureWriter, index_path, read_header, write_capture
+
+SAMPLE_RATE = 39062.5 / 4
+
+def random_samples(rng, bit_depth, num_mics, num_frames):
+    """Signed samples spanning the whole bit_depth range"""
+    return rng.integers(-(1 << (bit_depth - 1)), 1 << (bit_depth - 1), size=(num_mics, num_frames))
+
+@pytest.mark.parametrize("bit_depth, dtype", [(14, np.int16), (24, np.int32)])
+def test_round_trip(tmp_path, bit_depth, dtype):
+    samples = random_samples(np.random.default_rng(bit_depth), bit_depth, 4, 1000)
+    write_capture(tmp_path / "session.cap", samples, SAMPLE_RATE, bit_depth, angle=-30)
+
+    assert read_header(tmp_path / "session.cap") == {'sample_rate': SAMPLE_RATE, 'num_mics': 4, 'bit_depth': bit_depth, 'angle': -30}
+    capture = CaptureFile(tmp_path / "session.cap")
+    assert isinstance(capture.frames, np.memmap) and capture.frames.dtype == dtype
+    assert len(capture) == 1000 and capture.angle == -30
+    np.testing.assert_array_equal(capture.mic_signals, samples)
+    np.testing.assert_array_equal(capture.signals(100, 300), samples[:, 100:300])
+    np.testing.assert_array_equal(np.concatenate(list(capture.blocks(256)), axis=1), samples)
+    # Frames are interleaved right after the header
+    raw = (tmp_path / "session.cap").read_bytes()[HEADER_SIZE:]
+    np.testing.assert_array_equal(np.frombuffer(raw, dtype=dtype).reshape(1000, 4), samples.T)
+
+def test_mono_capture(tmp_path):
+    samples = random_samples(np.random.default_rng(1), 16, 1, 500)[0]
+    write_capture(tmp_path / "mono.cap", samples, SAMPLE_RATE)
+    capture = CaptureFile(tmp_path / "mono.cap")
+    assert capture.num_mics == 1 and capture.angle is None
+    np.testing.assert_array_equal(capture.mic_signals[0], samples)
+
+def test_sweep_index(tmp_path):
+    rng = np.random.default_rng(2)
+    sweeps = {angle: random_samples(rng, 14, 4, length) for angle, length in [(0, 300), (45, 120), (90, 1), (135, 250)]}
+    with CaptureWriter(tmp_path / "sweep.cap", SAMPLE_RATE, num_mics=4, bit_depth=14) as capture:
+        for angle, samples in sweeps.items():
+            capture.add_sweep(samples, angle)
+
+    assert index_path(tmp_path / "sweep.cap").read_text().splitlines() == [
+        "start,length,angle", "0,300,0", "300,120,45", "420,1,90", "421,250,135"]
+    capture = CaptureFile(tmp_path / "sweep.cap")
+    assert [sweep['start'] for sweep in capture.sweeps] == [0, 300, 420, 421]
+    for position, (angle, samples) in enumerate(sweeps.items()):
+        np.testing.assert_array_equal(capture.sweep_signals(position), samples)
+        assert capture.sweep_at(angle) == capture.sweeps[position]
+        np.testing.assert_array_equal(capture.sweep_signals(capture.sweep_at(angle)), samples)
+    with pytest.raises(ValueError):
+        capture.sweep_at(10)
+
+def test_append(tmp_path):
+    rng = np.random.default_rng(3)
+    first, second, again = (random_samples(rng, 24, 4, length) for length in (200, 150, 80))
+    with CaptureWriter(tmp_path / "session.cap", SAMPLE_RATE, num_mics=4, bit_depth=24) as capture:
+        capture.add_sweep(first, 0)
+    with CaptureWriter(tmp_path / "session.cap", SAMPLE_RATE, num_mics=4, bit_depth=24, append=True) as capture:
+        assert capture.num_frames == 200
+        capture.add_sweep(second, 90)
+        capture.add_sweep(again, 0)
+
+    capture = CaptureFile(tmp_path / "session.cap")
+    np.testing.assert_array_equal(capture.mic_signals, np.concatenate([first, second, again], axis=1))
+    assert capture.sweeps == [{'start': 0, 'length': 200, 'angle': 0}, {'start': 200, 'length': 150, 'angle': 90},
+                              {'start': 350, 'length': 80, 'angle': 0}]
+    # The last sweep at an angle wins
+    np.testing.assert_array_equal(capture.sweep_signals(capture.sweep_at(0)), again)
+
+def test_append_after_cut_frame(tmp_path):
+    # A capture cut mid-frame keeps its complete frames, and appended frames start right after them
+    samples = random_samples(np.random.default_rng(4), 14, 4, 10)
+    write_capture(tmp_path / "cut.cap", samples, SAMPLE_RATE, 14)
+    with open(tmp_path / "cut.cap", 'ab') as f:
+        f.write(b'\1\2\3')
+    with CaptureWriter(tmp_path / "cut.cap", SAMPLE_RATE, num_mics=4, bit_depth=14, append=True) as capture:
+        capture.write(samples)
+    np.testing.assert_array_equal(CaptureFile(tmp_path / "cut.cap").mic_signals, np.concatenate([samples, samples], axis=1))
+
+def test_append_mismatch(tmp_path):
+    write_capture(tmp_path / "session.cap", np.zeros((4, 10)), SAMPLE_RATE, 14)
+    with pytest.raises(ValueError):
+        CaptureWriter(tmp_path / "session.cap", SAMPLE_RATE, num_mics=2, bit_depth=14, append=True)
+    with pytest.raises(ValueError):
+        CaptureWriter(tmp_path / "session.cap", SAMPLE_RATE, num_mics=4, bit_depth=24, append=True)
+    # Appending to a capture that does not exist yet creates it
+    with CaptureWriter(tmp_path / "new.cap", SAMPLE_RATE, num_mics=4, bit_depth=14, append=True) as capture:
+        capture.add_sweep(np.ones((4, 5)), 0)
+    assert len(CaptureFile(tmp_path / "new.cap")) == 5
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import delay_tables
+from delay_tables import (CACHE_SIZE, DelayTable, cache_path, clear_cache, delay_table, load_table, save_table,
+                          steering_delays, table_key)
+
+GEOMETRY = (4, 0.06, 39062.5)
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+def test_hit_returns_same_table(tmp_path):
+    table = delay_table(*GEOMETRY, cache_dir=tmp_path)
+    assert delay_table(*GEOMETRY, cache_dir=tmp_path) is table
+    # Keys are normalized, so equal geometries written differently hit too
+    assert delay_table(4.0, 0.06, 39062.5, 343, 1, cache_dir=tmp_path) is table
+    assert delay_tables._cached_table.cache_info().hits == 2
+    with pytest.raises(ValueError):
+        table.integer[0, 0] = 1
+
+def test_table_values():
+    table = delay_table(*GEOMETRY, cache_dir=None)
+    assert table.angles.tolist() == list(range(181))
+    np.testing.assert_allclose(table.seconds[60], np.arange(4) * 0.06 * 0.5 / 343)
+    assert table.integer.min(axis=1).tolist() == [0] * 181 and table.integer.dtype == np.int64
+    np.testing.assert_allclose(table.lookup(37.5, 'seconds'), steering_delays(37.5, 4, 0.06))
+
+def test_changed_geometry_misses(tmp_path):
+    table = delay_table(*GEOMETRY, cache_dir=tmp_path)
+    for geometry in [(2, 0.06, 39062.5), (4, 0.05, 39062.5), (4, 0.06, 44100)]:
+        assert delay_table(*geometry, cache_dir=tmp_path) is not table
+    assert delay_table(*GEOMETRY, speed_of_sound=340, cache_dir=tmp_path) is not table
+    other = delay_table(*GEOMETRY, resolution=0.5, cache_dir=tmp_path)
+    assert other is not table and len(other.angles) == 361
+    assert len(list(tmp_path.glob("*.npz"))) == 6
+
+def test_lru_eviction():
+    tables = [delay_table(num_mics, 0.06, 39062.5, cache_dir=None) for num_mics in range(1, CACHE_SIZE + 1)]
+    # Touch the first table so the second is the least recently used
+    assert delay_table(1, 0.06, 39062.5, cache_dir=None) is tables[0]
+    delay_table(CACHE_SIZE + 1, 0.06, 39062.5, cache_dir=None)
+    assert delay_tables._cached_table.cache_info().currsize == CACHE_SIZE
+    assert delay_table(1, 0.06, 39062.5, cache_dir=None) is tables[0]
+    assert delay_table(2, 0.06, 39062.5, cache_dir=None) is not tables[1]
+
+def test_save_and_reload(tmp_path, monkeypatch):
+    table = delay_table(*GEOMETRY, cache_dir=tmp_path)
+    path = cache_path(table.key, tmp_path)
+    assert path.exists() and [file.name for file in tmp_path.iterdir()] == [path.name]
+
+    # A fresh process (an empty memory cache) reads the saved table instead of computing it
+    clear_cache()
+    computed = []
+    original_init = DelayTable.__init__
+    def tracking_init(self, *args, **kwargs):
+        computed.append(kwargs.get('arrays') is None)
+        original_init(self, *args, **kwargs)
+    monkeypatch.setattr(DelayTable, '__init__', tracking_init)
+    reloaded = delay_table(*GEOMETRY, cache_dir=tmp_path)
+    assert computed == [False] and reloaded is not table and reloaded.key == table.key
+    for name in ('angles',) + DelayTable.KINDS:
+        np.testing.assert_array_equal(getattr(reloaded, name), getattr(table, name))
+        assert getattr(reloaded, name).dtype == getattr(table, name).dtype
+
+def test_load_rejects_other_tables(tmp_path):
+    table = DelayTable(*GEOMETRY)
+    save_table(table, tmp_path / "table.npz")
+    assert load_table(table.key, tmp_path / "table.npz") is not None
+    assert load_table(table_key(2, 0.06, 39062.5), tmp_path / "table.npz") is None
+    assert load_table(table.key, tmp_path / "missing.npz") is None
+
+    # A damaged file is recomputed and replaced
+    path = cache_path(table.key, tmp_path)
+    path.write_bytes(b"not an npz")
+    np.testing.assert_array_equal(delay_table(*GEOMETRY, cache_dir=tmp_path).integer, table.integer)
+    assert load_table(table.key, path) is not None
+    assert not list(tmp_path.glob(".*.tmp"))
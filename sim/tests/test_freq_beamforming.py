@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import freq_beamforming
+from freq_beamforming import FrequencyBeamformer
+from sim_beamforming import beamform_scan, delay_and_sum_samples
+
+SAMPLE_RATE = 39062.5
+SPACING = 0.35
+ANGLES = np.arange(0, 181, 5)
+
+@pytest.fixture(params=[1 << 22, 1 << 13], ids=["one_batch", "many_batches"])
+def batch_elements(request, monkeypatch):
+    monkeypatch.setattr(freq_beamforming, "BATCH_ELEMENTS", request.param)
+
+@pytest.mark.parametrize("hop", [1024, 512])
+def test_beamform_matches_delay_and_sum(batch_elements, hop):
+    mic_signals = np.random.default_rng(0).standard_normal((4, 9000))
+    beamformer = FrequencyBeamformer(4, SPACING, SAMPLE_RATE, 1024, hop, fractional=False)
+    for angle in (0, 45, 90, 135, 180):
+        expected, _ = delay_and_sum_samples(mic_signals, beamformer.delays(angle))
+        np.testing.assert_allclose(beamformer.beamform(mic_signals, angle), expected, atol=1e-9)
+
+def test_scan_matches_beamform_scan(batch_elements):
+    mic_signals = np.random.default_rng(1).standard_normal((4, 9000))
+    beamformer = FrequencyBeamformer(4, SPACING, SAMPLE_RATE, fractional=False)
+    power_map, beam = beamformer.scan(mic_signals, ANGLES, return_signals=True)
+
+    expected, expected_beam = beamform_scan(mic_signals, SPACING, SAMPLE_RATE, ANGLES, return_signals=True)
+    np.testing.assert_allclose(power_map, expected, rtol=1e-9)
+    np.testing.assert_allclose(beam, expected_beam, atol=1e-9)
+
+def test_fractional_scan_matches_per_angle_beams(batch_elements):
+    mic_signals = np.random.default_rng(2).standard_normal((4, 9000))
+    beamformer = FrequencyBeamformer(4, SPACING, SAMPLE_RATE, 1024, 512)
+    power_map, beam = beamformer.scan(mic_signals, ANGLES, return_signals=True)
+
+    start = int(np.ceil(max(beamformer.delays(angle).max() for angle in ANGLES)))
+    beams = np.array([beamformer.beamform(mic_signals, angle)[:9000] / 4 for angle in ANGLES])
+    np.testing.assert_allclose(power_map, np.mean(beams[:, start:] ** 2, axis=1), rtol=1e-9)
+    np.testing.assert_allclose(beam, beams[np.argmax(power_map)], atol=1e-12)
+    assert beamformer.scan(mic_signals, ANGLES)[1] is None
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from link_budget import SAMPLE_RATE, budget_table, frame_bytes, link_budget, profile_stream
+from uart_decode import SEQUENCE_PERIOD, multi_frame_len
+
+def test_mono_budget():
+    # 2 bytes of 7 payload bits per 14-bit sample: 781.25 kbit/s of the 921.6 kbit/s line
+    budget = link_budget(1, 14)
+    assert budget['frame_bytes'] == 2 and budget['frame_rate'] == SAMPLE_RATE
+    assert budget['required_baud'] == 781250
+    assert budget['utilization'] == pytest.approx(781250 / 921600)
+    # uart_transmit holds each bit 108 cycles and idles 2 between bytes
+    assert budget['tx_utilization'] == pytest.approx(2 * (10 * 108 + 2) / 100e6 * SAMPLE_RATE)
+    assert budget['utilization'] == pytest.approx(0.848, abs=1e-3) and budget['headroom'] == pytest.approx(0.152, abs=1e-3)
+    assert budget['fits'] and budget['delivered_every'] == 1 and budget['delivered_rate'] == SAMPLE_RATE
+    assert budget['baud_error'] == pytest.approx(100e6 / 108 / 921600 - 1)
+
+def test_multi_mic_budget():
+    # The 4 mic frame: a sequence number byte and 2 bytes per mic, every 4th TDM frame
+    assert frame_bytes(4, 14, overhead_bytes=1) == multi_frame_len(4) == 9
+    budget = link_budget(4, 14, decimation=4, overhead_bytes=1)
+    assert budget['frame_bytes'] == 9 and budget['frame_rate'] == SAMPLE_RATE / 4
+    assert budget['utilization'] == pytest.approx(9 * 10 * SAMPLE_RATE / 4 / 921600)
+    assert budget['fits'] and budget['headroom'] == pytest.approx(0.046, abs=1e-3)
+
+    # Without decimation the transmitter is busy for about 4 frames per frame, and top_level drops the rest
+    budget = link_budget(4, 14, decimation=1, overhead_bytes=1)
+    assert not budget['fits'] and budget['delivered_every'] == 4
+    assert budget['delivered_rate'] == SAMPLE_RATE / 4
+
+def test_budget_table_counts_sequence_byte(capsys):
+    results = budget_table([1, 4], [14], [4])
+    assert results[(1, 14, 4)]['frame_bytes'] == 2 and results[(4, 14, 4)]['frame_bytes'] == 9
+    assert "sequence number" in capsys.readouterr().out
+    assert budget_table([4], [14], [4], overhead_bytes=0)[(4, 14, 4)]['frame_bytes'] == 8
+
+def multi_frames(num_frames, num_mics=4):
+    """Multi mic frames with sequence numbers 0.., zero samples, end byte flagged"""
+    frames = np.zeros((num_frames, multi_frame_len(num_mics)), dtype=np.uint8)
+    frames[:, 0] = np.arange(num_frames) % SEQUENCE_PERIOD
+    frames[:, -1] |= 0x80
+    return frames
+
+def test_profile_stream():
+    frame_rate = SAMPLE_RATE / 4
+    frames = multi_frames(400)
+    # Frames 100 to 104 never arrive, and one byte of frame 200 is lost (a resync that drops the frame)
+    kept = np.r_[0:100, 105:400]
+    stream = frames[kept].reshape(-1)
+    send_times = ((kept[:, np.newaxis] * 9 + np.arange(1, 10)) / (9 * frame_rate)).reshape(-1)
+    lost_byte = (200 - 5) * 9 + 4
+    stream, send_times = np.delete(stream, lost_byte), np.delete(send_times, lost_byte)
+
+    stats = profile_stream(stream, num_mics=4)
+    assert stats['bytes'] == len(stream) and stats['frames'] == 394
+    assert stats['resyncs'] == 1 and stats['dropped_bytes'] == 8
+    assert stats['sequence_missing'] == 6 and stats['sequence_gaps'] == 2
+    assert 'duration' not in stats
+
+    chunk_ends = np.arange(90, len(stream), 90)
+    chunk_ends[-1] = len(stream)
+    stats = profile_stream(stream, num_mics=4, decimation=4, chunk_ends=chunk_ends, chunk_times=send_times[chunk_ends - 1] + 1.0)
+    assert stats['duration'] == pytest.approx(send_times[-1] - send_times[chunk_ends[0] - 1])
+    assert stats['received_rate'] == pytest.approx((len(stream) - chunk_ends[0]) / stats['duration'])
+    assert stats['missing_frames'] == pytest.approx(6, abs=1)
+    # The resync is found where frame 200 was sent
+    assert len(stats['resync_times']) == 1
+    assert stats['resync_times'][0] == pytest.approx(201 / frame_rate - (send_times[chunk_ends[0] - 1]), abs=2 / frame_rate)
+    assert stats['max_read_gap'] == pytest.approx(15 / frame_rate, rel=0.1) and stats['overrun_gaps'] == 0
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from sample_codec import ALIGNMENT_BIT, BLOCK_LEN, decode_blocks, encode_blocks
+from uart_decode import SAMPLE_BITS
+
+LIMIT = 1 << (SAMPLE_BITS - 1)
+
+def round_trip(mic_samples, block_len=BLOCK_LEN):
+    mic_samples = np.atleast_2d(mic_samples)
+    uart_bytes, block_bytes = encode_blocks(mic_samples, block_len)
+    assert block_bytes.sum() == len(uart_bytes)
+    # Only the last byte of each block carries the alignment bit
+    assert np.array_equal(np.flatnonzero(uart_bytes & ALIGNMENT_BIT), np.cumsum(block_bytes) - 1)
+    decoded, stats = decode_blocks(uart_bytes, len(mic_samples), block_len)
+    assert stats['bad_blocks'] == 0 and stats['dropped_bytes'] == 0
+    return decoded, uart_bytes
+
+@pytest.mark.parametrize("num_mics", [1, 4])
+def test_round_trip_random(num_mics):
+    mic_samples = np.random.default_rng(num_mics).integers(-LIMIT, LIMIT, size=(num_mics, 10 * BLOCK_LEN))
+    decoded, _ = round_trip(mic_samples)
+    np.testing.assert_array_equal(decoded, mic_samples)
+
+def test_round_trip_full_scale():
+    # Jumps between the extremes need escape codes for every difference
+    mic_samples = np.tile([-LIMIT, LIMIT - 1], (4, 3 * BLOCK_LEN // 2))
+    mic_samples[1] = LIMIT - 1
+    mic_samples[2] = -LIMIT
+    decoded, _ = round_trip(mic_samples)
+    np.testing.assert_array_equal(decoded, mic_samples)
+
+def test_round_trip_smooth_signal_compresses():
+    mic_samples = np.round(3000 * np.sin(np.arange(8 * BLOCK_LEN) / 20)).astype(np.int64)[np.newaxis]
+    decoded, uart_bytes = round_trip(mic_samples)
+    np.testing.assert_array_equal(decoded, mic_samples)
+    assert len(uart_bytes) < mic_samples.size * 2
+
+@pytest.mark.parametrize("num_samples", [1, BLOCK_LEN - 1, BLOCK_LEN + 1, 5 * BLOCK_LEN + 17])
+@pytest.mark.parametrize("block_len", [BLOCK_LEN, 10])
+def test_partial_last_block(num_samples, block_len):
+    mic_samples = np.random.default_rng(num_samples).integers(-LIMIT, LIMIT, size=(2, num_samples))
+    decoded, _ = round_trip(mic_samples, block_len)
+    assert decoded.shape == (2, -(-num_samples // block_len) * block_len)
+    np.testing.assert_array_equal(decoded[:, :num_samples], mic_samples)
+    # The padding repeats the last sample
+    np.testing.assert_array_equal(decoded[:, num_samples:], np.repeat(mic_samples[:, -1:], decoded.shape[1] - num_samples, axis=1))
+
+def test_single_mic_1d_input():
+    samples = np.random.default_rng(3).integers(-LIMIT, LIMIT, size=3 * BLOCK_LEN)
+    uart_bytes, _ = encode_blocks(samples)
+    np.testing.assert_array_equal(uart_bytes, encode_blocks(samples[np.newaxis])[0])
+    decoded, _ = decode_blocks(uart_bytes)
+    np.testing.assert_array_equal(decoded, samples[np.newaxis])
+
+@pytest.mark.parametrize("shape", [(4, 0), (0,)])
+def test_empty_input(shape):
+    uart_bytes, block_bytes = encode_blocks(np.zeros(shape, dtype=np.int64))
+    assert uart_bytes.dtype == np.uint8 and len(uart_bytes) == 0 and len(block_bytes) == 0
+    decoded, stats = decode_blocks(uart_bytes, 4)
+    assert decoded.shape == (4, 0) and stats['blocks'] == 0
+
+def test_rejects_out_of_range_samples():
+    with pytest.raises(ValueError):
+        encode_blocks(np.array([[0, LIMIT]]))
+
+def test_flipped_bit_drops_only_its_block():
+    # Short blocks, so flipping every bit of one stays quick
+    block_len = 16
+    mic_samples = np.random.default_rng(4).integers(-2000, 2000, size=(4, 3 * block_len))
+    uart_bytes, block_bytes = encode_blocks(mic_samples, block_len)
+    expected = np.delete(mic_samples, np.s_[block_len:2 * block_len], axis=1)
+    # Every payload bit of the middle block, padding included: the CRC (or the codes overrunning the block) must catch it
+    for byte in range(block_bytes[0], block_bytes[0] + block_bytes[1]):
+        for bit in range(7):
+            corrupted = uart_bytes.copy()
+            corrupted[byte] ^= 1 << bit
+            decoded, stats = decode_blocks(corrupted, 4, block_len)
+            assert stats['bad_blocks'] == 1, f"flip of bit {bit} in byte {byte} not caught"
+            assert stats['dropped_bytes'] == block_bytes[1]
+            np.testing.assert_array_equal(decoded, expected)
+
+@pytest.mark.parametrize("byte, bad_blocks, kept", [
+    # Setting an alignment bit inside block 1 splits it in two bad blocks
+    (lambda ends: ends[0] + 5, 2, [0, 2, 3, 4, 5]),
+    # Clearing block 3's alignment bit merges it with block 4 into one bad block
+    (lambda ends: ends[3], 1, [0, 1, 2, 5]),
+])
+def test_flipped_alignment_bit_is_reported(byte, bad_blocks, kept):
+    mic_samples = np.random.default_rng(5).integers(-2000, 2000, size=(4, 6 * BLOCK_LEN))
+    uart_bytes, block_bytes = encode_blocks(mic_samples)
+    corrupted = uart_bytes.copy()
+    corrupted[byte(np.cumsum(block_bytes) - 1)] ^= ALIGNMENT_BIT
+    decoded, stats = decode_blocks(corrupted, 4)
+    assert stats['bad_blocks'] == bad_blocks
+    expected = mic_samples.reshape(4, -1, BLOCK_LEN)[:, kept].reshape(4, -1)
+    np.testing.assert_array_equal(decoded, expected)
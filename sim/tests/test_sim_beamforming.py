@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from sim_beamforming import (FRACTIONAL_DELAY_TAPS, StreamingBeamformer, beamform_scan, beamforming_delay, delay_and_sum,
+                             delay_and_sum_samples, sinc_delay_and_sum, split_delays)
+
+SAMPLE_RATE = 39062.5
+SPACING = 0.35
+ANGLES = np.arange(181)
+
+def reference_power(mic_signals, angles):
+    """Per-angle delay_and_sum loop: the power map beamform_scan must reproduce, and every angle's beam"""
+    num_mics, num_samples = mic_signals.shape
+    beams, max_delay = [], 0
+    for angle in angles:
+        output, _ = delay_and_sum(list(mic_signals), beamforming_delay(angle, SPACING, num_mics), SAMPLE_RATE)
+        max_delay = max(max_delay, len(output) - num_samples)
+        beams.append(output[:num_samples] / num_mics)
+    beams = np.array(beams)
+    return np.mean(beams[:, max_delay:] ** 2, axis=1), beams
+
+@pytest.mark.parametrize("num_mics", [2, 4, 8])
+@pytest.mark.parametrize("block_size", [333, 8192])
+def test_scan_matches_delay_and_sum(num_mics, block_size):
+    rng = np.random.default_rng(num_mics)
+    mic_signals = rng.standard_normal((num_mics, 3000))
+    power_map, beam = beamform_scan(mic_signals, SPACING, SAMPLE_RATE, ANGLES, block_size=block_size)
+
+    expected, _ = reference_power(mic_signals, ANGLES)
+    assert beam is None
+    np.testing.assert_allclose(power_map, expected, rtol=1e-12)
+
+def test_scan_returns_loudest_beam():
+    # A source at 60 degrees: each mic hears it early by the delay steering to 60 adds back
+    rng = np.random.default_rng(1)
+    source = rng.standard_normal(4200)
+    delays = np.round(beamforming_delay(60, SPACING, 4) * SAMPLE_RATE).astype(int)
+    delays -= delays.min()
+    mic_signals = np.array([source[delay:delay + 4000] for delay in delays])
+
+    power_map, beam = beamform_scan(mic_signals, SPACING, SAMPLE_RATE, ANGLES, return_signals=True)
+    expected, beams = reference_power(mic_signals, ANGLES)
+    best = np.argmax(expected)
+    assert abs(ANGLES[best] - 60) <= 5
+    assert beam.shape == (4000,)
+    np.testing.assert_array_equal(beam, beams[best])
+
+def test_scan_rejects_short_recordings():
+    with pytest.raises(ValueError):
+        beamform_scan(np.zeros((4, 50)), SPACING, SAMPLE_RATE)
+
+def random_chunks(mic_signals, rng, max_chunk):
+    """Split a recording into chunks of random length between 1 and max_chunk samples"""
+    start = 0
+    while start < mic_signals.shape[1]:
+        stop = start + int(rng.integers(1, max_chunk + 1))
+        yield mic_signals[:, start:stop]
+        start = stop
+
+@pytest.mark.parametrize("delays", [[0, 37, 74, 111], [111, 74, 37, 0], [0, 2.25, 4.5, 6.75], [5, 0, 300, 17]])
+@pytest.mark.parametrize("dtype", [np.int16, np.float64])
+@pytest.mark.parametrize("max_chunk", [1, 16, 700])
+def test_streaming_matches_batch(delays, dtype, max_chunk):
+    rng = np.random.default_rng(len(delays) + max_chunk)
+    mic_signals = rng.integers(-32768, 32768, size=(4, 5000)).astype(dtype)
+    # A small ring buffer, so the writes wrap around it many times
+    beamformer = StreamingBeamformer(delays, depth=512)
+    output = np.concatenate(list(beamformer.stream(random_chunks(mic_signals, rng, max_chunk))))
+
+    expected, _ = delay_and_sum_samples(mic_signals, delays)
+    assert output.dtype == expected.dtype
+    np.testing.assert_array_equal(output, expected)
+
+def test_streaming_matches_delay_and_sum():
+    rng = np.random.default_rng(2)
+    mic_signals = rng.standard_normal((4, 6000))
+    delays = beamforming_delay(30, SPACING, 4)
+    beamformer = StreamingBeamformer(np.trunc(delays * SAMPLE_RATE).astype(int))
+    output = np.concatenate(list(beamformer.stream(random_chunks(mic_signals, rng, 50))))
+
+    expected, _ = delay_and_sum(list(mic_signals), delays, SAMPLE_RATE)
+    np.testing.assert_array_equal(output, expected)
+
+def test_streaming_rejects_delays_past_the_buffer():
+    with pytest.raises(ValueError):
+        StreamingBeamformer([0, 512], depth=512)
+
+@pytest.mark.parametrize("frequency", [500, 2000, 8000])
+def test_sinc_matches_analytic_fractional_delay(frequency):
+    # Tones across the band compare_fractional_delay.py uses, shifted by half a sample and other fractions
+    num_samples = 4096
+    delays = np.array([0, 0.5, 1.25, 2.75])
+    tone = np.sin(2 * np.pi * frequency * np.arange(num_samples) / SAMPLE_RATE)
+    mic_signals = np.tile(tone, (4, 1))
+    int_delays, frac_delays = split_delays(delays, 4)
+    output, delayed = sinc_delay_and_sum(mic_signals, int_delays, frac_delays, num_samples + 3, return_delayed=True)
+
+    times = np.arange(num_samples + 3)[np.newaxis, :] - delays[:, np.newaxis]
+    expected = np.sin(2 * np.pi * frequency * times / SAMPLE_RATE)
+    # Away from the ends, where the filters run off the recording
+    steady = slice(FRACTIONAL_DELAY_TAPS, num_samples - FRACTIONAL_DELAY_TAPS)
+    np.testing.assert_allclose(delayed[:, steady], expected[:, steady], rtol=0, atol=1e-4)
+    np.testing.assert_allclose(output[steady], expected.sum(axis=0)[steady], rtol=0, atol=4e-4)
+
+    # The same path through delay_and_sum_samples, and linear interpolation is clearly worse at the top of the band
+    np.testing.assert_allclose(delay_and_sum_samples(mic_signals, delays, interpolation='sinc')[0], output)
+    linear = delay_and_sum_samples(mic_signals, delays, return_delayed=True)[1]
+    if frequency == 8000:
+        assert np.abs(linear[1, steady] - expected[1, steady]).max() > 0.1
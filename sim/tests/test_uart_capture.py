@@ -0,0 +1,81 @@
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from uart_capture import UartCaptureThread, capture_uart_bytes
+
+# Stream byte n is n % PATTERN_PERIOD; a prime period never lines up with the ring, so torn copies show
+PATTERN_PERIOD = 251
+
+class CounterSerial:
+    """Fake serial port that always has data waiting: a running counter pattern, in reads of up to max_read bytes"""
+
+    def __init__(self, max_read, baudrate=921600):
+        self.max_read = max_read
+        self.baudrate = baudrate
+        self.position = 0
+
+    @property
+    def in_waiting(self):
+        return self.max_read
+
+    def read(self, size):
+        size = min(size, self.max_read)
+        data = (np.arange(self.position, self.position + size) % PATTERN_PERIOD).astype(np.uint8).tobytes()
+        self.position += size
+        return data
+
+def pattern(start, stop):
+    return (np.arange(start, stop) % PATTERN_PERIOD).astype(np.uint8)
+
+@pytest.fixture
+def fast_switching():
+    # Switch threads as often as possible so the writer lands in the middle of the readers' copies
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def test_capture_uart_bytes_reads_in_blocks():
+    data, stats = capture_uart_bytes(CounterSerial(1000), 10_000, chunk_size=1000)
+    np.testing.assert_array_equal(data, pattern(0, 10_000))
+    assert stats['bytes'] == 10_000 and stats['reads'] == 10
+
+def test_chunks_never_torn(fast_switching):
+    capture = UartCaptureThread(CounterSerial(300), capacity=4096, chunk_size=300)
+    last, dropped, chunks = None, 0, 0
+    with capture:
+        deadline = time.perf_counter() + 1
+        for chunk in capture.chunks(timeout=1):
+            np.testing.assert_array_equal(np.diff(chunk.astype(np.int64)) % PATTERN_PERIOD, 1)
+            if last is not None:
+                # Bytes skipped because the reader fell a ring behind are counted in dropped_bytes
+                skipped = capture.dropped_bytes - dropped
+                assert chunk[0] == (int(last) + 1 + skipped) % PATTERN_PERIOD
+            last, dropped = chunk[-1], capture.dropped_bytes
+            chunks += 1
+            if chunks % 7 == 0:
+                time.sleep(0.001) # fall behind now and then
+            if time.perf_counter() > deadline:
+                break
+    assert chunks > 10
+    assert capture.dropped_bytes > 0
+
+def test_get_latest_never_torn(fast_switching):
+    capture = UartCaptureThread(CounterSerial(300), capacity=4096, chunk_size=300)
+    with capture:
+        deadline = time.perf_counter() + 1
+        checks = 0
+        while time.perf_counter() < deadline:
+            data = capture.get_latest(capture.capacity)
+            assert len(data) <= capture.capacity - capture.chunk_size
+            if len(data):
+                np.testing.assert_array_equal(np.diff(data.astype(np.int64)) % PATTERN_PERIOD, 1)
+                checks += 1
+    assert checks > 10
+
+def test_capacity_must_exceed_chunk_size():
+    with pytest.raises(ValueError):
+        UartCaptureThread(CounterSerial(300), capacity=300, chunk_size=300)
@@ -0,0 +1,244 @@
+import numpy as np
+import pytest
+
+from uart_decode import (NUM_CHANNELS, SEQUENCE_PERIOD, WRAP_TOLERANCE, MultiChannelDecoder, UartAudioDecoder, decode_multichannel,
+                         decode_uart_audio, multi_frame_len)
+
+def loop_convert_uart_to_audio(uart_data_in):
+    """
+    Reference byte-by-byte decoder: collect_beamforms.convert_uart_to_audio before it was
+    vectorized, taking ints instead of 1-byte bytes objects and without its prints.
+    """
+    audio_data = []
+    uart_data = list(uart_data_in)[::-1]
+    while uart_data:
+        audio_sample = 0
+        audio_valid = False
+        # Iterate over the number of bytes
+        for i in range(2):
+            data = None
+            alignment_bit = None
+
+            # Check the alignment bit of the byte
+            while alignment_bit != i and uart_data:
+                uart_byte = uart_data.pop()
+                data = 0b1111111 & uart_byte
+                alignment_bit = uart_byte >> 7
+
+            if data is None:
+                audio_valid = False
+                break
+            elif i == 0:
+                audio_sample += data
+            elif i == 1:
+                audio_sample += data << 7
+                audio_valid = True
+
+        if audio_valid:
+            if audio_sample & (1 << 13):
+                audio_sample -= 1 << 14
+
+            audio_data.append(audio_sample << 2) # shift data to 16 bit
+
+    return audio_data
+
+def sample_stream(rng, num_samples):
+    """Bytes of num_samples random 14-bit samples as the FPGA sends them: low 7 bits, then high 7 bits with bit 7 set"""
+    samples = rng.integers(0, 1 << 14, size=num_samples)
+    return np.stack([samples & 0x7F, 0x80 | (samples >> 7)], axis=1).reshape(-1).astype(np.uint8)
+
+def damaged_stream(rng, num_samples):
+    """A sample stream starting at a random byte, with bytes dropped, duplicated and replaced at random"""
+    stream = list(sample_stream(rng, num_samples)[rng.integers(0, 3):])
+    for _ in range(rng.integers(0, 8)):
+        if not stream:
+            break
+        idx = int(rng.integers(0, len(stream)))
+        action = rng.integers(0, 3)
+        if action == 0:
+            del stream[idx]
+        elif action == 1:
+            stream.insert(idx, stream[idx])
+        else:
+            stream[idx] = int(rng.integers(0, 256))
+    return np.array(stream, dtype=np.uint8)
+
+def random_streams(seed, count):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            yield sample_stream(rng, int(rng.integers(0, 30)))
+        elif kind == 1:
+            yield damaged_stream(rng, int(rng.integers(1, 30)))
+        else:
+            # Noise: runs of either alignment bit of any length
+            yield rng.integers(0, 256, size=int(rng.integers(0, 60))).astype(np.uint8)
+
+def incremental_decode(chunks):
+    decoder = UartAudioDecoder()
+    audio_data = np.concatenate([decoder.decode(chunk) for chunk in chunks] + [decoder.flush()])
+    return audio_data, decoder.stats
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_byte_loop(seed):
+    for stream in random_streams(seed, 500):
+        audio_data, stats = decode_uart_audio(stream)
+        assert audio_data.dtype == np.int16
+        assert audio_data.tolist() == loop_convert_uart_to_audio(stream.tolist()), stream.tolist()
+        assert stats['samples'] == len(audio_data)
+
+def test_accepts_bytes():
+    stream = sample_stream(np.random.default_rng(5), 20)
+    audio_data, _ = decode_uart_audio(bytes(stream))
+    assert audio_data.tolist() == loop_convert_uart_to_audio(stream.tolist())
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_split_at_every_offset(seed):
+    for stream in random_streams(seed + 10, 60):
+        expected, expected_stats = decode_uart_audio(stream)
+        for split in range(len(stream) + 1):
+            audio_data, stats = incremental_decode([stream[:split], stream[split:]])
+            np.testing.assert_array_equal(audio_data, expected, err_msg=f"split at {split} of {stream.tolist()}")
+            assert stats == expected_stats, f"split at {split} of {stream.tolist()}"
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_random_chunks(seed):
+    rng = np.random.default_rng(seed + 20)
+    for stream in random_streams(seed + 20, 200):
+        cuts = np.sort(rng.integers(0, len(stream) + 1, size=int(rng.integers(0, 12))))
+        audio_data, stats = incremental_decode(np.split(stream, cuts))
+        expected, expected_stats = decode_uart_audio(stream)
+        assert audio_data.tolist() == loop_convert_uart_to_audio(stream.tolist()), stream.tolist()
+        np.testing.assert_array_equal(audio_data, expected)
+        assert stats == expected_stats
+
+def multi_stream(fields, sequence):
+    """Multi mic frames as top_level sends them: the sequence number, then each mic's 14-bit field low half first, end byte flagged"""
+    num_channels, num_frames = fields.shape
+    frames = np.zeros((num_frames, multi_frame_len(num_channels)), dtype=np.uint8)
+    frames[:, 0] = np.asarray(sequence) % SEQUENCE_PERIOD
+    frames[:, 1::2] = (fields & 0x7F).T
+    frames[:, 2::2] = (fields >> 7).T
+    frames[:, -1] |= 0x80
+    return frames.reshape(-1)
+
+def multi_samples(fields):
+    return (fields.astype(np.uint16) << 2).view(np.int16)
+
+@pytest.fixture
+def multi_fields():
+    return np.random.default_rng(7).integers(0, 1 << 14, size=(NUM_CHANNELS, 300))
+
+def test_multichannel_clean_stream(multi_fields):
+    mic_samples, stats = decode_multichannel(multi_stream(multi_fields, np.arange(300)))
+    np.testing.assert_array_equal(mic_samples, multi_samples(multi_fields))
+    assert stats['frames'] == 300 and stats['resyncs'] == 0 and stats['dropped_bytes'] == 0
+    assert stats['missing_frames'] == 0 and len(stats['gap_markers']) == 0
+
+@pytest.mark.parametrize("offset", range(1, 9))
+def test_multichannel_misaligned_start(multi_fields, offset):
+    # Capture starting partway through a frame: the partial frame is dropped, but that is not a resync
+    stream = multi_stream(multi_fields, np.arange(300))[offset:]
+    mic_samples, stats = decode_multichannel(stream)
+    np.testing.assert_array_equal(mic_samples, multi_samples(multi_fields[:, 1:]))
+    assert stats['resyncs'] == 0 and stats['dropped_bytes'] == 9 - offset
+    assert stats['missing_frames'] == 0
+
+def test_multichannel_chunk_splits(multi_fields):
+    stream = multi_stream(multi_fields[:, :12], np.arange(12))
+    expected, expected_stats = decode_multichannel(stream[3:])
+    for split in range(len(stream) - 2):
+        decoder = MultiChannelDecoder()
+        mic_samples = np.concatenate([decoder.decode(stream[3:][:split]), decoder.decode(stream[3:][split:]), decoder.flush()], axis=1)
+        np.testing.assert_array_equal(mic_samples, expected, err_msg=f"split at {split}")
+        assert dict(decoder.stats) == {name: value for name, value in expected_stats.items() if name != 'gap_markers'}
+
+    rng = np.random.default_rng(8)
+    stream = multi_stream(multi_fields, np.arange(300))
+    for _ in range(20):
+        decoder = MultiChannelDecoder()
+        cuts = np.sort(rng.integers(0, len(stream) + 1, size=40))
+        mic_samples = np.concatenate([decoder.decode(chunk) for chunk in np.split(stream, cuts)] + [decoder.flush()], axis=1)
+        np.testing.assert_array_equal(mic_samples, multi_samples(multi_fields))
+
+@pytest.mark.parametrize("lost_byte", range(9))
+def test_multichannel_dropped_byte(multi_fields, lost_byte):
+    # Losing any byte of frame 10 loses that frame; its sequence number shows the gap, which is zero filled
+    stream = np.delete(multi_stream(multi_fields, np.arange(300)), 10 * 9 + lost_byte)
+    mic_samples, stats = decode_multichannel(stream)
+    expected = multi_samples(multi_fields)
+    expected[:, 10] = 0
+    np.testing.assert_array_equal(mic_samples, expected)
+    assert stats['frames'] == 299 and stats['resyncs'] == 1 and stats['dropped_bytes'] == 8
+    assert stats['missing_frames'] == 1 and stats['gap_markers'].tolist() == [[10, 1]]
+
+    mic_samples, _ = decode_multichannel(stream, fill=None)
+    np.testing.assert_array_equal(mic_samples, np.delete(multi_samples(multi_fields), 10, axis=1))
+
+def test_multichannel_sequence_wraparound(multi_fields):
+    # Numbers wrap from 127 to 0 twice in 300 frames without counting as gaps
+    sequence = np.arange(50, 350)
+    mic_samples, stats = decode_multichannel(multi_stream(multi_fields, sequence))
+    np.testing.assert_array_equal(mic_samples, multi_samples(multi_fields))
+    assert stats['missing_frames'] == 0
+
+    # Frames 125 to 130 lost across the wrap are counted modulo the period
+    kept = np.r_[0:75, 81:300]
+    mic_samples, stats = decode_multichannel(multi_stream(multi_fields[:, kept], sequence[kept]))
+    assert stats['missing_frames'] == 6 and stats['gap_markers'].tolist() == [[75, 6]]
+    expected = multi_samples(multi_fields)
+    expected[:, 75:81] = 0
+    np.testing.assert_array_equal(mic_samples, expected)
+
+FRAME_RATE = 39062.5 / 4
+
+def timed_decode(fields, kept, rng, jitter):
+    """Send frames kept of fields at FRAME_RATE, read them in random chunks up to jitter seconds late, and decode with arrival times"""
+    frame_len = multi_frame_len(len(fields))
+    stream = multi_stream(fields[:, kept], kept)
+    byte_times = ((kept[:, np.newaxis] * frame_len + np.arange(1, frame_len + 1)) / (frame_len * FRAME_RATE)).reshape(-1)
+    cuts = np.unique(rng.integers(1, len(stream), size=len(stream) // 200))
+    decoder = MultiChannelDecoder(frame_rate=FRAME_RATE)
+    mic_samples = [decoder.decode(chunk, byte_times[end - 1] + rng.uniform(0, jitter))
+                   for chunk, end in zip(np.split(stream, cuts), np.r_[cuts, len(stream)])]
+    return np.concatenate(mic_samples + [decoder.flush()], axis=1), decoder
+
+@pytest.fixture
+def long_fields():
+    return np.random.default_rng(9).integers(0, 1 << 14, size=(NUM_CHANNELS, 20000))
+
+def test_multichannel_jittered_arrivals(long_fields):
+    # Reads a little over the 6.5 ms a USB-serial read can be late (about 68 frame slots) add no gaps
+    for seed in range(5):
+        mic_samples, decoder = timed_decode(long_fields, np.arange(20000), np.random.default_rng(seed), 0.007)
+        np.testing.assert_array_equal(mic_samples, multi_samples(long_fields))
+        assert decoder.stats['missing_frames'] == 0 and len(decoder.gap_markers) == 0
+
+@pytest.mark.parametrize("lost", [1, 37, 64, 100, 127])
+def test_multichannel_jittered_short_loss(long_fields, lost):
+    # Losses under a period are counted by the sequence numbers alone, whatever the jitter
+    kept = np.r_[0:5000, 5000 + lost:20000]
+    mic_samples, decoder = timed_decode(long_fields, kept, np.random.default_rng(lost), 0.007)
+    assert decoder.stats['missing_frames'] == lost and decoder.gap_markers.tolist() == [[5000, lost]]
+    expected = multi_samples(long_fields)
+    expected[:, 5000:5000 + lost] = 0
+    np.testing.assert_array_equal(mic_samples, expected)
+
+@pytest.mark.parametrize("lost", [128, 129, 200, 300, 1000])
+def test_multichannel_long_loss(long_fields, lost):
+    # Whole periods the sequence numbers cannot show are found from the arrival times
+    jitter = (SEQUENCE_PERIOD / 2 - WRAP_TOLERANCE - 1) / FRAME_RATE
+    kept = np.r_[0:5000, 5000 + lost:20000]
+    mic_samples, decoder = timed_decode(long_fields, kept, np.random.default_rng(lost), jitter)
+    assert decoder.stats['missing_frames'] == lost and len(decoder.gap_markers) == 1
+    # With no jump in the numbers the gap can only be placed at the start of the chunk it was in
+    start = 5000 if lost % SEQUENCE_PERIOD else decoder.gap_markers[0, 0]
+    assert decoder.gap_markers.tolist() == [[start, lost]] and 4900 < start <= 5000
+    expected = np.concatenate([multi_samples(long_fields[:, kept[:start]]), np.zeros((NUM_CHANNELS, lost), dtype=np.int16),
+                               multi_samples(long_fields[:, kept[start:]])], axis=1)
+    np.testing.assert_array_equal(mic_samples, expected)
+
+def test_multichannel_wrap_tolerance():
+    with pytest.raises(ValueError):
+        MultiChannelDecoder(frame_rate=FRAME_RATE, wrap_tolerance=SEQUENCE_PERIOD / 2)
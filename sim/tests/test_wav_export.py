@@ -0,0 +1,77 @@
+import wave
+
+import numpy as np
+import pytest
+
+from capture_file import CaptureFile, CaptureWriter
+from wav_export import WaveStreamWriter, save_capture_wave, save_wave
+
+SAMPLE_RATE = 39062
+
+def read_wave(path):
+    """Samples of a WAV file read with the standard library, as (num_channels, num_samples) int32"""
+    with wave.open(str(path), 'rb') as wf:
+        params = wf.getparams()
+        raw = np.frombuffer(wf.readframes(params.nframes), dtype=np.uint8)
+    if params.sampwidth == 2:
+        samples = raw.view('<i2').astype(np.int32)
+    else:
+        # Sign-extend each little-endian 3-byte sample
+        triples = raw.reshape(-1, 3).astype(np.int32)
+        samples = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        samples = np.where(samples & 0x800000, samples - (1 << 24), samples)
+    return params, samples.reshape(params.nframes, params.nchannels).T
+
+def extreme_samples(rng, bit_depth, num_channels, num_samples):
+    """Random samples with both ends of the range and small negatives in them"""
+    low, high = -(1 << (bit_depth - 1)), (1 << (bit_depth - 1)) - 1
+    samples = rng.integers(low, high + 1, size=(num_channels, num_samples))
+    samples[:, :4] = [low, high, -1, 0]
+    return samples
+
+@pytest.mark.parametrize("num_channels", [1, 4])
+@pytest.mark.parametrize("bit_depth", [16, 24])
+def test_save_wave(tmp_path, num_channels, bit_depth):
+    samples = extreme_samples(np.random.default_rng(bit_depth + num_channels), bit_depth, num_channels, 1000)
+    samples = samples.astype(np.int16 if bit_depth == 16 else np.int32)
+    save_wave(str(tmp_path / "beam"), samples[0] if num_channels == 1 else samples, SAMPLE_RATE, bit_depth)
+
+    params, read = read_wave(tmp_path / "beam.wav")
+    assert (params.nchannels, params.sampwidth, params.framerate, params.nframes) == (num_channels, bit_depth // 8, SAMPLE_RATE, 1000)
+    np.testing.assert_array_equal(read, samples)
+
+def test_uint16_view(tmp_path):
+    # UART words assembled as uint16 and viewed as int16, as test_receive_audio.py does
+    words = np.array([0x0000, 0x0004, 0x7FFC, 0x8000, 0xFFFC, 0xFFFF], dtype=np.uint16)
+    save_wave(str(tmp_path / "output"), words.view(np.int16), SAMPLE_RATE)
+    _, read = read_wave(tmp_path / "output.wav")
+    assert read[0].tolist() == [0, 4, 32764, -32768, -4, -1]
+
+def test_stream_writer_chunks(tmp_path):
+    samples = extreme_samples(np.random.default_rng(5), 24, 4, 1000)
+    with WaveStreamWriter(str(tmp_path / "stream"), SAMPLE_RATE, num_channels=4, bit_depth=24) as wf:
+        for chunk in np.array_split(samples, 7, axis=1):
+            wf.write(chunk)
+        with pytest.raises(ValueError):
+            wf.write(samples[:2])
+    _, read = read_wave(tmp_path / "stream.wav")
+    np.testing.assert_array_equal(read, samples)
+
+def test_save_capture_wave(tmp_path):
+    rng = np.random.default_rng(6)
+    sweeps = [extreme_samples(rng, 24, 4, length) for length in (300, 200)]
+    with CaptureWriter(tmp_path / "session.cap", SAMPLE_RATE, num_mics=4, bit_depth=24) as capture:
+        for angle, samples in zip((0, 90), sweeps):
+            capture.add_sweep(samples, angle)
+    capture = CaptureFile(tmp_path / "session.cap")
+
+    save_capture_wave(str(tmp_path / "all"), capture, block_frames=64)
+    params, read = read_wave(tmp_path / "all.wav")
+    assert params.sampwidth == 3
+    np.testing.assert_array_equal(read, np.concatenate(sweeps, axis=1))
+    save_capture_wave(str(tmp_path / "second"), capture, sweep=1, block_frames=64)
+    np.testing.assert_array_equal(read_wave(tmp_path / "second.wav")[1], sweeps[1])
+
+def test_unsupported_bit_depth(tmp_path):
+    with pytest.raises(ValueError):
+        save_wave(str(tmp_path / "bad"), np.zeros(10, dtype=np.int16), SAMPLE_RATE, bit_depth=8)
@@ -0,0 +1,227 @@
+import threading
+import time
+import numpy as np
+
+# Bits on the wire per UART byte: start bit, 8 data bits, stop bit (8N1)
+UART_BITS_PER_BYTE = 10
+# Default read size; large enough that one read() call covers many samples
+CHUNK_SIZE = 4096
+# Linux tty flip buffers hold 4095 bytes; finding that many waiting means bytes may have been dropped
+KERNEL_BUFFER_SIZE = 4095
+
+def capture_uart_bytes(ser, num_bytes, chunk_size=CHUNK_SIZE, kernel_buffer_size=KERNEL_BUFFER_SIZE, progress_bytes=None, consumer=None):
+    """
+    Reads num_bytes from a serial port in large blocks into a preallocated buffer.
+
+    Each read() asks for everything already waiting in the driver (at least
+    chunk_size bytes, at most what is still needed), so a capture costs a few
+    syscalls per second instead of one per byte.
+
+    Parameters:
+    - ser (serial.Serial): Open serial port to read from.
+    - num_bytes (int): Number of bytes to capture.
+    - chunk_size (int): Minimum number of bytes requested per read.
+    - kernel_buffer_size (int): Size of the driver receive buffer; a read that finds
+      this many bytes already waiting is counted as a (possible) overrun.
+    - progress_bytes (int): Bytes in one second of audio; prints progress once per
+      captured second (default is no progress output).
+    - consumer (callable): Called with each block of bytes as soon as it is read, so
+      decoding can overlap with the capture.
+
+    Returns:
+    - numpy array: uint8 array of the captured bytes.
+    - dict: Capture statistics: bytes, reads, overruns, elapsed (s),
+      throughput (bytes/s), line_rate (bytes/s) and utilization (throughput / line_rate).
+    """
+    buffer = bytearray(num_bytes)
+    view = memoryview(buffer)
+    received = 0
+    reads = 0
+    overruns = 0
+    next_progress = progress_bytes
+
+    time_start = time.perf_counter()
+    while received < num_bytes:
+        waiting = ser.in_waiting
+        if waiting >= kernel_buffer_size:
+            overruns += 1
+
+        data = ser.read(min(num_bytes - received, max(waiting, chunk_size)))
+        if not data:
+            # read() only returns short on a timeout; stop rather than spin
+            break
+        view[received:received + len(data)] = data
+        if consumer is not None:
+            consumer(data)
+        received += len(data)
+        reads += 1
+
+        while next_progress is not None and received >= next_progress:
+            print(f"{next_progress // progress_bytes} seconds complete")
+            next_progress += progress_bytes
+    elapsed = time.perf_counter() - time_start
+
+    line_rate = ser.baudrate / UART_BITS_PER_BYTE
+    throughput = received / elapsed if elapsed > 0 else 0.0
+    stats = {
+        'bytes': received,
+        'reads': reads,
+        'overruns': overruns,
+        'elapsed': elapsed,
+        'throughput': throughput,
+        'line_rate': line_rate,
+        'utilization': throughput / line_rate,
+    }
+    return np.frombuffer(buffer, dtype=np.uint8)[:received], stats
+
+def print_capture_stats(stats):
+    """Print the statistics returned by capture_uart_bytes."""
+    print(f"Time elapsed: {stats['elapsed']:.3f} s, {stats['bytes']} bytes in {stats['reads']} reads")
+    print(f"Throughput: {stats['throughput'] / 1000:.1f} kB/s of {stats['line_rate'] / 1000:.1f} kB/s line rate "
+          f"({stats['utilization'] * 100:.1f}%), {stats['overruns']} possible overruns")
+
+class UartCaptureThread(threading.Thread):
+    """
+    Reads a serial port on a dedicated thread into a fixed-size ring buffer.
+
+    The capture thread is the only writer: it copies each block into the ring and
+    then advances bytes_written, a running total that is never reduced modulo the
+    capacity. Consumers never take a lock; they snapshot bytes_written, copy the
+    bytes they want and then check bytes_written again to see whether the writer
+    lapped them while they were copying. The block being copied in is not counted
+    in bytes_written yet, so the check leaves chunk_size bytes of headroom for it
+    and consumers only read the latest capacity - chunk_size bytes. Anything
+    overwritten before a consumer read it is counted in dropped_bytes.
+
+    Usage:
+        with UartCaptureThread(ser) as capture:
+            for chunk in capture.chunks():
+                ...
+    """
+
+    def __init__(self, ser, capacity=1 << 20, chunk_size=CHUNK_SIZE, kernel_buffer_size=KERNEL_BUFFER_SIZE):
+        """
+        Parameters:
+        - ser (serial.Serial): Open serial port to read from.
+        - capacity (int): Size of the ring buffer, in bytes (more than chunk_size).
+        - chunk_size (int): Maximum number of bytes requested per read.
+        - kernel_buffer_size (int): Size of the driver receive buffer (see capture_uart_bytes).
+        """
+        if capacity <= chunk_size:
+            raise ValueError(f"Ring capacity ({capacity}) must be larger than chunk_size ({chunk_size})")
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.kernel_buffer_size = kernel_buffer_size
+        self.ring = np.zeros(capacity, dtype=np.uint8)
+        # Bytes consumers can read: the rest of the ring may be mid-write
+        self.readable = capacity - chunk_size
+
+        self.bytes_written = 0
+        self.kernel_overruns = 0
+        self.dropped_bytes = 0
+        self.time_start = None
+        self.new_data = threading.Event()
+        self.stopping = threading.Event()
+
+    def run(self):
+        self.time_start = time.perf_counter()
+        while not self.stopping.is_set():
+            waiting = self.ser.in_waiting
+            if waiting >= self.kernel_buffer_size:
+                self.kernel_overruns += 1
+
+            data = self.ser.read(min(max(waiting, 1), self.chunk_size))
+            if not data:
+                continue
+
+            start = self.bytes_written % self.capacity
+            first = min(len(data), self.capacity - start)
+            self.ring[start:start + first] = np.frombuffer(data, dtype=np.uint8, count=first)
+            self.ring[:len(data) - first] = np.frombuffer(data, dtype=np.uint8, offset=first)
+            # Publish only once the bytes are in the ring
+            self.bytes_written += len(data)
+            self.new_data.set()
+
+    def stop(self):
+        """Stop the capture thread and wait for it to exit."""
+        self.stopping.set()
+        if hasattr(self.ser, 'cancel_read'):
+            self.ser.cancel_read()
+        self.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def throughput(self):
+        """Average capture rate since the thread started, in bytes/s."""
+        if self.time_start is None:
+            return 0.0
+        return self.bytes_written / max(time.perf_counter() - self.time_start, 1e-9)
+
+    def _copy(self, start, stop):
+        """Copy bytes [start, stop) of the stream out of the ring, or return None if they were overwritten meanwhile."""
+        indices = np.arange(start, stop) % self.capacity
+        data = self.ring[indices]
+        # The writer may be partway through copying up to chunk_size more bytes in
+        if self.bytes_written + self.chunk_size - start > self.capacity:
+            return None
+        return data
+
+    def get_latest(self, num_bytes):
+        """
+        Return the most recently captured bytes.
+
+        Parameters:
+        - num_bytes (int): Number of bytes wanted (capped at capacity - chunk_size and what has arrived).
+
+        Returns:
+        - numpy array: uint8 array of the latest bytes, oldest first.
+        """
+        while True:
+            stop = self.bytes_written
+            data = self._copy(max(stop - min(num_bytes, self.readable), 0), stop)
+            if data is not None:
+                return data
+
+    def chunks(self, timeout=None):
+        """
+        Iterate over the stream as it arrives, starting from the bytes captured so far.
+
+        Each chunk holds everything written since the previous one. If the consumer
+        falls more than capacity - chunk_size bytes behind, the bytes the writer may
+        have overwritten are skipped and added to dropped_bytes.
+
+        Parameters:
+        - timeout (float): Stop iterating after this many seconds without new data
+          (default is to wait until the capture thread stops).
+
+        Yields:
+        - numpy array: uint8 arrays of consecutive captured bytes.
+        """
+        read_pos = max(self.bytes_written - self.readable, 0)
+        while True:
+            self.new_data.clear()
+            stop = self.bytes_written
+            if stop == read_pos:
+                if not self.is_alive():
+                    return
+                if not self.new_data.wait(timeout) and timeout is not None:
+                    return
+                continue
+
+            if stop - read_pos > self.readable:
+                self.dropped_bytes += stop - read_pos - self.readable
+                read_pos = stop - self.readable
+            data = self._copy(read_pos, stop)
+            if data is None:
+                # Lapped while copying; skip ahead and try again
+                continue
+            read_pos = stop
+            yield data
@@ -0,0 +1,463 @@
+import numpy as np
+
+# Each UART byte carries 7 payload bits; bit 7 marks which half of the 14-bit sample it holds
+PAYLOAD_MASK = 0b1111111
+ALIGNMENT_SHIFT = 7
+SAMPLE_BITS = 14
+# The 14-bit samples are the top bits of the FPGA's audio; shift them up to fill 16 bits
+SAMPLE_SHIFT = 16 - SAMPLE_BITS
+
+def as_byte_array(uart_data):
+    """Return uart_data (bytes, bytearray, list of ints or a numpy array) as a uint8 numpy array without copying when possible."""
+    if isinstance(uart_data, (bytes, bytearray, memoryview)):
+        return np.frombuffer(uart_data, dtype=np.uint8)
+    return np.asarray(uart_data, dtype=np.uint8)
+
+def samples_from_bytes(low_bytes, high_bytes):
+    """
+    Reassemble 14-bit samples from their low and high UART bytes.
+
+    Parameters:
+    - low_bytes (numpy array): uint8 bytes holding bits [6:0] of each sample.
+    - high_bytes (numpy array): uint8 bytes holding bits [13:7] of each sample.
+
+    Returns:
+    - numpy array: int16 samples, sign extended and shifted up to 16 bits.
+    """
+    samples = (low_bytes & PAYLOAD_MASK).astype(np.uint16) | ((high_bytes & PAYLOAD_MASK).astype(np.uint16) << 7)
+    # Shifting the 14-bit value into the top of a uint16 makes bit 13 the int16 sign bit
+    return (samples << SAMPLE_SHIFT).view(np.int16)
+
+def find_sample_bytes(uart_bytes, final=True):
+    """
+    Locate the low and high byte of every sample the alignment bits allow.
+
+    The stream alternates between runs of low bytes (alignment bit 0) and runs
+    of high bytes (alignment bit 1). After a sample the decoder skips high bytes
+    until it sees a low byte, then skips further low bytes until a high byte
+    arrives, so every sample pairs the first byte of a low run with the first
+    byte of the high run that follows it. If the stream ends partway through a
+    run of two or more low bytes, the last of them is taken as the high half of
+    a final sample, matching the original byte-by-byte decoder.
+
+    Parameters:
+    - uart_bytes (numpy array): uint8 bytes received over UART.
+    - final (bool): Whether the stream ends here (applies the end-of-stream rule).
+
+    Returns:
+    - numpy array: Index of the low byte of each sample.
+    - numpy array: Index of the high byte of each sample.
+    """
+    is_high = (uart_bytes >> ALIGNMENT_SHIFT).astype(bool)
+    run_start = np.ones(len(is_high), dtype=bool)
+    run_start[1:] = is_high[1:] != is_high[:-1]
+
+    low_starts = np.flatnonzero(run_start & ~is_high)
+    high_idx = np.flatnonzero(run_start & is_high)
+    if len(high_idx) and high_idx[0] == 0:
+        # A leading run of high bytes has no low byte to pair with
+        high_idx = high_idx[1:]
+    low_idx = low_starts[:len(high_idx)]
+
+    if final and len(low_starts) > len(high_idx) and len(is_high) - low_starts[-1] >= 2:
+        low_idx = np.append(low_idx, low_starts[-1])
+        high_idx = np.append(high_idx, len(is_high) - 1)
+
+    return low_idx, high_idx
+
+def decode_buffer(uart_bytes, final=True, prev_dropped=False, gap_dropped=False):
+    """
+    Decode a buffer of UART bytes, optionally leaving an unfinished sample pending.
+
+    When the buffer is not final and ends in a run of low bytes, the first of them
+    (the low half of the next sample) and the last of them (the high half if the
+    stream were to end there) are returned as carry instead of being decided. The
+    low bytes between them are dropped whatever arrives next, so they are counted
+    now and not carried, which keeps the carry at two bytes at most.
+
+    Parameters:
+    - uart_bytes (numpy array): uint8 bytes, starting with the previous carry.
+    - final (bool): Whether the stream ends with this buffer.
+    - prev_dropped (bool): Whether the byte before the buffer was dropped (continues a resync).
+    - gap_dropped (bool): Whether dropped low bytes were removed between the two carried bytes.
+
+    Returns:
+    - numpy array: int16 audio samples.
+    - int: Number of dropped bytes.
+    - int: Number of resync events.
+    - tuple: (carry bytes, prev_dropped, gap_dropped) to pass along with the next buffer.
+    """
+    low_idx, high_idx = find_sample_bytes(uart_bytes, final)
+    num_bytes = len(uart_bytes)
+
+    used = np.zeros(num_bytes, dtype=bool)
+    used[low_idx] = True
+    used[high_idx] = True
+
+    carry_idx = np.zeros(0, dtype=np.int64)
+    if not final and num_bytes and not uart_bytes[-1] >> ALIGNMENT_SHIFT:
+        high_bytes = np.flatnonzero(uart_bytes >> ALIGNMENT_SHIFT)
+        run_start = high_bytes[-1] + 1 if len(high_bytes) else 0
+        carry_idx = np.unique([run_start, num_bytes - 1])
+    pending = np.zeros(num_bytes, dtype=bool)
+    pending[carry_idx] = True
+
+    # A resync starts at each dropped byte whose predecessor in the stream was kept
+    dropped = ~used & ~pending
+    prev_byte_dropped = np.empty(num_bytes, dtype=bool)
+    prev_byte_dropped[:1] = prev_dropped
+    prev_byte_dropped[1:] = dropped[:-1]
+    if gap_dropped and num_bytes > 1:
+        prev_byte_dropped[1] = True
+    resyncs = int((dropped & ~prev_byte_dropped).sum())
+
+    if len(carry_idx):
+        run_start, run_end = carry_idx[0], num_bytes
+        carry = (uart_bytes[carry_idx].copy(),
+                 bool(prev_byte_dropped[run_start]),
+                 run_end - run_start >= 3 or (gap_dropped and run_start == 0 and run_end - run_start >= 2))
+    else:
+        carry = (np.zeros(0, dtype=np.uint8), bool(dropped[-1]) if num_bytes else prev_dropped, False)
+
+    audio_data = samples_from_bytes(uart_bytes[low_idx], uart_bytes[high_idx])
+    return audio_data, int(dropped.sum()), resyncs, carry
+
+def decode_uart_audio(uart_data):
+    """
+    Decode the FPGA's 2-byte UART audio stream in one vectorized pass.
+
+    Produces exactly the samples of the original byte-by-byte decoder in
+    collect_beamforms.convert_uart_to_audio, including how it realigns after
+    missing or extra bytes.
+
+    Parameters:
+    - uart_data (bytes-like or numpy array): Raw bytes received over UART.
+
+    Returns:
+    - numpy array: int16 audio samples.
+    - dict: Decode statistics: samples, dropped_bytes and resyncs.
+    """
+    audio_data, dropped_bytes, resyncs, _ = decode_buffer(as_byte_array(uart_data))
+    return audio_data, {'samples': len(audio_data), 'dropped_bytes': dropped_bytes, 'resyncs': resyncs}
+
+class UartAudioDecoder:
+    """
+    Incremental decoder for the 2-byte UART audio stream.
+
+    Bytes can be fed in chunks of any size as they arrive. A low byte still
+    waiting for its high half (and the alignment state around it) is carried
+    between calls, so the concatenated output of decode() and flush() is exactly
+    decode_uart_audio on the whole stream.
+    """
+
+    def __init__(self):
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.prev_dropped = False
+        self.gap_dropped = False
+        self.stats = {'samples': 0, 'dropped_bytes': 0, 'resyncs': 0}
+
+    def decode(self, uart_data, final=False):
+        """
+        Decode the next chunk of UART bytes.
+
+        Parameters:
+        - uart_data (bytes-like or numpy array): Newly received bytes.
+        - final (bool): Whether this is the end of the stream.
+
+        Returns:
+        - numpy array: int16 audio samples completed by this chunk.
+        """
+        uart_bytes = np.concatenate([self.carry, as_byte_array(uart_data)])
+        audio_data, dropped_bytes, resyncs, carry = decode_buffer(uart_bytes, final, self.prev_dropped, self.gap_dropped)
+        self.carry, self.prev_dropped, self.gap_dropped = carry
+
+        self.stats['samples'] += len(audio_data)
+        self.stats['dropped_bytes'] += dropped_bytes
+        self.stats['resyncs'] += resyncs
+        return audio_data
+
+    def flush(self):
+        """
+        End the stream, deciding any pending bytes.
+
+        Returns:
+        - numpy array: The final int16 sample, if the pending bytes complete one.
+        """
+        audio_data = self.decode(np.zeros(0, dtype=np.uint8), final=True)
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.prev_dropped = False
+        self.gap_dropped = False
+        return audio_data
+
+# Multi mic mode: every frame carries a sequence number, then one sample per mic (low
+# then high 7 bits), and only the last byte of the frame has its alignment bit set
+NUM_CHANNELS = 4
+# top_level numbers every frame slot, sent or not, so a jump in the numbers is a gap
+SEQUENCE_BITS = 7
+SEQUENCE_PERIOD = 1 << SEQUENCE_BITS
+# Frame slots of timing error, past half a period, before arrival times count as a lost period
+WRAP_TOLERANCE = 16
+
+def multi_frame_len(num_channels=NUM_CHANNELS):
+    """Bytes per multi mic frame: the sequence number and two per mic."""
+    return 1 + 2 * num_channels
+
+def find_frames(uart_bytes, frame_len, skipped=0, at_start=True):
+    """
+    Locate every complete frame of the multi mic stream.
+
+    A frame is the frame_len bytes ending in a byte with the alignment bit set.
+    It is complete when none of the frame_len - 1 bytes before that end byte has
+    the bit set. Any other spacing between two end bytes means bytes were lost
+    or corrupted, and the decoder resyncs on the next end byte.
+
+    Parameters:
+    - uart_bytes (numpy array): uint8 bytes received over UART.
+    - frame_len (int): Bytes per frame.
+    - skipped (int): Bytes since the last end byte that come before uart_bytes (already dropped).
+    - at_start (bool): Whether uart_bytes starts the stream, so a partial first frame is not a resync.
+
+    Returns:
+    - numpy array: Index of the first byte of each complete frame.
+    - int: Number of resync events.
+    - int: Index of the first byte after the last end byte.
+    """
+    ends = np.flatnonzero(uart_bytes >> ALIGNMENT_SHIFT)
+    # Bytes from the previous end byte (exclusive) up to and including each end byte
+    gaps = np.diff(ends, prepend=-1 - skipped)
+    resync = gaps != frame_len
+    if at_start and len(resync):
+        resync[0] = False
+    starts = ends[gaps >= frame_len] - frame_len + 1
+    return starts, int(resync.sum()), (int(ends[-1]) + 1 if len(ends) else 0)
+
+def frame_samples(uart_bytes, starts, num_channels=NUM_CHANNELS):
+    """
+    Deinterleave complete frames into one row of samples per mic.
+
+    Parameters:
+    - uart_bytes (numpy array): uint8 bytes received over UART.
+    - starts (numpy array): Index of the first byte of each frame.
+    - num_channels (int): Mics per frame.
+
+    Returns:
+    - numpy array: (num_channels, num_frames) int16 samples.
+    """
+    frames = uart_bytes[starts[:, np.newaxis] + 1 + np.arange(2 * num_channels)]
+    return samples_from_bytes(frames[:, 0::2], frames[:, 1::2]).T
+
+def frame_sequence(uart_bytes, starts):
+    """Return the sequence number (0 to SEQUENCE_PERIOD - 1) of each frame, as int64."""
+    return (uart_bytes[starts] & PAYLOAD_MASK).astype(np.int64)
+
+def missing_frames(sequence, previous=None):
+    """
+    Count the frames lost just before each frame from the jumps in the sequence numbers.
+
+    The numbers wrap every SEQUENCE_PERIOD frames, so a gap is counted modulo SEQUENCE_PERIOD.
+
+    Parameters:
+    - sequence (numpy array): Sequence number of each frame.
+    - previous (int): Sequence number of the frame before the first (None if there is none).
+
+    Returns:
+    - numpy array: int64 number of frames missing before each frame.
+    """
+    sequence = np.asarray(sequence, dtype=np.int64)
+    steps = np.diff(sequence, prepend=sequence[:1] - 1 if previous is None else previous)
+    return (steps - 1) % SEQUENCE_PERIOD
+
+def unwrap_missing(missing, elapsed, tolerance=WRAP_TOLERANCE):
+    """
+    Add the whole sequence periods the numbers cannot show, given how many frame slots went by.
+
+    Arrival times jitter, so a period only counts once the slots the numbers do not
+    account for are past half a period plus tolerance: timing errors up to
+    SEQUENCE_PERIOD / 2 + tolerance slots never add a gap, and lost periods are
+    still counted while the timing error stays under SEQUENCE_PERIOD / 2 - tolerance.
+
+    Parameters:
+    - missing (numpy array): Frames missing before each frame, as missing_frames returns.
+    - elapsed (float): Frame slots from the frame before the first to the last one, e.g. from arrival times.
+    - tolerance (float): Frame slots of timing error allowed past the halfway point.
+
+    Returns:
+    - numpy array: missing, with any extra periods added to its largest gap.
+    """
+    unexplained = elapsed - len(missing) - int(missing.sum())
+    wraps = int(np.floor((unexplained - tolerance) / SEQUENCE_PERIOD + 0.5))
+    if wraps > 0 and len(missing):
+        missing = missing.copy()
+        missing[np.argmax(missing)] += wraps * SEQUENCE_PERIOD
+    return missing
+
+def gap_markers(missing, start=0):
+    """
+    List the gaps on the sender's timeline.
+
+    Parameters:
+    - missing (numpy array): Frames missing before each received frame, as missing_frames returns.
+    - start (int): Timeline position of the first received frame's slot, when there are no gaps before it.
+
+    Returns:
+    - numpy array: (num_gaps, 2) int64 rows of [position of the first missing frame, frames missing].
+    """
+    positions = start + np.arange(len(missing)) + np.cumsum(missing)
+    has_gap = missing > 0
+    return np.stack([positions[has_gap] - missing[has_gap], missing[has_gap]], axis=1)
+
+def fill_gaps(mic_samples, missing, fill=0):
+    """
+    Put received frames back on the sender's timeline, filling each missing frame with fill.
+
+    Parameters:
+    - mic_samples (numpy array): (num_channels, num_frames) samples of the received frames.
+    - missing (numpy array): Frames missing before each received frame.
+    - fill (int): Sample value of the missing frames.
+
+    Returns:
+    - numpy array: (num_channels, num_frames + missing.sum()) samples.
+    """
+    positions = np.arange(len(missing)) + np.cumsum(missing)
+    timeline = np.full((len(mic_samples), len(missing) + int(missing.sum())), fill, dtype=mic_samples.dtype)
+    timeline[:, positions] = mic_samples
+    return timeline
+
+def decode_multichannel(uart_data, num_channels=NUM_CHANNELS, fill=0):
+    """
+    Decode the multi mic UART stream in one vectorized pass.
+
+    Parameters:
+    - uart_data (bytes-like or numpy array): Raw bytes received over UART.
+    - num_channels (int): Mics per frame.
+    - fill (int): Sample value of missing frames (None leaves them out instead).
+
+    Returns:
+    - numpy array: (num_channels, num_frames) int16 samples, on the sender's timeline unless fill is None.
+    - dict: Decode statistics, as MultiChannelDecoder.stats, and gap_markers as gap_markers returns them.
+    """
+    decoder = MultiChannelDecoder(num_channels, fill=fill)
+    mic_samples = np.concatenate([decoder.decode(uart_data), decoder.flush()], axis=1)
+    return mic_samples, dict(decoder.stats, gap_markers=decoder.gap_markers)
+
+class MultiChannelDecoder:
+    """
+    Incremental decoder for the multi mic UART stream.
+
+    Bytes can be fed in chunks of any size. The bytes after the last end byte are
+    carried to the next call (at most a frame's worth, since only the last
+    frame_len - 1 of them can still start a frame), so the concatenated output of
+    decode() and flush() is exactly decode_multichannel on the whole stream.
+
+    Frames lost on the link (or dropped by top_level while the transmitter was
+    busy) show up as jumps in the sequence numbers; they are filled with fill so
+    the output stays on the sender's timeline, and listed in gap_markers. Given
+    each chunk's arrival time and the frame rate, gaps of a whole sequence
+    period or more are counted too: the time between the last frames of two
+    chunks (taking the last byte of a chunk to have just arrived) says how many
+    frame slots went by, and any whole periods the sequence numbers missed are
+    added to the chunk's largest gap. A period only counts once the time says it
+    is more than half gone plus wrap_tolerance slots (see unwrap_missing), so
+    read jitter does not add gaps to a stream that lost nothing.
+    """
+
+    def __init__(self, num_channels=NUM_CHANNELS, fill=0, frame_rate=None, wrap_tolerance=WRAP_TOLERANCE):
+        """
+        Parameters:
+        - num_channels (int): Mics per frame.
+        - fill (int): Sample value of missing frames (None leaves them out instead).
+        - frame_rate (float): Frames per second the FPGA sends, to use arrival times.
+        - wrap_tolerance (float): Frame slots of arrival jitter allowed past half a sequence period.
+        """
+        if not 0 <= wrap_tolerance < SEQUENCE_PERIOD / 2:
+            raise ValueError(f"wrap_tolerance must be between 0 and {SEQUENCE_PERIOD // 2} frame slots")
+        self.num_channels = num_channels
+        self.fill = fill
+        self.frame_rate = frame_rate
+        self.wrap_tolerance = wrap_tolerance
+        self.frame_len = multi_frame_len(num_channels)
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.skipped = 0
+        self.at_start = True
+        self.last_sequence = None
+        self.last_time = np.nan
+        self.position = 0
+        self.gaps = []
+        self.stats = {'frames': 0, 'dropped_bytes': 0, 'resyncs': 0, 'missing_frames': 0, 'gaps': 0, 'longest_gap': 0}
+
+    @property
+    def gap_markers(self):
+        """(num_gaps, 2) int64 rows of [timeline position of the first missing frame, frames missing]."""
+        return np.concatenate([np.zeros((0, 2), dtype=np.int64)] + self.gaps)
+
+    def decode(self, uart_data, arrival_time=None):
+        """
+        Decode the next chunk of UART bytes.
+
+        Parameters:
+        - uart_data (bytes-like or numpy array): Newly received bytes.
+        - arrival_time (float): When the chunk was read, in seconds (e.g. time.perf_counter()).
+
+        Returns:
+        - numpy array: (num_channels, num_frames) int16 samples of the frames completed by this
+          chunk, with the frames missing before them filled in.
+        """
+        uart_bytes = np.concatenate([self.carry, as_byte_array(uart_data)])
+        starts, resyncs, tail_start = find_frames(uart_bytes, self.frame_len, self.skipped, self.at_start)
+        if tail_start:
+            self.skipped = 0
+            self.at_start = False
+
+        carry_start = max(tail_start, len(uart_bytes) - (self.frame_len - 1))
+        self.skipped += carry_start - tail_start
+        self.carry = uart_bytes[carry_start:].copy()
+
+        sequence = frame_sequence(uart_bytes, starts)
+        missing = missing_frames(sequence, self.last_sequence)
+        if len(sequence):
+            self.last_sequence = int(sequence[-1])
+        if arrival_time is not None and self.frame_rate and len(starts):
+            bytes_after = len(uart_bytes) - (starts[-1] + self.frame_len)
+            last_time = arrival_time - bytes_after / (self.frame_len * self.frame_rate)
+            if not np.isnan(self.last_time):
+                missing = unwrap_missing(missing, (last_time - self.last_time) * self.frame_rate, self.wrap_tolerance)
+            self.last_time = last_time
+
+        gaps = gap_markers(missing, self.position)
+        self.gaps.append(gaps)
+        self.position += len(missing) + int(missing.sum())
+
+        self.stats['frames'] += len(starts)
+        self.stats['dropped_bytes'] += carry_start - len(starts) * self.frame_len
+        self.stats['resyncs'] += resyncs
+        self.stats['missing_frames'] += int(missing.sum())
+        self.stats['gaps'] += len(gaps)
+        self.stats['longest_gap'] = max(self.stats['longest_gap'], int(missing.max()) if len(missing) else 0)
+
+        mic_samples = frame_samples(uart_bytes, starts, self.num_channels)
+        if self.fill is None:
+            return mic_samples
+        return fill_gaps(mic_samples, missing, self.fill)
+
+    def flush(self):
+        """
+        End the stream; bytes of an unfinished frame are dropped, and frames lost after the last one cannot be counted.
+
+        Returns:
+        - numpy array: (num_channels, 0) int16 array, so the outputs can always be concatenated.
+        """
+        self.stats['dropped_bytes'] += len(self.carry)
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.skipped = 0
+        self.at_start = True
+        self.last_sequence = None
+        self.last_time = np.nan
+        return np.zeros((self.num_channels, 0), dtype=np.int16)
+
+def print_losses(stats, frame_rate):
+    """Print the frame loss statistics of a MultiChannelDecoder."""
+    if not stats['missing_frames']:
+        return
+    total = stats['frames'] + stats['missing_frames']
+    print(f"{stats['missing_frames']} frames ({stats['missing_frames'] / total * 100:.2f}%) missing in {stats['gaps']} gaps, "
+          f"longest {stats['longest_gap'] / frame_rate * 1000:.1f} ms; filled in to keep the timeline")
@@ -0,0 +1,113 @@
+import wave
+import numpy as np
+
+# Samples per channel handed to writeframes at a time when streaming a capture out
+EXPORT_BLOCK_FRAMES = 1 << 18
+
+def wav_frame_bytes(samples, bit_depth=16):
+    """
+    Pack samples into the little-endian interleaved frames a WAV file stores.
+
+    Parameters:
+    - samples (numpy array): (num_samples,) for mono or (num_channels, num_samples) array of integer samples.
+    - bit_depth (int): 16, or 24 for samples at the tdm_receive width (held in a wider integer type).
+
+    Returns:
+    - bytes: The frames, channel samples interleaved.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim == 1:
+        samples = samples[np.newaxis, :]
+    # WAV interleaves channels, so lay the samples out frame by frame
+    frames = samples.T
+    if bit_depth == 16:
+        return np.ascontiguousarray(frames, dtype='<i2').tobytes()
+    if bit_depth == 24:
+        # Keep the low three bytes of each little-endian int32
+        packed = np.ascontiguousarray(frames, dtype='<i4').view(np.uint8).reshape(-1, 4)[:, :3]
+        return packed.tobytes()
+    raise ValueError(f"Unsupported WAV bit depth {bit_depth}")
+
+class WaveStreamWriter:
+    """
+    Writes a WAV file a chunk at a time, one writeframes call per chunk.
+
+    Usage:
+        with WaveStreamWriter('session', SAMPLE_RATE, num_channels=4, bit_depth=24) as wf:
+            for block in blocks:
+                wf.write(block)
+    """
+
+    def __init__(self, filename, sample_rate, num_channels=1, bit_depth=16):
+        """
+        Parameters:
+        - filename (str): Output name, without the .wav extension.
+        - sample_rate (float): Sample rate, in Hz.
+        - num_channels (int): Number of interleaved channels.
+        - bit_depth (int): 16 or 24.
+        """
+        self.filename = f'{filename}.wav'
+        self.num_channels = num_channels
+        self.bit_depth = bit_depth
+        self.wf = wave.open(self.filename, 'wb')
+        self.wf.setframerate(sample_rate)
+        self.wf.setnchannels(num_channels)
+        self.wf.setsampwidth(bit_depth // 8)
+
+    def write(self, samples):
+        """Append samples, shaped as for wav_frame_bytes, to the file."""
+        samples = np.asarray(samples)
+        channels = 1 if samples.ndim == 1 else samples.shape[0]
+        if channels != self.num_channels:
+            raise ValueError(f"Expected {self.num_channels} channels, got {channels}")
+        # writeframesraw leaves the header sizes to close(), instead of seeking back after every chunk
+        self.wf.writeframesraw(wav_frame_bytes(samples, self.bit_depth))
+
+    def close(self):
+        self.wf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def save_wave(filename, samples, sample_rate, bit_depth=16):
+    """
+    Save a whole array of samples as a WAV file in one write.
+
+    Parameters:
+    - filename (str): Output name, without the .wav extension.
+    - samples (numpy array): (num_samples,) for mono or (num_channels, num_samples) array.
+    - sample_rate (float): Sample rate, in Hz.
+    - bit_depth (int): 16, or 24 for raw TDM samples.
+    """
+    samples = np.asarray(samples)
+    num_channels = 1 if samples.ndim == 1 else samples.shape[0]
+    with WaveStreamWriter(filename, sample_rate, num_channels, bit_depth) as wf:
+        wf.write(samples)
+    print(f"Recording saved to {filename}.wav")
+
+def save_capture_wave(filename, capture, sweep=None, bit_depth=None, block_frames=EXPORT_BLOCK_FRAMES):
+    """
+    Stream a raw capture (see capture_file.CaptureFile) out to a WAV file in large blocks.
+
+    Parameters:
+    - filename (str): Output name, without the .wav extension.
+    - capture (CaptureFile): Opened raw capture.
+    - sweep (dict or int): Only export this sweep (default is the whole capture).
+    - bit_depth (int): WAV bit depth (default is 24 for captures wider than 16 bits, else 16).
+    - block_frames (int): Frames read from the capture per write.
+    """
+    if bit_depth is None:
+        bit_depth = 16 if capture.header['bit_depth'] <= 16 else 24
+    start, stop = 0, len(capture)
+    if sweep is not None:
+        if not isinstance(sweep, dict):
+            sweep = capture.sweeps[sweep]
+        start, stop = sweep['start'], sweep['start'] + sweep['length']
+
+    with WaveStreamWriter(filename, capture.sample_rate, capture.num_mics, bit_depth) as wf:
+        for block in capture.blocks(block_frames, start, stop):
+            wf.write(block)
+    print(f"Recording saved to {filename}.wav")
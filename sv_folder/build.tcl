@@ -55,7 +55,8 @@ generate_target all [get_ips]
 synth_ip [get_ips]
 
 #Run Synthesis
-synth_design -top top_level -part $partNum -verbose
+# top_level includes data/angle_delay_lut.svh, the parameters of the table in data/angle_delay_lut.mem
+synth_design -top top_level -part $partNum -include_dirs ./data -verbose
 write_checkpoint -force $outputDir/post_synth.dcp
 report_timing_summary -file $outputDir/post_synth_timing_summary.rpt
 report_utilization -file $outputDir/post_synth_util.rpt -hierarchical -hierarchical_depth 4
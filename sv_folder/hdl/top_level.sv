@@ -117,12 +117,25 @@ module top_level (
     .ascii_out(ascii_rep)
   );
 
-  angle_delay_lut angle_delay_lut (
-    .angle_in(angle),
-    .delay_1_out(delay_1),
-    .delay_2_out(delay_2),
-    .delay_3_out(delay_3),
-    .delay_4_out(delay_4)
+  // LUT_NUM_MICS, LUT_DELAY_BITS, LUT_ANGLE_BITS, LUT_NUM_ANGLES and LUT_FILE of the table
+  // generate_lut.py wrote to data/angle_delay_lut.*
+  `include "angle_delay_lut.svh"
+
+  // delay_bram takes four 8-bit delays, and sw[11] and up pick the display and UART modes
+  if (LUT_NUM_MICS != 4 || LUT_DELAY_BITS != 8 || LUT_ANGLE_BITS > 11) begin : lut_mismatch
+    $fatal(1, "angle_delay_lut.svh is for %0d mics, %0d-bit delays and %0d-bit angles; top_level needs 4 mics, 8-bit delays and at most 11-bit angles",
+           LUT_NUM_MICS, LUT_DELAY_BITS, LUT_ANGLE_BITS);
+  end
+
+  angle_delay_lut #(
+    .NUM_MICS(LUT_NUM_MICS),
+    .DELAY_BITS(LUT_DELAY_BITS),
+    .ANGLE_BITS(LUT_ANGLE_BITS),
+    .NUM_ANGLES(LUT_NUM_ANGLES),
+    .LUT_FILE(LUT_FILE)
+  ) angle_delay_lut (
+    .angle_in(sw[LUT_ANGLE_BITS-1:0]),
+    .delays_out({delay_4, delay_3, delay_2, delay_1})
   );
 
   // Drive the 7 Segment Controller
@@ -182,40 +195,45 @@ module top_level (
   // This block of the top level controls outputting via uart
   // Toggle sw[15] to enable uart transmission
   // There are two modes of uart transmission enabled by sw[14]
-  //   - Single Mic [low]  transmits 31.25 kHz 16 bit data
-  //   - Dual Mic   [high] transmits 15.27 kHz 16 bit data
+  //   - Single Mic [low]  transmits the beamformed 39.06 kHz 14 bit data
+  //   - Multi Mic  [high] transmits all 4 raw mics at 9.77 kHz (every 4th frame), 14 bit data,
+  //                       so the host can beamform to any angle after the fact. Each frame starts
+  //                       with a 7 bit sequence number that counts every frame slot, sent or not,
+  //                       so the host can tell how many frames went missing
 
   logic                      audio_sample_waiting;
-  logic                      is_even_sample;  // flag allows for sending 1/2 sample rate when sw[15]
+  logic [1:0]                sample_phase;  // counts frames so the multi mic mode sends 1/4 of them
+  logic [6:0]                frame_sequence; // multi mic frame slots, wrapping at 128
   logic                      enable_uart;
-  logic                      use_dual_uart;
+  logic                      use_multi_uart;
 
   logic [15:0]               uart_single_data_in;
-  logic [31:0]               uart_dual_data_in;
+  logic [62:0]               uart_multi_data_in;
   logic                      uart_data_valid;
 
   logic                      uart_busy;
   logic                      uart_single_busy;
-  logic                      uart_dual_busy;
+  logic                      uart_multi_busy;
 
   logic                      uart_single_txd;
-  logic                      uart_dual_txd;
+  logic                      uart_multi_txd;
 
   assign enable_uart = sw[15];
-  assign use_dual_uart = sw[14];
-  assign uart_busy = use_dual_uart ? uart_dual_busy : uart_single_busy;
-  assign uart_txd = use_dual_uart ? uart_dual_txd : uart_single_txd;
+  assign use_multi_uart = sw[14];
+  assign uart_busy = use_multi_uart ? uart_multi_busy : uart_single_busy;
+  assign uart_txd = use_multi_uart ? uart_multi_txd : uart_single_txd;
 
   always_ff @(posedge clk_100mhz) begin
     // When a new audio sample received it is waiting to be sent
     if (sys_rst) begin
       audio_sample_waiting <= 0;
       uart_single_data_in <= 0;
-      uart_dual_data_in <= 0;
+      uart_multi_data_in <= 0;
       uart_data_valid <= 0;
-      is_even_sample <= 0;
+      sample_phase <= 0;
+      frame_sequence <= 0;
     end
-    else if ((dss_valid_out && ~use_dual_uart) || (audio_valid_out && use_dual_uart)) begin
+    else if ((dss_valid_out && ~use_multi_uart) || (audio_valid_out && use_multi_uart)) begin
       if (!uart_busy) begin
         // Sent via uart if not busy
         uart_data_valid <= 1;
@@ -227,9 +245,12 @@ module top_level (
 
       // Update uart data inputs with the new samples
       uart_single_data_in <= dss_audio_out[23:10];
-      uart_dual_data_in <= {audio_out[1][23:8], audio_out[0][23:8]};
-      // Toggle is_even_sample on each new sample
-      is_even_sample <= ~is_even_sample;
+      uart_multi_data_in <= {audio_out[3][23:10], audio_out[2][23:10], audio_out[1][23:10], audio_out[0][23:10], frame_sequence};
+      // Count each new sample, and each multi mic frame slot (the sample taken as the phase wraps)
+      sample_phase <= sample_phase + 1;
+      if (sample_phase == 3) begin
+        frame_sequence <= frame_sequence + 1;
+      end
     end else if (!uart_busy && audio_sample_waiting) begin
         // Trigger uart when no longer busy and sample waiting
         audio_sample_waiting <= 0;
@@ -246,19 +267,20 @@ module top_level (
   .clk_in(clk_100mhz),
   .rst_in(sys_rst),
   .data_in(uart_single_data_in),
-  .trigger_in(uart_data_valid && ~use_dual_uart && enable_uart),
+  .trigger_in(uart_data_valid && ~use_multi_uart && enable_uart),
   .busy_out(uart_single_busy),
   .tx_wire_out(uart_single_txd)
   );
 
-  // uart_byte_transmit #(.NUM_BYTES(4), .BAUD_RATE(921_600)) uart_transmit_dual_m (
-  // .clk_in(clk_100mhz),
-  // .rst_in(sys_rst),
-  // .data_in(uart_dual_data_in),
-  // .trigger_in(uart_data_valid && use_dual_uart && is_even_sample && enable_uart),
-  // .busy_out(uart_dual_busy),
-  // .tx_wire_out(uart_dual_txd)
-  // );
+  // 9 bytes per frame (sequence number, then low and high 7 bits of mics 1-4); only the last byte has its alignment bit set
+  uart_byte_transmit #(.NUM_BYTES(9), .BAUD_RATE(921_600)) uart_transmit_multi_m (
+  .clk_in(clk_100mhz),
+  .rst_in(sys_rst),
+  .data_in(uart_multi_data_in),
+  .trigger_in(uart_data_valid && use_multi_uart && sample_phase == 0 && enable_uart),
+  .busy_out(uart_multi_busy),
+  .tx_wire_out(uart_multi_txd)
+  );
 
   
 
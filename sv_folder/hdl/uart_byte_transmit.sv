@@ -20,6 +20,15 @@ logic [NUM_BYTES-1:0][7:0]    byte_queue;
 logic [7:0]                 uart_data_in;
 logic                       uart_data_valid;
 logic                       uart_busy;
+logic [NUM_BYTES-1:0][7:0]    frame_bytes;
+
+// Bit 7 of each byte is the alignment bit: only the last byte of a frame sets it,
+// so the receiver can find frame boundaries for any NUM_BYTES
+always_comb begin
+    for (int i = 0; i < NUM_BYTES; i++) begin
+        frame_bytes[i] = {i == NUM_BYTES - 1, data_in[i]};
+    end
+end
 
 always_ff @(posedge clk_in) begin
     // When a new audio sample recieved it is waiting to be sent
@@ -33,8 +42,8 @@ always_ff @(posedge clk_in) begin
     else if (!uart_busy) begin
         if (trigger_in) begin
             // Send first byte (lsb) to uart
-            uart_data_in <= {1'b0, data_in[0]}; // lower byte sends a 0 alignment bit
-            byte_queue <= {8'b0, {1'b1, data_in[NUM_BYTES-1:1]}}; // high byte sends a 1 alignment bit NOTE: WILL ONLY WORK WITH 2 BYTE
+            uart_data_in <= frame_bytes[0];
+            byte_queue <= frame_bytes >> 8;
             queue_position <= NUM_BYTES - 1;
             uart_data_valid <= 1;
             busy_out <= 1;
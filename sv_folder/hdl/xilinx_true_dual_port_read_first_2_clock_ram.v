@@ -53,7 +53,12 @@ module xilinx_true_dual_port_read_first_2_clock_ram #(
       integer ram_index;
       initial
         for (ram_index = 0; ram_index < RAM_DEPTH; ram_index = ram_index + 1)
+`ifdef VERILATOR
+          // Non-blocking: Verilator rejects blocking and non-blocking writes to the same memory (BLKANDNBLK)
+          BRAM[ram_index] <= {RAM_WIDTH{1'b0}};
+`else
           BRAM[ram_index] = {RAM_WIDTH{1'b0}};
+`endif
     end
   endgenerate
   integer idx;
@@ -0,0 +1,53 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+// Benchmark harness for delay_bram (see bench_simulators.py). The 100 MHz clock, reset and
+// valid_in strobes are generated here, so the simulator runs without waking Python.
+module bench_delay_bram #(
+    parameter NUM_MICS = 4,
+    parameter VALID_CYCLES = 128                      // clk_in cycles between valid_in strobes
+) ();
+
+logic clk_in = 0;
+logic rst_in = 1;
+logic valid_in = 0;
+logic [7:0] valid_count = 0;
+logic signed [23:0] audio_in_1, audio_in_2, audio_in_3, audio_in_4;
+logic signed [23:0] audio_out;
+logic valid_out;
+
+always #5 clk_in = ~clk_in;                           // 100 MHz
+
+initial begin
+    audio_in_1 = $urandom;
+    audio_in_2 = $urandom;
+    audio_in_3 = $urandom;
+    audio_in_4 = $urandom;
+    repeat (4) @(posedge clk_in);
+    rst_in <= 0;
+end
+
+always_ff @(posedge clk_in) begin
+    valid_count <= (valid_count == VALID_CYCLES - 1) ? 0 : valid_count + 1;
+    valid_in <= (valid_count == 0);
+end
+
+delay_bram #(.NUM_MICS(NUM_MICS)) dut (
+    .clk_in(clk_in),
+    .rst_in(rst_in),
+    .valid_in(valid_in),
+    .delay_1(8'd0),
+    .delay_2(8'd3),
+    .delay_3(8'd6),
+    .delay_4(8'd9),
+    .audio_in_1(audio_in_1),
+    .audio_in_2(audio_in_2),
+    .audio_in_3(audio_in_3),
+    .audio_in_4(audio_in_4),
+    .audio_out(audio_out),
+    .valid_out(valid_out)
+);
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,35 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+// Benchmark harness for pdm (see bench_simulators.py). The 100 MHz clock, reset and the
+// 5 MHz sample_in clock are generated here, so the simulator runs without waking Python.
+module bench_pdm #(
+    parameter BIT_WIDTH = 24
+) ();
+
+logic clk_in = 0;
+logic rst_in = 1;
+logic sample_in = 0;
+logic signed [BIT_WIDTH-1:0] audio_in;
+logic pdm_out;
+
+always #5 clk_in = ~clk_in;                           // 100 MHz
+always #100 sample_in = ~sample_in;                   // 5 MHz, every 20 clk_in cycles
+
+initial begin
+    audio_in = $urandom >> (33 - BIT_WIDTH);         // positive, under full scale
+    repeat (4) @(posedge clk_in);
+    rst_in <= 0;
+end
+
+pdm #(.BIT_WIDTH(BIT_WIDTH)) dut (
+    .clk_in(clk_in),
+    .sample_in(sample_in),
+    .rst_in(rst_in),
+    .audio_in(audio_in),
+    .pdm_out(pdm_out)
+);
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,48 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+// Benchmark harness for tdm_receive (see bench_simulators.py). The 100 MHz clock, reset and a
+// 5 MHz TDM bus of random bits (ws high on one sck edge every 128) are generated here, so the
+// simulator runs without waking Python.
+module bench_tdm_receive #(
+    parameter BIT_WIDTH = 24,
+    parameter SLOTS = 4
+) ();
+
+logic clk_in = 0;
+logic rst_in = 1;
+logic sck_in = 0;
+logic ws_in = 0;
+logic sd_in = 0;
+logic [6:0] sck_count = 0;                            // sck edge within the frame, 128 per frame
+logic [BIT_WIDTH-1:0] audio_out[SLOTS];
+logic audio_valid_out;
+
+always #5 clk_in = ~clk_in;                           // 100 MHz
+always #100 sck_in = ~sck_in;                         // 5 MHz, as on the board
+
+initial begin
+    repeat (4) @(posedge clk_in);
+    rst_in <= 0;
+end
+
+// Levels for each rising sck edge are set on the falling edge before it
+always @(negedge sck_in) begin
+    sck_count <= sck_count + 1;
+    ws_in <= (sck_count == 0);
+    sd_in <= $urandom % 2;
+end
+
+tdm_receive #(.BIT_WIDTH(BIT_WIDTH), .SLOTS(SLOTS)) dut (
+    .clk_in(clk_in),
+    .sck_in(sck_in),
+    .ws_in(ws_in),
+    .sd_in(sd_in),
+    .rst_in(rst_in),
+    .audio_out(audio_out),
+    .audio_valid_out(audio_valid_out)
+);
+
+endmodule
+
+`default_nettype wire
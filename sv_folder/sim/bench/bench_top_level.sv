@@ -0,0 +1,47 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+// Benchmark harness for top_level (see bench_simulators.py). The 100 MHz clock, the reset
+// button and a toggling mic data line are generated here, so the simulator runs without
+// waking Python. top_level makes its own TDM clocks; sw[14] selects the multi mic UART stream.
+module bench_top_level ();
+
+logic clk_100mhz = 0;
+logic [3:0] btn = 4'b0001;
+logic tdm_data = 0;
+wire tdm_data_in;
+
+assign tdm_data_in = tdm_data;
+
+always #5 clk_100mhz = ~clk_100mhz;                   // 100 MHz
+always #365 tdm_data = ~tdm_data;
+
+initial begin
+    repeat (4) @(posedge clk_100mhz);
+    btn <= 4'b0000;
+end
+
+top_level dut (
+    .clk_100mhz(clk_100mhz),
+    .sw(16'h4000),
+    .btn(btn),
+    .led(),
+    .rgb0(),
+    .rgb1(),
+    .tdm_data_in(tdm_data_in),
+    .tdm_ws_out(),
+    .tdm_sck_out(),
+    .uart_rxd(1'b1),
+    .uart_txd(),
+    .ss0_an(),
+    .ss1_an(),
+    .ss0_c(),
+    .ss1_c(),
+    .spkl(),
+    .spkr(),
+    .audio_port_out()
+);
+
+endmodule
+
+`default_nettype wire
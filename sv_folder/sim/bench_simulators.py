@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import cocotb
+from cocotb.triggers import Timer
+
+from sim_runner import BUILD_ARGS, HDL_PATH, SIM_PATH, SIMULATORS, run_testbench
+
+CLK_PERIOD_NS = 10 # 100 MHz, as on the board
+BENCH_CYCLES = 200_000 # 2 ms of simulated time per design
+BUILD_ROOT = SIM_PATH / "sim_build" / "bench"
+BENCH_PATH = SIM_PATH / "bench"
+# The harnesses make their clocks with delays (always #5), which Verilator only runs with --timing.
+# Its scheduler is built on C++20 coroutines; name the standard for installs that were not configured with it.
+BENCH_BUILD_ARGS = {"verilator": ["--timing", "-CFLAGS", "-std=c++20"]}
+
+# What each benchmark builds: the design's sources and parameters. Each one runs inside
+# bench/bench_<design>.sv, which generates its 100 MHz clock, reset and strobes in HDL.
+DESIGNS = {
+    "delay_bram": {
+        "sources": [HDL_PATH / "delay_bram.sv", HDL_PATH / "evt_counter.sv",
+                    HDL_PATH / "xilinx_true_dual_port_read_first_2_clock_ram.v"],
+        "parameters": {"NUM_MICS": 4},
+    },
+    "tdm_receive": {
+        "sources": [HDL_PATH / "tdm_receive.sv"],
+        "parameters": {"BIT_WIDTH": 24, "SLOTS": 4},
+    },
+    "pdm": {
+        "sources": [HDL_PATH / "pdm.sv"],
+        "parameters": {"BIT_WIDTH": 24},
+    },
+    "top_level": {
+        "sources": [HDL_PATH / name for name in (
+            "top_level.sv", "counter_neg.sv", "tdm_receive.sv", "ang_to_ascii.sv", "angle_delay_lut.sv",
+            "seven_segment_controller.sv", "bto7s.sv", "delay_bram.sv", "evt_counter.sv",
+            "xilinx_true_dual_port_read_first_2_clock_ram.v", "uart_byte_transmit.sv", "uart_transmit.sv", "pdm.sv")],
+        "parameters": {},
+    },
+}
+
+@cocotb.test()
+async def bench_design(dut):
+    """
+    Let the harness run for BENCH_CYCLES cycles and record the wall-clock time in BENCH_RESULTS.
+
+    Clocks and stimulus are all in HDL, so Python wakes once for the whole run and the
+    time is the simulator's own.
+    """
+    cycles = int(os.getenv("BENCH_CYCLES", BENCH_CYCLES))
+    start = time.perf_counter()
+    await Timer(cycles * CLK_PERIOD_NS, units="ns")
+    wall_time = time.perf_counter() - start
+    Path(os.environ["BENCH_RESULTS"]).write_text(json.dumps({"cycles": cycles, "wall_time": wall_time}))
+
+def bench(design, simulator, cycles=BENCH_CYCLES, build_root=BUILD_ROOT):
+    """
+    Builds a design with one simulator and times BENCH_CYCLES cycles of it.
+
+    Parameters:
+    - design (str): key of DESIGNS.
+    - simulator (str): cocotb simulator name (icarus, or verilator once it is in SIMULATORS).
+    - cycles (int): 100 MHz clock cycles to simulate.
+    - build_root (Path): folder holding the benchmark builds.
+
+    Returns:
+    - dict: cycles, build_time (s, building or reusing the build and starting the simulator), wall_time (s, simulating),
+      cycles_per_second, or error if the build or the run failed.
+    """
+    build_dir = build_root / simulator / design
+    results = build_dir / "bench.json"
+    build_dir.mkdir(parents=True, exist_ok=True)
+    results.unlink(missing_ok=True)
+
+    os.environ["SIM"] = simulator
+    start = time.perf_counter()
+    try:
+        run_testbench(f"bench_{design}", "bench_simulators",
+                      DESIGNS[design]["sources"] + [BENCH_PATH / f"bench_{design}.sv"], DESIGNS[design]["parameters"],
+                      build_dir=build_dir, waves=False,
+                      build_args=BUILD_ARGS.get(simulator, []) + BENCH_BUILD_ARGS.get(simulator, []),
+                      test_env={"BENCH_CYCLES": cycles, "BENCH_RESULTS": results.resolve()})
+    except SystemExit as error: # missing simulator, failed build or crashed simulation
+        return {"error": str(error)}
+    total_time = time.perf_counter() - start
+    if not results.exists():
+        return {"error": f"no benchmark results (see {build_dir})"}
+
+    result = json.loads(results.read_text())
+    result["build_time"] = total_time - result["wall_time"]
+    result["cycles_per_second"] = result["cycles"] / result["wall_time"]
+    return result
+
+def print_benchmark(results, simulators):
+    """Prints simulated cycles per wall-clock second for every design and simulator, and each simulator's speedup over the first"""
+    header = "".join(f"{simulator + ' cyc/s':>18}{'start (s)':>11}" for simulator in simulators)
+    print(f"\n{'design':<14}{header}{'speedup':>10}")
+    for design, by_simulator in results.items():
+        line = f"{design:<14}"
+        for simulator in simulators:
+            result = by_simulator[simulator]
+            if "error" in result:
+                line += f"{'failed':>18}{'':>11}"
+            else:
+                line += f"{result['cycles_per_second']:>18,.0f}{result['build_time']:>11.1f}"
+        rates = [by_simulator[simulator].get("cycles_per_second") for simulator in simulators]
+        if len(rates) > 1 and None not in rates:
+            line += f"{rates[-1] / rates[0]:>9.1f}x"
+        print(line)
+    for design, by_simulator in results.items():
+        for simulator, result in by_simulator.items():
+            if "error" in result:
+                print(f"{design} on {simulator}: {result['error']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare simulated cycles per second of the simulators on the main designs.")
+    parser.add_argument("designs", nargs="*", help=f"designs to run (default all of {', '.join(DESIGNS)})")
+    parser.add_argument("--sim", action="append", choices=SIMULATORS, help="simulator to run (repeatable; default all)")
+    parser.add_argument("--cycles", type=int, default=BENCH_CYCLES, help="100 MHz cycles to simulate per design")
+    args = parser.parse_args()
+
+    simulators = args.sim or list(SIMULATORS)
+    designs = args.designs or list(DESIGNS)
+    unknown = [design for design in designs if design not in DESIGNS]
+    if unknown:
+        parser.error(f"unknown designs {unknown}, pick from {list(DESIGNS)}")
+    results = {design: {simulator: bench(design, simulator, args.cycles) for simulator in simulators} for design in designs}
+    print_benchmark(results, simulators)
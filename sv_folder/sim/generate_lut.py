@@ -1,45 +1,162 @@
-import math
+import argparse
+import sys
+from pathlib import Path
 
-# Define the speed of sound
-SPEED_OF_SOUND = 343.0  # meters/second
+import numpy as np
 
-def generate_lut(distance, frequency):
+SIM_PATH = Path(__file__).resolve().parent.parent.parent / "sim"
+sys.path.append(str(SIM_PATH))
+from delay_tables import SPEED_OF_SOUND, delay_table
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data"
+NUM_MICS = 4
+ANGLE_STEP = 1.0
+MIN_BITS = 8 # angle_in and the delay outputs of angle_delay_lut.sv are 8 bits wide
+
+def lut_delays(distance, frequency, num_mics=NUM_MICS, angle_step=ANGLE_STEP, speed_of_sound=SPEED_OF_SOUND):
     """
-    Generates and saves the LUT used to store the expected cycle delay (for n = 1 in the (n * d * cos(theta)) / c equation) given the distance between mics and and frequency of sampling at every discrete angle value [0,180].
-    This will be used as the LUT in the angle_delay_LUT module.
-    The results of this are stored in LUT.txt and can be copied over to the angle_delay_LUT.sv file.
-    
+    Computes the whole-sample delay of every mic at every angle code, the way angle_delay_lut.sv does.
+
+    Each angle has one base delay (for n = 1 in the (n * d * cos(theta)) / c equation,
+    truncated to whole cycles at the integer sampling frequency, without its sign).
+    Mic n is delayed by n times the base up to 90 degrees; past 90 degrees the order
+    is reversed, so the mic the sound reaches last is never delayed.
+
     Parameters:
     - distance (float): distance between microphones, in m.
-    - frequency (int): audio sampling frequency, in Hz.
+    - frequency (float): audio sampling frequency, in Hz.
+    - num_mics (int): number of microphones.
+    - angle_step (float): degrees between angle codes (code k is k * angle_step degrees).
+    - speed_of_sound (float): speed of sound, in m/s.
 
-    Saves (in LUT.txt):
-    - LUT: the LUT to be used in the angle_delay_lut.sv module: 
+    Returns:
+    - numpy array: (num_angles,) angles of the codes, in degrees.
+    - numpy array: (num_angles,) int64 base delay of each angle.
+    - numpy array: (num_angles, num_mics) int64 delay of each mic.
     """
-    file = open("LUT.txt", "w") 
+    table = delay_table(num_mics, distance, frequency, speed_of_sound, angle_step)
+    multiples = np.arange(num_mics)
+    multiples = np.where((table.angles > 90)[:, np.newaxis], multiples[::-1], multiples)
+    return table.angles, table.lut, table.lut[:, np.newaxis] * multiples
 
-    # to get the answer in seconds, do distance * math.cos(angle * math.pi / 180) / SPEED_OF_SOUND.
+def case_block(delays, angle_bits, delay_bits):
+    """
+    Formats the delay table as a SystemVerilog case block on angle_in, for tools that cannot $readmemh.
 
-    # the frequency gives us number of samples per second.
-    # so, to determine the number of cycles delay, if we're given one sample per valid cycle,
-    # we must multiply this answer by the frequency.
+    Each entry assigns angle_delay_lut's delays_out a {mic N, ..., mic 1} concatenation,
+    so mic 1 sits in the low delay_bits; wrapped in always_comb it can stand in for the lut lookup.
 
-    # for angle in range(181):
-    #     file.write(f"\ndelay_table[{angle}] = {int(float(distance) * math.cos(int(angle) * math.pi / 180) / SPEED_OF_SOUND * int(frequency))};")
+    Returns:
+    - str: the case items, one per angle code, and a default of zero.
+    """
+    lines = []
+    for code, mic_delays in enumerate(delays):
+        fields = ", ".join(f"{delay_bits}'d{delay}" for delay in mic_delays[::-1])
+        lines.append(f"{angle_bits}'d{code}: delays_out = {{{fields}}};")
+    lines.append("default: delays_out = '0;")
+    return "\n".join(lines) + "\n"
 
-    for angle in range(181):
-        delay_val = int(float(distance) * math.cos(int(angle) * math.pi / 180) / SPEED_OF_SOUND * int(frequency))
-        file.write(f"\n8'd{angle}: delay = 8'd{abs(delay_val)};")
+def mem_lines(delays, delay_bits):
+    """
+    Formats the delay table for angle_delay_lut's $readmemh: one hex word per angle code, packed like delays_out.
 
-    file.close() 
+    Returns:
+    - str: the .mem file contents.
+    """
+    shifts = np.arange(delays.shape[1], dtype=object) * delay_bits
+    words = (delays.astype(object) << shifts).sum(axis=1)
+    digits = -(-delays.shape[1] * delay_bits // 4)
+    return "".join(f"{word:0{digits}x}\n" for word in words)
+
+def parameter_header(lut, mem_name, description):
+    """
+    Formats the angle_delay_lut parameters of a table as SystemVerilog localparams, for top_level to `include.
+
+    Parameters:
+    - lut (dict): table as generate_lut returns it.
+    - mem_name (str): name of the .mem file angle_delay_lut reads the table from.
+    - description (str): geometry the table was generated for, written as a comment.
+
+    Returns:
+    - str: the header contents, one LUT_<parameter> localparam per angle_delay_lut parameter.
+    """
+    lines = [f"// Generated by sim/generate_lut.py: {description}"]
+    lines += [f"localparam LUT_{name} = {value};" for name, value in module_parameters(lut).items()]
+    lines.append(f'localparam LUT_FILE = "{mem_name}";')
+    return "\n".join(lines) + "\n"
+
+def generate_lut(distance, frequency, out, num_mics=NUM_MICS, angle_step=ANGLE_STEP):
+    """
+    Generates and saves the LUT used by angle_delay_lut from one vectorized computation of every mic's delay at every discrete angle value [0,180].
+
+    Everything is written to out with a suffix added:
+    - out.mem: the table angle_delay_lut reads with $readmemh (build.tcl adds ./data/*.mem to the
+      project, and sim_runner copies it next to the simulation).
+    - out.npz: the NumPy table datapath_model loads.
+    - out.svh: the angle_delay_lut parameters for the table, which top_level includes.
+    - out.txt: an SV case block, for tools without $readmemh.
+    top_level and datapath_model read data/angle_delay_lut.*, so out = data/angle_delay_lut replaces
+    the table the design is built with; any other out leaves it alone.
+
+    Parameters:
+    - distance (float): distance between microphones, in m.
+    - frequency (float): audio sampling frequency, in Hz.
+    - out (str or Path): path of the output files, without a suffix (one is added to each).
+    - num_mics (int): number of microphones.
+    - angle_step (float): degrees between angle codes.
+
+    Returns:
+    - dict: angles, base and delays (as lut_delays returns them) and the angle_bits and delay_bits of the LUT ports.
+    """
+    angles, base, delays = lut_delays(distance, frequency, num_mics, angle_step)
+    angle_bits = max(MIN_BITS, (len(angles) - 1).bit_length())
+    delay_bits = max(MIN_BITS, int(delays.max()).bit_length())
+    lut = {'angles': angles, 'base': base, 'delays': delays, 'angle_bits': angle_bits, 'delay_bits': delay_bits}
+
+    paths = {suffix: Path(out).with_name(Path(out).name + suffix) for suffix in (".txt", ".mem", ".svh", ".npz")}
+    paths[".mem"].parent.mkdir(parents=True, exist_ok=True)
+    description = f"{num_mics} mics, {distance} m apart, {frequency} Hz, angle_in = angle / {angle_step} degrees"
+    header = (f"// {description}\n"
+              f"// delays_out is [{num_mics * delay_bits - 1}:0], mic 1 in the low {delay_bits} bits\n")
+    paths[".txt"].write_text(header + case_block(delays, angle_bits, delay_bits))
+    paths[".mem"].write_text(mem_lines(delays, delay_bits))
+    paths[".svh"].write_text(parameter_header(lut, paths[".mem"].name, description))
+    np.savez(paths[".npz"], distance=distance, frequency=frequency, angle_step=angle_step, **lut)
+    return lut
+
+def module_parameters(lut):
+    """
+    The angle_delay_lut parameters that match a generated table.
+
+    Parameters:
+    - lut (dict): table as generate_lut returns it (or the .npz file it saves, opened with np.load).
+
+    Returns:
+    - dict: NUM_MICS, DELAY_BITS, ANGLE_BITS and NUM_ANGLES.
+    """
+    return {'NUM_MICS': int(lut['delays'].shape[1]), 'DELAY_BITS': int(lut['delay_bits']),
+            'ANGLE_BITS': int(lut['angle_bits']), 'NUM_ANGLES': len(lut['angles'])}
 
 def generate_display_lut():
-    file = open("ang_ascii_lut.txt", "w") 
+    file = open("ang_ascii_lut.txt", "w")
 
     for angle in range(181):
         ascii_rep = ((angle // 100) << 8) | (((angle % 100) // 10) << 4) | (angle % 10)
-        file.write(f"\n8'd{angle}: ascii_out = 12'b{"{:012b}".format(ascii_rep)};")
+        file.write(f"\n8'd{angle}: ascii_out = 12'b{ascii_rep:012b};")
 
 if __name__ == "__main__":
     # generate_display_lut()
-    generate_lut(float(input("\nEnter the distance between microphones (in m.): ")), float(input("\nEnter the sampling frequency (in Hz): ")))
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the angle to delay LUT as a .mem file, a NumPy table, its SV parameters and an SV case block.")
+    parser.add_argument("--distance", type=float, help="distance between microphones, in m (prompted for if left out)")
+    parser.add_argument("--frequency", type=float, help="audio sampling frequency, in Hz (prompted for if left out)")
+    parser.add_argument("--mics", type=int, default=NUM_MICS)
+    parser.add_argument("--angle-step", type=float, default=ANGLE_STEP, help="degrees between angle codes")
+    parser.add_argument("--out", type=Path, required=True,
+                        help="output path without a suffix (.mem, .npz, .svh and .txt are added); sv_folder/data/angle_delay_lut replaces the table top_level is built with")
+    args = parser.parse_args()
+
+    distance = args.distance if args.distance is not None else float(input("\nEnter the distance between microphones (in m.): "))
+    frequency = args.frequency if args.frequency is not None else float(input("\nEnter the sampling frequency (in Hz): "))
+    lut = generate_lut(distance, frequency, args.out, args.mics, args.angle_step)
+    overrides = ", ".join(f".{name}({value})" for name, value in module_parameters(lut).items())
+    print(f"Wrote {args.out}.mem, .npz, .svh and .txt; angle_delay_lut #({overrides}) reads the table")
@@ -0,0 +1,295 @@
+"""
+Bit-accurate NumPy model of the FPGA audio datapath, one function per module:
+
+    tdm_receive -> angle_delay_lut / delay_bram -> top_level [23:10] -> uart_byte_transmit
+
+Every function works on whole arrays of samples, so the model runs at millions of
+samples per second and can serve as the oracle for the cocotb tests as well as for
+checking streams captured from the board.
+"""
+import numpy as np
+from pathlib import Path
+
+HDL_PATH = Path(__file__).resolve().parent.parent.parent / "hdl"
+# angle_delay_lut's table, as generate_lut.py writes it next to the .mem file the module reads
+LUT_PATH = HDL_PATH.parent / "data" / "angle_delay_lut.npz"
+
+# tdm_receive
+BIT_WIDTH = 24
+SLOTS = 4
+SLOT_CYCLES = 32  # sck cycles per slot (TOTAL_CYCLES + 1)
+
+# delay_bram
+NUM_MICS = 4
+ADDR_BITS = 11
+BRAM_DEPTH = 1 << ADDR_BITS
+MAX_COUNT = 100_000_000  # evt_counter wraps here, which is not a multiple of BRAM_DEPTH
+
+# top_level / uart_byte_transmit
+UART_SAMPLE_MSB = 23
+UART_SAMPLE_LSB = 10
+UART_SAMPLE_BITS = UART_SAMPLE_MSB - UART_SAMPLE_LSB + 1
+PAYLOAD_BITS = 7
+ALIGNMENT_BIT = 0x80
+SEQUENCE_BITS = 7  # frame_sequence in top_level, the first byte of each multi mic frame
+
+def to_signed(values, bits):
+    """Interpret the low bits of integer values as two's complement numbers (returns int64)."""
+    values = np.asarray(values, dtype=np.int64) & ((1 << bits) - 1)
+    return values - ((values >> (bits - 1)) << bits)
+
+def to_unsigned(values, bits):
+    """Return the low bits of integer values as non-negative numbers (returns int64)."""
+    return np.asarray(values, dtype=np.int64) & ((1 << bits) - 1)
+
+def tdm_pack(samples, bit_width=BIT_WIDTH, slot_cycles=SLOT_CYCLES):
+    """
+    Serialize samples into the ws/sd bits seen on each rising sck edge.
+
+    Each frame starts with one edge with ws high (the receiver ignores sd on it),
+    followed by one slot_cycles-long slot per mic carrying bit_width bits MSB first
+    and zero padding; the next frame's ws edge takes the last padding edge.
+
+    Parameters:
+    - samples (numpy array): (slots, num_frames) array of samples (only the low bit_width bits are sent).
+    - bit_width (int): Bits per sample.
+    - slot_cycles (int): sck cycles per slot.
+
+    Returns:
+    - numpy array: ws bit on each sck edge (uint8).
+    - numpy array: sd bit on each sck edge (uint8).
+    """
+    samples = to_unsigned(np.atleast_2d(samples), bit_width)
+    slots, num_frames = samples.shape
+    frame_cycles = slots * slot_cycles
+
+    bits = (samples[:, :, np.newaxis] >> np.arange(bit_width - 1, -1, -1)) & 1
+    slot_bits = np.zeros((num_frames, slots, slot_cycles), dtype=np.uint8)
+    slot_bits[:, :, :bit_width] = bits.transpose(1, 0, 2)
+
+    # One extra edge so the last frame's final slot is complete
+    sd = np.zeros(num_frames * frame_cycles + 1, dtype=np.uint8)
+    sd[1:] = slot_bits.reshape(-1)
+    ws = np.zeros_like(sd)
+    ws[::frame_cycles] = 1
+    ws[-1] = 0
+    return ws, sd
+
+def tdm_receive(ws, sd, bit_width=BIT_WIDTH, slots=SLOTS, slot_cycles=SLOT_CYCLES, signed=True):
+    """
+    Recover the samples tdm_receive latches from per-edge ws/sd bits.
+
+    A frame starts at every edge with ws high. Frames cut short by the end of the
+    bits or by another ws edge before their last sample bit are dropped, as the
+    hardware never raises audio_valid_out for them.
+
+    Parameters:
+    - ws (numpy array): ws bit on each rising sck edge.
+    - sd (numpy array): sd bit on each rising sck edge.
+    - bit_width (int): Bits per sample.
+    - slots (int): Number of TDM slots (mics).
+    - slot_cycles (int): sck cycles per slot.
+    - signed (bool): Return samples as the signed values delay_bram sees, rather than raw bit patterns.
+
+    Returns:
+    - numpy array: (slots, num_frames) int64 array of samples.
+    """
+    ws = np.asarray(ws).astype(bool)
+    sd = np.asarray(sd, dtype=np.uint8)
+    starts = np.flatnonzero(ws)
+    last_bit = 1 + (slots - 1) * slot_cycles + bit_width - 1
+    next_start = np.append(starts[1:], len(ws))
+    starts = starts[(starts + last_bit < len(sd)) & (starts + last_bit < next_start)]
+
+    bit_idx = (starts[:, np.newaxis, np.newaxis] + 1
+               + slot_cycles * np.arange(slots)[np.newaxis, :, np.newaxis]
+               + np.arange(bit_width)[np.newaxis, np.newaxis, :])
+    # packbits turns each MSB-first sample into big-endian bytes, padded at the LSB end to a whole byte
+    packed = np.packbits(sd[bit_idx], axis=2).astype(np.int64)
+    weights = np.int64(1) << (8 * np.arange(packed.shape[2] - 1, -1, -1, dtype=np.int64))
+    samples = (packed @ weights).T >> (8 * packed.shape[2] - bit_width)
+    return to_signed(samples, bit_width) if signed else samples
+
+def read_lut_table(npz_path=LUT_PATH):
+    """
+    Load the angle_delay_lut table generate_lut.py wrote alongside the angle_delay_lut.mem the module reads.
+
+    Returns:
+    - numpy array: (2 ** angle_bits, num_mics) int64 delays indexed by angle_in (zero past the table, like the module).
+    """
+    with np.load(npz_path) as lut:
+        delays = lut['delays'].astype(np.int64)
+        angle_bits = int(lut['angle_bits'])
+    table = np.zeros((1 << angle_bits, delays.shape[1]), dtype=np.int64)
+    table[:len(delays)] = delays
+    return table
+
+def angle_delay_lut(angles, table=None):
+    """
+    Model angle_delay_lut: the per-mic delays (in samples) for each steering angle.
+
+    Up to 90 degrees the delays grow from mic 1 (0, d, 2d, 3d); above 90 they are
+    reversed (3d, 2d, d, 0). Angles past the end of the table give zero delays.
+
+    Parameters:
+    - angles (int or numpy array): Steering angle(s) as on angle_in.
+    - table (numpy array): (2 ** angle_bits, num_mics) delays (default is read_lut_table()).
+
+    Returns:
+    - numpy array: (num_mics,) delays for a single angle, or (num_angles, num_mics).
+    """
+    if table is None:
+        table = read_lut_table()
+    return table[to_unsigned(angles, (len(table) - 1).bit_length())]
+
+def bram_source_index(num_samples, delay, depth=BRAM_DEPTH, max_count=MAX_COUNT, start_count=0):
+    """
+    Index of the sample a delay_bram read returns for each incoming sample.
+
+    Sample k is written at the low address bits of the evt_counter value and the
+    read for it comes from delay + 1 addresses below the incremented counter.
+    Within one count the source is simply k - delay; around the wrap from
+    max_count - 1 to 0 the read lands on an address last written before the wrap,
+    which (as max_count is not a multiple of depth) is not the sample delay places
+    earlier.
+
+    Parameters:
+    - num_samples (int): Number of samples written.
+    - delay (int): Delay of this mic, in samples.
+    - depth (int): BRAM depth (a power of two).
+    - max_count (int): evt_counter wrap value.
+    - start_count (int): Counter value when the first sample arrives.
+
+    Returns:
+    - numpy array: int64 source sample index per sample (negative where the BRAM still holds its initial zeros).
+    """
+    k = np.arange(num_samples, dtype=np.int64)
+    count = (start_count + k) % max_count
+    # The read address is taken from the counter after it has counted sample k
+    next_count = (count + 1) % max_count
+    source = k - delay
+
+    wrapped = next_count <= delay
+    if np.any(wrapped):
+        # Most recent count before the wrap whose address matches the read address
+        addr = (next_count[wrapped] - 1 - delay) % depth
+        prev_count = max_count - 1 - ((max_count - 1 - addr) % depth)
+        epoch_start = k[wrapped] - count[wrapped] - np.where(next_count[wrapped] == 0, 0, max_count)
+        source[wrapped] = epoch_start + prev_count
+    # Negative indices are addresses not written during this run (zeros after reset)
+    return source
+
+def delay_bram(mic_samples, delays, num_mics=NUM_MICS, bits_audio=BIT_WIDTH, depth=BRAM_DEPTH,
+               max_count=MAX_COUNT, start_count=0, return_stages=False):
+    """
+    Model delay_bram: delay each mic through its BRAM, sum all four and shift.
+
+    All four BRAMs are always summed (unused inputs should be driven with zeros);
+    NUM_MICS only sets the shift and which mics valid_out waits for. The model
+    assumes the delays are constant for the whole run, i.e. start a new run after
+    every delay change, as the hardware restarts its valid logic then.
+
+    Parameters:
+    - mic_samples (numpy array): (mics, num_samples) signed input samples; missing mics are zero.
+    - delays (list of int): Delay of each of the four mics, in samples.
+    - num_mics (int): NUM_MICS parameter.
+    - bits_audio (int): BITS_AUDIO parameter.
+    - depth (int): BRAM depth.
+    - max_count (int): evt_counter wrap value.
+    - start_count (int): evt_counter value when the first sample arrives.
+    - return_stages (bool): Return the intermediate pipeline values too.
+
+    Returns:
+    - numpy array: int64 audio_out for each input sample.
+    - numpy array: bool valid_out for each input sample.
+    - dict (only if return_stages): delayed (4, num_samples) BRAM outputs and summed (num_samples,) sums.
+    """
+    mic_samples = np.atleast_2d(np.asarray(mic_samples, dtype=np.int64))
+    num_samples = mic_samples.shape[1]
+    inputs = np.zeros((len(delays), num_samples), dtype=np.int64)
+    inputs[:len(mic_samples)] = to_signed(mic_samples, bits_audio)
+
+    delayed = np.zeros_like(inputs)
+    for mic, delay in enumerate(delays):
+        source = bram_source_index(num_samples, int(delay) % (1 << 8), depth, max_count, start_count)
+        has_data = source >= 0
+        delayed[mic, has_data] = inputs[mic, source[has_data]]
+
+    summed = to_signed(delayed.sum(axis=0), bits_audio + 2)
+    audio_out = to_signed(summed >> int(np.ceil(np.log2(num_mics))), bits_audio)
+    valid = np.arange(num_samples) >= max(int(d) for d in delays[:num_mics])
+
+    if return_stages:
+        return audio_out, valid, {'delayed': delayed, 'summed': summed}
+    return audio_out, valid
+
+def uart_sample_field(audio_out):
+    """The 14-bit dss_audio_out[23:10] field top_level sends for each sample (unsigned)."""
+    return to_unsigned(np.asarray(audio_out, dtype=np.int64) >> UART_SAMPLE_LSB, UART_SAMPLE_BITS)
+
+def uart_frame_bytes(fields, num_bytes=2):
+    """
+    Model uart_byte_transmit: the bytes sent for each num_bytes * 7-bit field.
+
+    The field goes out 7 bits at a time, low bits first; only the last byte of each
+    frame has alignment bit 7 set.
+
+    Returns:
+    - numpy array: uint8 byte stream, num_bytes bytes per field.
+    """
+    fields = to_unsigned(fields, num_bytes * PAYLOAD_BITS)
+    shifts = np.arange(num_bytes) * PAYLOAD_BITS
+    frames = ((fields[:, np.newaxis] >> shifts) & 0x7F).astype(np.uint8)
+    frames[:, -1] |= ALIGNMENT_BIT
+    return frames.reshape(-1)
+
+def uart_multi_frame_bytes(mic_samples, sequence=None):
+    """
+    Model the multi mic UART mode of top_level: a sequence number, then every mic's [23:10] field, in one frame.
+
+    Parameters:
+    - mic_samples (numpy array): (mics, num_frames) signed 24-bit audio_out samples of the frames sent.
+    - sequence (numpy array): Frame slot of each frame sent, counted from reset (default: every
+      slot from 0 was sent). Only the low SEQUENCE_BITS go out.
+
+    Returns:
+    - numpy array: uint8 byte stream, 1 + 2 * mics bytes per frame, the sequence number then mic 1 first.
+    """
+    fields = uart_sample_field(mic_samples)
+    if sequence is None:
+        sequence = np.arange(fields.shape[1])
+    shifts = (SEQUENCE_BITS + np.arange(len(fields)) * UART_SAMPLE_BITS)[:, np.newaxis]
+    frames = (fields << shifts).sum(axis=0) | to_unsigned(np.asarray(sequence, dtype=np.int64), SEQUENCE_BITS)
+    return uart_frame_bytes(frames, 1 + 2 * len(fields))
+
+def host_samples(audio_out):
+    """The int16 samples the host decoder (sim/uart_decode.py) recovers for each audio_out value."""
+    return (uart_sample_field(audio_out) << (16 - UART_SAMPLE_BITS)).astype(np.uint16).view(np.int16)
+
+def datapath(mic_samples, angle, num_mics=NUM_MICS, table=None, start_count=0):
+    """
+    Run the whole chain for one steering angle: delays, delay-and-sum, truncation and UART framing.
+
+    Every valid delay_bram output is assumed to reach the UART (the link keeps up
+    at 921600 baud and 39062.5 samples/s).
+
+    Parameters:
+    - mic_samples (numpy array): (mics, num_samples) signed 24-bit samples, e.g. from tdm_receive.
+    - angle (int): Steering angle on the switches.
+    - num_mics (int): NUM_MICS of delay_bram.
+    - table (numpy array): angle_delay_lut table (default is read_lut_table()).
+    - start_count (int): evt_counter value when the first sample arrives.
+
+    Returns:
+    - dict: delays, audio_out, valid, uart_bytes (for the valid samples) and host_samples.
+    """
+    delays = angle_delay_lut(angle, table)
+    audio_out, valid = delay_bram(mic_samples, delays, num_mics, start_count=start_count)
+    sent = audio_out[valid]
+    return {
+        'delays': delays,
+        'audio_out': audio_out,
+        'valid': valid,
+        'uart_bytes': uart_frame_bytes(uart_sample_field(sent)),
+        'host_samples': host_samples(sent),
+    }
@@ -0,0 +1,153 @@
+"""
+Bit-exact NumPy model of pdm.sv and a decimation-filter analyzer for its output.
+
+The modulator keeps its error in (NEG_FEEDBACK, POS_FEEDBACK]. Each tick adds
+POS_FEEDBACK - audio_in when the error is at most audio_in and
+NEG_FEEDBACK - audio_in otherwise, which is exactly adding POS_FEEDBACK - audio_in
+modulo POS_FEEDBACK - NEG_FEEDBACK within that window. So the error after n ticks
+is a cumulative sum taken modulo the window size, and a whole second of
+oversampled output is a handful of array operations.
+"""
+import numpy as np
+
+SAMPLE_RATE = 39062.5
+OVERSAMPLE_FACTOR = 128
+BIT_WIDTH = 24
+CIC_ORDER = 3
+
+def pdm_modulate(audio_in, oversample=OVERSAMPLE_FACTOR, bit_width=BIT_WIDTH, error=0):
+    """
+    Model pdm: the pdm_out bit for every sample_in tick.
+
+    Parameters:
+    - audio_in (numpy array): Signed audio samples, each held for oversample ticks.
+    - oversample (int): sample_in ticks per audio sample (1 to pass per-tick input).
+    - bit_width (int): BIT_WIDTH parameter.
+    - error (int): Error register before the first tick (0 after reset).
+
+    Returns:
+    - numpy array: uint8 pdm_out after each tick.
+    - int: Error register after the last tick, to continue from.
+    """
+    pos_feedback = (1 << (bit_width - 1)) - 1
+    neg_feedback = -(1 << (bit_width - 1))
+    window = pos_feedback - neg_feedback
+
+    audio = np.repeat(np.asarray(audio_in, dtype=np.int64), oversample)
+    if not len(audio):
+        return np.zeros(0, dtype=np.uint8), error
+    # Offset of the error within the window (neg_feedback, pos_feedback] before each tick
+    steps = np.empty(len(audio), dtype=np.int64)
+    steps[0] = (error - neg_feedback - 1) % window
+    steps[1:] = (pos_feedback - audio[:-1]) % window
+    errors = np.cumsum(steps) % window + neg_feedback + 1
+
+    pdm_out = (errors < audio).astype(np.uint8)
+    error = int((errors[-1] - neg_feedback - 1 + pos_feedback - audio[-1]) % window + neg_feedback + 1)
+    return pdm_out, error
+
+def cic_decimate(pdm_bits, factor=OVERSAMPLE_FACTOR, order=CIC_ORDER):
+    """
+    Decimate a PDM bit stream with a CIC (sinc^order) filter.
+
+    The integrators run in int64 and are allowed to wrap; the comb stages undo the
+    wrap exactly, as in a hardware CIC, since the output never exceeds factor**order.
+
+    Parameters:
+    - pdm_bits (numpy array): 0/1 PDM bits.
+    - factor (int): Decimation factor (the oversampling ratio).
+    - order (int): Number of integrator/comb stages.
+
+    Returns:
+    - numpy array: float64 samples at the audio rate, scaled to [-1, 1].
+    """
+    signal = 2 * np.asarray(pdm_bits, dtype=np.int64) - 1
+    with np.errstate(over='ignore'):
+        for _ in range(order):
+            signal = np.cumsum(signal)
+        signal = signal[factor - 1::factor]
+        for _ in range(order):
+            signal = np.diff(signal, prepend=0)
+    # The first order - 1 outputs are still filling the filter
+    return signal[order - 1:] / float(factor ** order)
+
+def analyze_tone(signal, sample_rate, frequency, harmonics=5, band=20000, settle=64):
+    """
+    Measure SNR, THD and SINAD of a sine wave.
+
+    Parameters:
+    - signal (numpy array): Decimated samples containing the tone.
+    - sample_rate (float): Sample rate of signal, in Hz.
+    - frequency (float): Frequency of the tone, in Hz.
+    - harmonics (int): Highest harmonic counted as distortion.
+    - band (float): Upper edge of the band noise is measured in, in Hz.
+    - settle (int): Samples dropped from the start while the filter settles.
+
+    Returns:
+    - dict: snr_db, thd_db, sinad_db and amplitude (of the fundamental, relative to full scale).
+    """
+    signal = np.asarray(signal, dtype=np.float64)[settle:]
+    signal = signal - signal.mean()
+    window = np.blackman(len(signal))
+    power = np.abs(np.fft.rfft(signal * window)) ** 2
+    freqs = np.fft.rfftfreq(len(signal), 1 / sample_rate)
+    # Blackman leakage spreads a pure tone over +-3 bins
+    spread = 3
+
+    def tone_bins(tone_freq):
+        center = int(round(tone_freq * len(signal) / sample_rate))
+        return np.arange(max(center - spread, 0), min(center + spread + 1, len(power)))
+
+    in_band = (freqs > 0) & (freqs <= band)
+    fundamental = tone_bins(frequency)
+    harmonic_bins = [tone_bins(frequency * n) for n in range(2, harmonics + 1) if frequency * n <= band]
+    harmonic_bins = np.concatenate(harmonic_bins) if harmonic_bins else np.zeros(0, dtype=np.int64)
+
+    noise_mask = in_band.copy()
+    noise_mask[:spread + 1] = False  # DC leakage
+    noise_mask[fundamental] = False
+    noise_mask[harmonic_bins] = False
+
+    signal_power = power[fundamental].sum()
+    harmonic_power = power[harmonic_bins].sum()
+    noise_power = power[noise_mask].sum()
+    # By Parseval, a sine of amplitude A puts N * A**2 / 4 * sum(window**2) into the positive-frequency bins
+    amplitude = 2 * np.sqrt(signal_power / (len(signal) * (window ** 2).sum()))
+    return {
+        'snr_db': 10 * np.log10(signal_power / noise_power),
+        'thd_db': 10 * np.log10(max(harmonic_power, 1e-300) / signal_power),
+        'sinad_db': 10 * np.log10(signal_power / (noise_power + harmonic_power)),
+        'amplitude': amplitude,
+    }
+
+def sine_input(amplitude, frequency, duration, sample_rate=SAMPLE_RATE, bit_width=BIT_WIDTH):
+    """Return duration seconds of a sine wave at amplitude (fraction of full scale) as signed bit_width-bit samples."""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    full_scale = (1 << (bit_width - 1)) - 1
+    return (amplitude * full_scale * np.sin(2 * np.pi * frequency * t)).astype(np.int64)
+
+def characterize(amplitudes_db=(-60, -40, -20, -6, -1), frequency=1000, duration=1, sample_rate=SAMPLE_RATE,
+                 oversample=OVERSAMPLE_FACTOR):
+    """
+    Run the PDM model over long sine waves at several amplitudes and measure each.
+
+    Parameters:
+    - amplitudes_db (list of float): Tone amplitudes, in dB relative to full scale.
+    - frequency (float): Tone frequency, in Hz.
+    - duration (float): Length of each run, in seconds.
+    - sample_rate (float): Audio sample rate, in Hz.
+    - oversample (int): PDM oversampling ratio.
+
+    Returns:
+    - dict: Amplitude (dBFS) -> analyze_tone results.
+    """
+    results = {}
+    for amplitude_db in amplitudes_db:
+        audio = sine_input(10 ** (amplitude_db / 20), frequency, duration, sample_rate)
+        pdm_out, _ = pdm_modulate(audio, oversample)
+        results[amplitude_db] = analyze_tone(cic_decimate(pdm_out, oversample), sample_rate, frequency)
+    return results
+
+if __name__ == "__main__":
+    for amplitude_db, stats in characterize().items():
+        print(f"{amplitude_db:4} dBFS: SNR {stats['snr_db']:6.1f} dB, THD {stats['thd_db']:7.1f} dB, SINAD {stats['sinad_db']:6.1f} dB")
@@ -0,0 +1,381 @@
+import argparse
+import ast
+import importlib
+import itertools
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from sim_runner import SIMULATORS
+
+SIM_PATH = Path(__file__).resolve().parent
+BUILD_ROOT = SIM_PATH / "regression_build"
+MATRIX_NAMES = ("PARAMETER_MATRIX", "TEST_ENV_MATRIX")
+WINDOW_NS = 100_000 # simulation time dumped before a failure when a failed test is rerun with waves
+
+def discover_testbenches(sim_path=SIM_PATH):
+    """
+    Finds every *_runner in the test_*.py files of a folder, along with its parameter matrices.
+
+    The files are parsed rather than imported, so discovery works without a simulator
+    (and without the tests' own imports). PARAMETER_MATRIX maps HDL parameters to the
+    values to run with and TEST_ENV_MATRIX does the same for environment variables the
+    test reads; both must be literals.
+
+    Parameters:
+    - sim_path (Path): folder holding the cocotb tests.
+
+    Returns:
+    - list of dict: module, runner, parameter_matrix and test_env_matrix of every testbench.
+    """
+    testbenches = []
+    for path in sorted(sim_path.glob("test_*.py")):
+        tree = ast.parse(path.read_text(), filename=str(path))
+        matrices = {name: {} for name in MATRIX_NAMES}
+        runners = []
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and node.name.endswith("_runner"):
+                runners.append(node.name)
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name) and target.id in matrices:
+                        matrices[target.id] = ast.literal_eval(node.value)
+        for runner in runners:
+            testbenches.append({
+                "module": path.stem,
+                "runner": runner,
+                "parameter_matrix": matrices["PARAMETER_MATRIX"],
+                "test_env_matrix": matrices["TEST_ENV_MATRIX"],
+            })
+    return testbenches
+
+def expand_matrix(matrix):
+    """
+    Expands a matrix into every combination of its values.
+
+    Parameters:
+    - matrix (dict): name -> list of values.
+
+    Returns:
+    - list of dict: one name -> value dict per combination ([{}] for an empty matrix).
+    """
+    names = list(matrix)
+    return [dict(zip(names, values)) for values in itertools.product(*(matrix[name] for name in names))]
+
+def job_name(module, parameters, test_env):
+    """Build directory name of one job, e.g. tdm_receive-BIT_WIDTH16-SLOTS2"""
+    settings = [f"{name}{value}" for name, value in {**parameters, **test_env}.items()]
+    return "-".join([module.removeprefix("test_")] + settings)
+
+def regression_jobs(testbenches, filters=(), defaults_only=False):
+    """
+    Lists the jobs of a regression, one per testbench and matrix combination.
+
+    Parameters:
+    - testbenches (list of dict): from discover_testbenches.
+    - filters (list of str): keep only jobs whose name contains one of these (all jobs if empty).
+    - defaults_only (bool): run each testbench once with its runner's defaults, ignoring the matrices.
+
+    Returns:
+    - list of dict: name, module, runner, parameters and test_env of every job.
+    """
+    jobs = []
+    for testbench in testbenches:
+        parameter_sets = [{}] if defaults_only else expand_matrix(testbench["parameter_matrix"])
+        test_envs = [{}] if defaults_only else expand_matrix(testbench["test_env_matrix"])
+        for parameters, test_env in itertools.product(parameter_sets, test_envs):
+            name = job_name(testbench["module"], parameters, test_env)
+            if filters and not any(pattern in name for pattern in filters):
+                continue
+            jobs.append({
+                "name": name,
+                "module": testbench["module"],
+                "runner": testbench["runner"],
+                "parameters": parameters,
+                "test_env": test_env,
+            })
+    return jobs
+
+def read_results(results_xml):
+    """
+    Reads the test cases out of a cocotb results file.
+
+    Parameters:
+    - results_xml (Path): JUnit XML file written by cocotb.
+
+    Returns:
+    - list of dict: name, time (s, wall clock), sim_time_ns and failure (message, or None if it passed) per test.
+    """
+    tests = []
+    for testcase in ET.parse(results_xml).iter("testcase"):
+        failure = testcase.find("failure")
+        if failure is None:
+            failure = testcase.find("error")
+        tests.append({
+            "name": testcase.get("name"),
+            "time": float(testcase.get("time", 0)),
+            "sim_time_ns": float(testcase.get("sim_time_ns", 0)),
+            "failure": None if failure is None else (failure.get("message") or "failed"),
+        })
+    return tests
+
+def results_seed(results_xml):
+    """RANDOM_SEED a cocotb results file was run with (None if it is not recorded)"""
+    for prop in ET.parse(results_xml).iter("property"):
+        if prop.get("name") == "random_seed":
+            return int(prop.get("value"))
+    return None
+
+def call_runner(job, log_path, **options):
+    """
+    Imports a job's runner and calls it with its parameters, sending the process's stdout/stderr
+    (which the simulator inherits) to log_path while it runs.
+
+    Parameters:
+    - job (dict): from regression_jobs.
+    - log_path (Path): log file to write.
+    - options: more run_testbench keyword arguments (build_dir, results_xml, waves, ...).
+
+    Returns:
+    - str or None: the exception the runner raised, or None if it returned.
+    """
+    if str(SIM_PATH) not in sys.path:
+        sys.path.insert(0, str(SIM_PATH))
+    error = None
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(1), os.dup(2)]
+    with open(log_path, "w") as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            runner = getattr(importlib.import_module(job["module"]), job["runner"])
+            runner(job["parameters"], test_env=job["test_env"], **options)
+        except BaseException as exception: # the cocotb runner raises SystemExit when a build or simulation fails
+            error = f"{type(exception).__name__}: {exception}"
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+    return error
+
+def rerun_with_waves(job, build_dir, test, seed, window_ns=WINDOW_NS, scopes=(), rebuild=False):
+    """
+    Reruns one failed test with waveforms, dumped only in the window before it failed.
+
+    cocotb reseeds every test from RANDOM_SEED, so running the test alone with the same
+    seed replays the failure, and it starts at time 0, so it fails at the same sim_time_ns.
+
+    Parameters:
+    - job (dict): from regression_jobs.
+    - build_dir (Path): build directory for the rerun (its build has the dump module compiled in).
+    - test (dict): the failed test, from read_results.
+    - seed (int): RANDOM_SEED of the failed run.
+    - window_ns (float): how much simulation time before the failure to dump, in ns.
+    - scopes (list of str): signals or instances to dump (the whole toplevel if empty).
+    - rebuild (bool): build even if the cached build matches.
+
+    Returns:
+    - dict: waves (the waveform file, or None if none was written), log and error of the rerun.
+    """
+    build_dir.mkdir(parents=True, exist_ok=True)
+    log_path = build_dir / "run.log"
+    for stale in list(build_dir.glob("*.fst")) + list(build_dir.glob("*.vcd")):
+        stale.unlink()
+    waves = {"scopes": list(scopes), "depth": 0, "start_ns": max(test["sim_time_ns"] - window_ns, 0), "stop_ns": None}
+    error = call_runner(job, log_path, build_dir=build_dir, results_xml=build_dir / "results.xml", rebuild=rebuild,
+                        waves=waves, testcase=test["name"], seed=seed)
+    dumps = sorted(build_dir.glob("*.fst")) + sorted(build_dir.glob("*.vcd"))
+    return {"waves": str(dumps[0]) if dumps else None, "log": str(log_path), "error": error}
+
+def run_job(job, build_root=BUILD_ROOT, rebuild=False, waves=None, seed=None, failure_waves=None):
+    """
+    Builds and runs one job in its own build directory, logging the simulator output to run.log there.
+
+    Meant to run in a worker process: the runner is imported here. If a test fails
+    and failure_waves is given, the first failed test is rerun with waveforms (see
+    rerun_with_waves), so passing jobs never pay for tracing.
+
+    Parameters:
+    - job (dict): from regression_jobs.
+    - build_root (Path): folder holding every job's build directory.
+    - rebuild (bool): build even if the job's cached build matches.
+    - waves (bool or dict): waves for the main run (see sim_runner.run_testbench; default from the environment).
+    - seed (int): cocotb RANDOM_SEED (default: cocotb picks one).
+    - failure_waves (dict): window_ns and scopes for the rerun of a failed test (None = no rerun).
+
+    Returns:
+    - dict: the job plus build_dir, log, wall_time (s), tests (from read_results), seed, error (None if it ran)
+      and rerun (from rerun_with_waves, or None).
+    """
+    build_dir = build_root / job["name"]
+    build_dir.mkdir(parents=True, exist_ok=True)
+    results_xml = build_dir / "results.xml"
+    log_path = build_dir / "run.log"
+    if results_xml.exists():
+        results_xml.unlink()
+
+    result = {**job, "build_dir": str(build_dir), "log": str(log_path), "tests": [], "seed": seed, "rerun": None}
+    start = time.perf_counter()
+    result["error"] = call_runner(job, log_path, build_dir=build_dir, results_xml=results_xml, rebuild=rebuild,
+                                  waves=waves, seed=seed)
+    result["wall_time"] = time.perf_counter() - start
+
+    if results_xml.exists():
+        result["tests"] = read_results(results_xml)
+        result["seed"] = results_seed(results_xml)
+    elif result["error"] is None:
+        result["error"] = f"no results file ({results_xml})"
+
+    failed_tests = [test for test in result["tests"] if test["failure"]]
+    if failed_tests and failure_waves is not None and result["seed"] is not None:
+        result["rerun"] = rerun_with_waves(job, build_dir / "waves", failed_tests[0], result["seed"],
+                                           rebuild=rebuild, **failure_waves)
+    return result
+
+def job_failed(result):
+    """True if a job did not run or any of its tests failed"""
+    return result["error"] is not None or not result["tests"] or any(test["failure"] for test in result["tests"])
+
+def run_regression(jobs, workers=None, build_root=BUILD_ROOT, rebuild=False, waves=None, seed=None, failure_waves=None):
+    """
+    Runs jobs in a process pool, each in its own build directory.
+
+    The build directories are kept between runs, so a job only recompiles when its
+    HDL sources, parameters or flags changed (see sim_runner.build_key).
+
+    Parameters:
+    - jobs (list of dict): from regression_jobs.
+    - workers (int): number of worker processes (default: one per CPU).
+    - build_root (Path): folder holding every job's build directory.
+    - rebuild (bool): build every job even if its cached build matches.
+    - waves (bool or dict): waves for every job's main run (default from the environment).
+    - seed (int): cocotb RANDOM_SEED for every job.
+    - failure_waves (dict): window_ns and scopes to rerun failed tests with (None = no reruns).
+
+    Returns:
+    - list of dict: run_job results, in job order.
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, build_root, rebuild, waves, seed, failure_waves): job["name"] for job in jobs}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = "FAIL" if job_failed(result) else "PASS"
+            print(f"{status} {result['name']} ({result['wall_time']:.1f} s)", flush=True)
+    return [results[job["name"]] for job in jobs]
+
+def write_junit(results, path):
+    """
+    Writes the results of a regression as one JUnit XML file, one testsuite per job.
+
+    A job that did not produce a results file (e.g. its build failed) gets a single
+    testcase with an error holding the exception and the log path.
+
+    Parameters:
+    - results (list of dict): from run_regression.
+    - path (Path): file to write.
+    """
+    root = ET.Element("testsuites", name="regression")
+    total_tests = total_failures = total_errors = 0
+    total_time = 0.0
+    for result in results:
+        suite = ET.SubElement(root, "testsuite", name=result["name"], time=f"{result['wall_time']:.3f}")
+        settings = {**result["parameters"], **result["test_env"], "random_seed": result["seed"]}
+        if result["rerun"] and result["rerun"]["waves"]:
+            settings["waves"] = result["rerun"]["waves"]
+        for name, value in settings.items():
+            if value is None:
+                continue
+            properties = suite.find("properties")
+            if properties is None:
+                properties = ET.SubElement(suite, "properties")
+            ET.SubElement(properties, "property", name=name, value=str(value))
+        failures = errors = 0
+        for test in result["tests"]:
+            testcase = ET.SubElement(suite, "testcase", classname=result["name"], name=test["name"],
+                                     time=f"{test['time']:.3f}", sim_time_ns=f"{test['sim_time_ns']:.0f}")
+            if test["failure"]:
+                ET.SubElement(testcase, "failure", message=test["failure"])
+                failures += 1
+        if not result["tests"]:
+            testcase = ET.SubElement(suite, "testcase", classname=result["name"], name=result["runner"],
+                                     time=f"{result['wall_time']:.3f}")
+            ET.SubElement(testcase, "error", message=result["error"] or "no tests ran").text = f"log: {result['log']}"
+            errors += 1
+        suite.set("tests", str(max(len(result["tests"]), 1)))
+        suite.set("failures", str(failures))
+        suite.set("errors", str(errors))
+        total_tests += max(len(result["tests"]), 1)
+        total_failures += failures
+        total_errors += errors
+        total_time += result["wall_time"]
+    root.set("tests", str(total_tests))
+    root.set("failures", str(total_failures))
+    root.set("errors", str(total_errors))
+    root.set("time", f"{total_time:.3f}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+def print_summary(results, elapsed):
+    """Prints the wall-clock time of every job and test, then the failures"""
+    print(f"\n{'job / test':<56}{'wall (s)':>10}{'sim (us)':>12}")
+    for result in results:
+        print(f"{result['name']:<56}{result['wall_time']:>10.1f}")
+        for test in result["tests"]:
+            status = "FAIL" if test["failure"] else "ok"
+            print(f"  {test['name']:<48}{status:>6}{test['time']:>10.2f}{test['sim_time_ns'] / 1000:>12.1f}")
+
+    failed = [result for result in results if job_failed(result)]
+    cpu_time = sum(result["wall_time"] for result in results)
+    print(f"\n{len(results) - len(failed)}/{len(results)} jobs passed in {elapsed:.1f} s ({cpu_time:.1f} s of job time)")
+    for result in failed:
+        reason = result["error"] or ", ".join(test["name"] for test in result["tests"] if test["failure"]) or "no tests ran"
+        print(f"  {result['name']}: {reason} (log: {result['log']})")
+        if result["rerun"]:
+            waves = result["rerun"]["waves"] or f"none written, see {result['rerun']['log']}"
+            print(f"    waves before the failure (RANDOM_SEED={result['seed']}): {waves}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every cocotb testbench over its parameter matrix in parallel.")
+    parser.add_argument("filters", nargs="*", help="only run jobs whose name contains one of these")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--sim", choices=SIMULATORS, default=os.getenv("SIM", "icarus"), help="simulator (default SIM or icarus)")
+    parser.add_argument("--junit", type=Path, help="aggregated JUnit XML output (default regression_build/<sim>/results.xml)")
+    parser.add_argument("--defaults", action="store_true", help="run each testbench once with its default parameters")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild every job instead of reusing unchanged builds")
+    parser.add_argument("--seed", type=int, help="cocotb RANDOM_SEED for every job")
+    parser.add_argument("--waves", action="store_true", help="dump waves for every job (slow; by default only failures are rerun with waves)")
+    parser.add_argument("--no-rerun", action="store_true", help="do not rerun failed tests with waves")
+    parser.add_argument("--window-ns", type=float, default=WINDOW_NS, help="simulation time to dump before a failure, in ns")
+    parser.add_argument("--scope", action="append", default=[], help="signal or instance to dump on reruns (repeatable; default everything)")
+    parser.add_argument("--list", action="store_true", help="list the jobs and exit")
+    args = parser.parse_args()
+
+    jobs = regression_jobs(discover_testbenches(), args.filters, args.defaults)
+    if args.list:
+        for job in jobs:
+            print(f"{job['name']:<56}{job['module']}.{job['runner']}")
+        sys.exit(0)
+    if not jobs:
+        sys.exit("No jobs match " + " ".join(args.filters))
+
+    # The workers (and the runners in them) pick the simulator up from SIM
+    os.environ["SIM"] = args.sim
+    build_root = BUILD_ROOT / args.sim
+    junit = args.junit or build_root / "results.xml"
+    start = time.perf_counter()
+    failure_waves = None if args.no_rerun else {"window_ns": args.window_ns, "scopes": args.scope}
+    results = run_regression(jobs, args.jobs, build_root, rebuild=args.rebuild, waves=True if args.waves else None, seed=args.seed,
+                             failure_waves=failure_waves)
+    write_junit(results, junit)
+    print_summary(results, time.perf_counter() - start)
+    print(f"JUnit results: {junit}")
+    sys.exit(1 if any(job_failed(result) for result in results) else 0)
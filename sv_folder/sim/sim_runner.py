@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import cocotb
+from cocotb.runner import get_runner
+
+SIM_PATH = Path(__file__).resolve().parent
+HDL_PATH = SIM_PATH.parent / "hdl"
+DATA_PATH = SIM_PATH.parent / "data"
+# Simulators the runners, run_regression.py and bench_simulators.py offer (SIM selects one)
+SIMULATORS = ("icarus", "verilator")
+# Verilator's -Wall adds style lint (unused bits, unconnected BRAM ports, ...) the sources
+# were never written against; keep it visible in the build log without failing the build.
+# Elaboration $fatal (top_level's check of the generated LUT parameters) still fails it.
+BUILD_ARGS = {"icarus": ["-Wall"], "verilator": ["-Wall", "-Wno-fatal", "-Werror-USERFATAL"]}
+TIMESCALE = ('1ns', '1ps')
+BUILD_KEY_FILE = "build_key.txt"
+DUMP_MODULE = "waves_dump"
+
+def waves_from_env():
+    """
+    Reads the waveform settings of a run from the environment. Dumping is off unless WAVES=1.
+
+    WAVES_SCOPES narrows it to some signals or instances (comma separated, e.g.
+    "audio_out,valid_out"; names without the toplevel are taken relative to it),
+    WAVES_DEPTH limits how many levels below each scope get dumped (0 = all) and
+    WAVES_START_NS / WAVES_STOP_NS dump only that window of simulation time.
+
+    Returns:
+    - dict or None: scopes, depth, start_ns and stop_ns, or None if waves are off.
+    """
+    if os.getenv("WAVES", "0") != "1":
+        return None
+    stop_ns = os.getenv("WAVES_STOP_NS")
+    return {
+        "scopes": [scope.strip() for scope in os.getenv("WAVES_SCOPES", "").split(",") if scope.strip()],
+        "depth": int(os.getenv("WAVES_DEPTH", "0")),
+        "start_ns": float(os.getenv("WAVES_START_NS", "0")),
+        "stop_ns": None if stop_ns is None else float(stop_ns),
+    }
+
+def write_dump_module(path, hdl_toplevel, dump_file, scopes=(), depth=0, start_ns=0, stop_ns=None):
+    """
+    Writes a Verilog module that dumps a window of a subset of the toplevel's signals.
+
+    It is compiled in next to the toplevel (iverilog -s waves_dump) instead of the module
+    cocotb adds for waves=True, which dumps every signal for the whole run.
+
+    Parameters:
+    - path (Path): .v file to write.
+    - hdl_toplevel (str): module being simulated.
+    - dump_file (Path): waveform file the simulation writes.
+    - scopes (list of str): signals or instances to dump (the whole toplevel if empty).
+    - depth (int): levels below each scope to dump (0 = all).
+    - start_ns (float): simulation time dumping starts at, in ns.
+    - stop_ns (float): simulation time dumping stops at, in ns (None = the end of the run).
+    """
+    if stop_ns is not None and stop_ns <= start_ns:
+        raise ValueError(f"Waves window ends ({stop_ns} ns) before it starts ({start_ns} ns)")
+    scopes = [scope if scope.split(".")[0] == hdl_toplevel else f"{hdl_toplevel}.{scope}" for scope in scopes]
+    lines = ["`timescale 1ns / 1ps", f"module {DUMP_MODULE}();", "initial begin",
+             f'    $dumpfile("{Path(dump_file).as_posix()}");']
+    if start_ns > 0:
+        lines.append(f"    #{start_ns:.3f};")
+    lines += [f"    $dumpvars({depth}, {scope});" for scope in scopes or [hdl_toplevel]]
+    if stop_ns is not None:
+        lines.append(f"    #{stop_ns - start_ns:.3f} $dumpoff;")
+    lines += ["end", "endmodule", ""]
+    Path(path).write_text("\n".join(lines))
+
+def build_key(simulator, hdl_toplevel, sources, parameters, build_args, waves):
+    """
+    Hashes everything a simulator build depends on: the HDL sources' contents, parameters and flags.
+
+    The test modules are not part of it, so changing only Python never triggers a rebuild.
+
+    Parameters:
+    - simulator (str): simulator name (the SIM environment variable).
+    - hdl_toplevel (str): module to simulate.
+    - sources (list of Path): HDL sources.
+    - parameters (dict): HDL parameters.
+    - build_args (list of str): simulator build flags.
+    - waves (bool): whether the build records signal traces.
+
+    Returns:
+    - str: hex digest identifying the build.
+    """
+    settings = {
+        "simulator": simulator,
+        "cocotb": cocotb.__version__,
+        "hdl_toplevel": hdl_toplevel,
+        "parameters": {str(name): str(value) for name, value in parameters.items()},
+        "build_args": [str(arg) for arg in build_args],
+        "timescale": TIMESCALE,
+        "waves": bool(waves),
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    # The headers in sv_folder/data are compiled in wherever they are included
+    for source in list(sources) + sorted(DATA_PATH.glob("*.svh")):
+        source = Path(source)
+        digest.update(source.name.encode())
+        digest.update(hashlib.sha256(source.read_bytes()).digest())
+    return digest.hexdigest()
+
+def hdl_parameter(dut, name):
+    """
+    Reads a parameter of the simulated toplevel inside a cocotb test.
+
+    Icarus exposes parameters as handles; Verilator leaves them out of VPI, so it falls
+    back to the value run_testbench built the toplevel with.
+
+    Parameters:
+    - dut: cocotb toplevel handle.
+    - name (str): parameter name.
+
+    Returns:
+    - int: the parameter's value.
+    """
+    try:
+        return int(getattr(dut, name).value)
+    except AttributeError:
+        parameters = json.loads(os.getenv("HDL_PARAMETERS", "{}"))
+        if name not in parameters:
+            raise
+        return int(parameters[name])
+
+def run_testbench(hdl_toplevel, test_module, sources, parameters=None, build_dir=None, results_xml=None,
+                  test_env=None, build_args=None, rebuild=False, waves=None, testcase=None, seed=None):
+    """
+    Build an HDL toplevel and run a cocotb test module against it, the way every *_runner in this folder does.
+
+    The simulator comes from SIM (icarus by default, or verilator).
+
+    The build is skipped when build_dir already holds one with the same build_key
+    (same source contents, parameters and flags), so rerunning after a test-only
+    change goes straight to simulation. Set SIM_REBUILD=1 or pass rebuild to force it.
+
+    The memory files in sv_folder/data are copied next to the simulation, so modules
+    find them by name with $readmemh as they do in the Vivado project (build.tcl), and
+    the folder is on the include path for the headers generate_lut.py writes there.
+
+    Nothing is traced unless waves are asked for (WAVES=1, see waves_from_env). With
+    Icarus the dump can be limited to a time window and a subset of signals; other
+    simulators dump everything.
+
+    Parameters:
+    - hdl_toplevel (str): Module to simulate.
+    - test_module (str): cocotb test module (a test_*.py file in this folder, without .py).
+    - sources (list of Path): HDL sources.
+    - parameters (dict): HDL parameter overrides.
+    - build_dir (str or Path): Where to build and run (default sim_build/<simulator>/<hdl_toplevel>; run_regression.py gives every job its own).
+    - results_xml (str or Path): JUnit results file (default results.xml in build_dir).
+    - test_env (dict): Extra environment variables for the test module (test knobs that are not HDL parameters).
+    - build_args (list of str): Simulator build flags (default BUILD_ARGS for the simulator).
+    - rebuild (bool): Build even if the cached build matches.
+    - waves (bool or dict): Dump waveforms: False, True (everything) or waves_from_env style settings (default: from the environment).
+    - testcase (str): Run only this test of the module.
+    - seed (int): cocotb RANDOM_SEED (cocotb reseeds every test from it, so a failing test reruns identically).
+
+    Returns:
+    - Path: The results file (failing tests are recorded there; a failed build or simulator crash raises SystemExit).
+    """
+    # The simulator's Python gets this process's sys.path, so the tests can import the models
+    for path in (SIM_PATH, SIM_PATH / "model"):
+        if str(path) not in sys.path:
+            sys.path.append(str(path))
+
+    simulator = os.getenv("SIM", "icarus")
+    parameters = parameters or {}
+    build_args = BUILD_ARGS.get(simulator, []) if build_args is None else build_args
+    build_dir = Path("sim_build", simulator, hdl_toplevel) if build_dir is None else Path(build_dir)
+    waves = waves_from_env() if waves is None else ({} if waves is True else waves or None)
+    sim_waves = False
+    plusargs = []
+    if waves is not None and simulator == "icarus":
+        # Our own dump module, so the window and scopes apply (cocotb's dumps everything)
+        build_dir.mkdir(parents=True, exist_ok=True)
+        dump_module = build_dir / f"{DUMP_MODULE}.v"
+        write_dump_module(dump_module, hdl_toplevel, build_dir.resolve() / f"{hdl_toplevel}.fst", **waves)
+        sources = list(sources) + [dump_module]
+        build_args = list(build_args) + ["-s", DUMP_MODULE]
+        plusargs = ["-fst"]
+    elif waves is not None:
+        sim_waves = True
+    key = build_key(simulator, hdl_toplevel, sources, parameters, build_args, sim_waves)
+    key_file = build_dir / BUILD_KEY_FILE
+    rebuild = rebuild or os.getenv("SIM_REBUILD", "0") == "1"
+
+    runner = get_runner(simulator)
+    if not rebuild and key_file.exists() and key_file.read_text().strip() == key:
+        print(f"INFO: Reusing the {hdl_toplevel} build in {build_dir} ({key[:12]})")
+    else:
+        # Drop the key first so an interrupted build is never mistaken for a good one
+        key_file.unlink(missing_ok=True)
+        runner.build(
+            sources=sources,
+            hdl_toplevel=hdl_toplevel,
+            always=True,
+            build_args=build_args,
+            parameters=parameters,
+            build_dir=build_dir,
+            includes=[DATA_PATH],
+            timescale=TIMESCALE,
+            waves=sim_waves
+        )
+        key_file.write_text(key + "\n")
+    # Read when the simulation starts, so a regenerated table needs no rebuild
+    for mem_file in DATA_PATH.glob("*.mem"):
+        shutil.copy(mem_file, build_dir / mem_file.name)
+    # A reused build skips runner.build, which is where the runner otherwise learns the language
+    return runner.test(
+        hdl_toplevel=hdl_toplevel,
+        hdl_toplevel_lang="verilog",
+        test_module=test_module,
+        test_args=[],
+        build_dir=build_dir,
+        results_xml=None if results_xml is None else str(results_xml),
+        extra_env={"HDL_PARAMETERS": json.dumps(parameters), **{name: str(value) for name, value in (test_env or {}).items()}},
+        waves=sim_waves,
+        testcase=testcase,
+        seed=seed,
+        plusargs=plusargs
+    )
@@ -1,4 +1,5 @@
 import cocotb
+import numpy as np
 import os
 import sys
 from math import log
@@ -11,127 +12,38 @@ import os
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, hdl_parameter, run_testbench
 
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from datapath_model import LUT_PATH, angle_delay_lut
+from generate_lut import module_parameters
 
-# Define the expected speed of sound
-SPEED_OF_SOUND = 343.0  # meters/second
-FREQUENCY = 1_000_000
-DISTANCE = 1
-
-def compute_expected_delay(angle, distance, frequency):
-    """Compute the expected delay value based on the given distance between mics (m), speed of sound (m/s), and frequency (Hz)."""
-
-    assert(angle >= 0 and angle <= 180), "invalid angle"
-
-    delay_value_mic1 = int(0 * math.cos(angle * math.pi / 180) * distance / SPEED_OF_SOUND * frequency)
-    delay_value_mic2 = int(1 * math.cos(angle * math.pi / 180) * distance / SPEED_OF_SOUND * frequency)
-    delay_value_mic3 = int(2 * math.cos(angle * math.pi / 180) * distance / SPEED_OF_SOUND * frequency)
-    delay_value_mic4 = int(3 * math.cos(angle * math.pi / 180) * distance / SPEED_OF_SOUND * frequency)
-
-    # must shift to account for nagative values in angles over 90 degrees
-    if (angle > 90):
-        return [-(delay_value_mic4), -(delay_value_mic3), -(delay_value_mic2), -(delay_value_mic1)]
-    
-    else:
-        return [delay_value_mic1, delay_value_mic2, delay_value_mic3, delay_value_mic4]
-
-def signed_binary_to_integer(bin_val):
-    """Compute the signed integer representation from the signed 32-bit binary format."""
-
-    # Convert the binary outputs to signed integers (assuming the output is 32-bit signed)
-    computed_int = int(bin_val, 2)
-
-    # Adjust for two's complement signed interpretation for 32-bit values
-    max_val = 2**31  # for 32-bit signed integer
-    if computed_int >= max_val:
-        computed_int -= 2**32
-
-    return computed_int
-    
 @cocotb.test()
 async def test_angle_delay_lut(dut):
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    
-    # Reset the DUT
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in, 3) # wait three clock cycles
-    dut.rst_in.value = 0
-    await ClockCycles(dut.clk_in, 3) # wait three clock cycles
-    
-    # Define test cases: (angle, distance)
-    test_cases = [
-        random.randint(0, 180),
-        random.randint(0, 180),
-        random.randint(0, 180)
-    ]
-    
-    # Apply test cases
-    for angle in test_cases:
-        
-        dut.angle = angle
-        print(f"\noutput for angle: {angle}")
-        
-        await ClockCycles(dut.clk_in, 3)
-        
-        # Convert the binary outputs to signed integers (assuming the output is 32-bit signed)
-        computed_value_mic1 = signed_binary_to_integer(dut.delay_1.value.binstr)
-        computed_value_mic2 = signed_binary_to_integer(dut.delay_2.value.binstr)
-        computed_value_mic3 = signed_binary_to_integer(dut.delay_3.value.binstr)
-        computed_value_mic4 = signed_binary_to_integer(dut.delay_4.value.binstr)
-        print(f"\ncomputed mic 1: {computed_value_mic1}, mic 2: {computed_value_mic2}, mic 3: {computed_value_mic3}, mic 4: {computed_value_mic4}")
-
-        expected_value_mic1, expected_value_mic2, expected_value_mic3, expected_value_mic4 = compute_expected_delay(angle, DISTANCE, FREQUENCY)
-        print(f"\nexpected mic 1: {expected_value_mic1}, mic 2: {expected_value_mic2}, mic 3: {expected_value_mic3}, mic 4: {expected_value_mic4}")
-        
-        # Compare the computed value with the expected value
-        if not math.isclose(computed_value_mic1, expected_value_mic1, abs_tol=1e3):
-            raise AssertionError(f"Test failed for angle={angle}: "
-                                f"Expected {expected_value_mic1}, got {computed_value_mic1}")
-        
-        if not math.isclose(computed_value_mic2, expected_value_mic2, abs_tol=1e3):
-            raise AssertionError(f"Test failed for angle={angle}: "
-                                f"Expected {expected_value_mic2}, got {computed_value_mic2}")
-        
-        if not math.isclose(computed_value_mic3, expected_value_mic3, abs_tol=1e3):
-            raise AssertionError(f"Test failed for angle={angle}: "
-                                f"Expected {expected_value_mic3}, got {computed_value_mic3}")
-        
-        if not math.isclose(computed_value_mic4, expected_value_mic4, abs_tol=1e3):
-            raise AssertionError(f"Test failed for angle={angle}: "
-                                f"Expected {expected_value_mic4}, got {computed_value_mic4}")
-        
-        await ClockCycles(dut.clk_in, 1) # wait a clock cycle
-
-
-def angle_delay_lut_runner():
-    """Simulate the tdm receiver using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "angle_delay_lut.sv"]
-    build_test_args = ["-Wall"]
-    # parameters = {'BIT_WIDTH': 24, 'SLOTS':4} #!!!change these to do different versions
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="angle_delay_lut",
-        always=True,
-        build_args=build_test_args,
-        # parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="angle_delay_lut",
-        test_module="test_angle_delay_lut",
-        test_args=run_test_args,
-        waves=True
-    )
-
+    # The LUT is combinational, so every angle_in value can be checked against the model
+    num_mics = hdl_parameter(dut, "NUM_MICS")
+    delay_bits = hdl_parameter(dut, "DELAY_BITS")
+    angle_bits = hdl_parameter(dut, "ANGLE_BITS")
+    num_angles = hdl_parameter(dut, "NUM_ANGLES")
+    angles = list(range(num_angles)) + [random.randint(num_angles, (1 << angle_bits) - 1) for _ in range(3)]
+    expected_delays = angle_delay_lut(np.array(angles))
+
+    for angle, expected in zip(angles, expected_delays):
+        dut.angle_in.value = angle
+        await Timer(1, units="ns")
+
+        delays_out = int(dut.delays_out.value)
+        computed = [(delays_out >> (mic * delay_bits)) & ((1 << delay_bits) - 1) for mic in range(num_mics)]
+        assert computed == list(expected), f"Test failed for angle={angle}: expected {list(expected)}, got {computed}"
+
+
+def angle_delay_lut_runner(parameters=None, **options):
+    """Simulate the angle to delay LUT using the Python runner."""
+    sources = [HDL_PATH / "angle_delay_lut.sv"]
+    # Sized for the table in sv_folder/data
+    with np.load(LUT_PATH) as lut:
+        parameters = {**module_parameters(lut), **(parameters or {})}
+    return run_testbench("angle_delay_lut", "test_angle_delay_lut", sources, parameters, **options)
 
 if __name__ == "__main__":
     angle_delay_lut_runner()
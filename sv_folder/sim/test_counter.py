@@ -4,25 +4,18 @@ import random
 import sys
 import logging
 from pathlib import Path
+from cocotb.clock import Clock
 from cocotb.triggers import Timer
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, run_testbench
 
-# Helper function to generate clock signal in background
-async def generate_clock(clock_wire):
-	while True: # repeat forever
-		clock_wire.value = 0
-		await Timer(5,units="ns")
-		clock_wire.value = 1
-		await Timer(5,units="ns") 
- 
 @cocotb.test()
 async def first_test(dut):
     """ First cocotb test?"""
     # write your test here!
 	  # throughout your test, use "assert" statements to test for correct behavior
 	  # replace the assertion below with useful statements
-    await cocotb.start( generate_clock( dut.clk_in ) )
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start(start_high=False))
 
     """First cocotb test?"""
     dut.rst_in.value = 1
@@ -49,7 +42,7 @@ async def first_test(dut):
 
 @cocotb.test()
 async def test_counter_as_clk(dut):
-    await cocotb.start( generate_clock( dut.clk_in ) )
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start(start_high=False))
 
     """First cocotb test?"""
     dut.rst_in.value = 1
@@ -64,33 +57,11 @@ async def test_counter_as_clk(dut):
 """the code below should largely remain unchanged in structure, though the specific files and things
 specified should get updated for different simulations.
 """
-def counter_runner():
+def counter_runner(parameters=None, **options):
     """Simulate the counter using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "counter.sv"] #grow/modify this as needed.
-    build_test_args = ["-Wall"]#,"COCOTB_RESOLVE_X=ZEROS"]
-    parameters = {}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="counter",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="counter",
-        test_module="test_counter",
-        test_args=run_test_args,
-        waves=True
-    )
- 
+    sources = [HDL_PATH / "counter.sv"]
+    parameters = parameters or {}
+    return run_testbench("counter", "test_counter", sources, parameters, **options)
+
 if __name__ == "__main__":
     counter_runner()
\ No newline at end of file
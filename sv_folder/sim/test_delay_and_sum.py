@@ -16,12 +16,16 @@ import os
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, hdl_parameter, run_testbench
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from datapath_model import delay_bram
 
 NUM_MICS = 2
 
 @cocotb.test()
 async def test_delay_and_sum(dut):
+    num_mics = hdl_parameter(dut, "NUM_MICS")
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
     
     # Reset the DUT
@@ -33,18 +37,20 @@ async def test_delay_and_sum(dut):
     # Parameters
     num_samples = 100  # Number of samples to test per microphone
     max_delay = 25    # Maximum delay in microseconds
-    over_90 = random.randint(0, 1)
+    # DELAY_STEP (from run_regression.py) fixes the delay step; negative reverses the delays like angles over 90 degrees
+    delay_step = int(os.getenv("DELAY_STEP", random.choice([-1, 1]) * random.randint(0, max_delay)))
+    over_90 = int(delay_step < 0)
 
     # Test input signal setup (simulating audio values for 4 microphones)
     mic_signals = []
-    for i in range(NUM_MICS):
+    for i in range(num_mics):
         mic_signals.append([random.randint(0, 0xFFFF) for _ in range(num_samples)])
-    for j in range(NUM_MICS, 5):
+    for j in range(num_mics, 4):
         mic_signals.append([0 for _ in range(num_samples)])
     print(f"\nmic signals: {mic_signals}")
     
     # Randomly generate delays for each microphone (between 0 and max_delay)
-    starting_delay = random.randint(0, max_delay)
+    starting_delay = abs(delay_step)
     delays = [starting_delay * _ for _ in range(4)]
     if over_90 == 1: # reverse delays if over 90 degree input angle
         delays.reverse()
@@ -54,6 +60,13 @@ async def test_delay_and_sum(dut):
     dut.delay_2.value = delays[1]
     dut.delay_3.value = delays[2]
     dut.delay_4.value = delays[3]
+    # delay_bram restarts its valid logic on the cycle the delays change, dropping a valid_in
+    # sent then; the model's run starts after the change
+    await ClockCycles(dut.clk_in, 1)
+
+    # The golden model gives audio_out and valid_out for every sample, including
+    # the partial sums output while the BRAMs are still filling
+    expected_outputs, expected_valid = delay_bram(np.array(mic_signals), delays, num_mics)
     
     # Apply test cases with random values
     for i in range(num_samples):
@@ -72,73 +85,35 @@ async def test_delay_and_sum(dut):
         # Wait for values to propagate
         await ClockCycles(dut.clk_in,5)
 
-        # Compute the expected output:
-        # The output should be the sum of the audio signals from all 4 microphones, 
-        # delayed accordingly.
-        if (delays[0] == 0 and delays[1] == 0 and delays[2] == 0 and delays[3] == 0):
-            expected_output = sum(mic_signals[j][i] for j in range(4))/NUM_MICS
-        elif (delays[0] == 0):
-            if (i >= (delays[3])):
-                expected_output = sum(mic_signals[j][i-delays[j]] for j in range(4))/NUM_MICS
-            elif (i >= (delays[2])):
-                expected_output = sum(mic_signals[j][i-delays[j]] for j in range(3))/NUM_MICS
-            elif (i >= (delays[1])):
-                expected_output = sum(mic_signals[j][i-delays[j]] for j in range(2))/NUM_MICS
-            else:
-                expected_output = mic_signals[0][i]/NUM_MICS
-        else:
-            if (i >= (delays[0])):
-                expected_output = sum(mic_signals[j][i-delays[j]] for j in range(3, -1, -1))/NUM_MICS
-            elif (i >= (delays[1])):
-                expected_output = sum(mic_signals[j][i-delays[j]] for j in range(3, 0, -1))/NUM_MICS
-            elif (i >= (delays[2])):
-                expected_output = sum(mic_signals[j][i-delays[j]] for j in range(3, 1, -1))/NUM_MICS
-            else:
-                expected_output = mic_signals[3][i]/NUM_MICS
+        expected_output = expected_outputs[i]
 
         # Assert that the computed output matches the expected result
-        computed_output = int(dut.audio_out.value)
+        computed_output = dut.audio_out.value.signed_integer
         print(f"\nCycle {i}: Computed Audio Output = {computed_output}, Expected = {expected_output}")
 
         # Validate that the output matches the expected summation of input signals
-        assert math.isclose(computed_output, expected_output, abs_tol=1e2), (
+        assert computed_output == expected_output, (
             f"Test failed at cycle {i}: expected {expected_output}, got {computed_output}"
         )
 
-        # Ensure valid out is only high for a single cycle
-        assert dut.valid_out.value == 1, "1-cycle valid out high value"
+        # Ensure valid out is only high for a single cycle, once every mic's delay has filled
+        assert dut.valid_out.value == int(expected_valid[i]), f"valid out should be {int(expected_valid[i])} at cycle {i}"
+        # Independently of the model: once the longest delay in use has filled, every sample is valid
+        if i >= max(delays[:num_mics]):
+            assert dut.valid_out.value == 1, "1-cycle valid out high value"
         await ClockCycles(dut.clk_in,1)
         assert dut.valid_out.value == 0, "Valid out value should go back low"
 
 
-def delay_and_sum_runner():
-    """Simulate the tdm receiver using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "delay_bram.sv", proj_path / "hdl" / "evt_counter.sv", proj_path / "hdl" / "xilinx_true_dual_port_read_first_2_clock_ram.v"]
-    build_test_args = ["-Wall"]
-    parameters = {'NUM_MICS': NUM_MICS} 
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="delay_bram",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="delay_bram",
-        test_module="test_delay_and_sum",
-        test_args=run_test_args,
-        waves=True
-    )
+# Parameter sets run_regression.py runs this testbench with
+PARAMETER_MATRIX = {'NUM_MICS': [1, 2, 3, 4]}
+TEST_ENV_MATRIX = {'DELAY_STEP': [0, 3, 25, -3]}
 
+def delay_and_sum_runner(parameters=None, **options):
+    """Simulate delay_bram using the Python runner."""
+    sources = [HDL_PATH / "delay_bram.sv", HDL_PATH / "evt_counter.sv", HDL_PATH / "xilinx_true_dual_port_read_first_2_clock_ram.v"]
+    parameters = {'NUM_MICS': NUM_MICS, **(parameters or {})}
+    return run_testbench("delay_bram", "test_delay_and_sum", sources, parameters, **options)
 
 if __name__ == "__main__":
     delay_and_sum_runner()
\ No newline at end of file
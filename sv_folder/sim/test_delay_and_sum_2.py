@@ -16,21 +16,26 @@ import os
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, hdl_parameter, run_testbench
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from datapath_model import delay_bram
 
 NUM_MICS = 4
 
-def create_expected_beamformer(num_mics, num_bits, num_samples, delay_per_mic):
-    audio_samples= [[random.randint(-(2**(num_bits - 1)), 2**(num_bits-1)-1) for _ in range(num_samples)] for _ in range(num_mics)]
-    
+def mic_delays(num_mics, delay_per_mic):
+    """Delays of the four mics for a steering delay; a negative delay_per_mic reverses them like angles over 90 degrees."""
     if delay_per_mic < 0:
-        audio_shifted = [([0] * ((num_mics-1-idx) * abs(delay_per_mic)) + audio.copy()) for idx, audio in enumerate(audio_samples)]
-    else:
-        audio_shifted = [([0] * (idx * delay_per_mic) + audio.copy()) for idx, audio in enumerate(audio_samples)]
-    summed_output = [sum(x) for x in zip(*audio_shifted)]
-    expected_output = [(summed_audio >> int(log(num_mics, 2))) for summed_audio in summed_output]
+        return [max(num_mics - 1 - idx, 0) * abs(delay_per_mic) for idx in range(4)]
+    return [idx * delay_per_mic for idx in range(4)]
+
+def create_expected_beamformer(num_mics, num_bits, num_samples, delay_per_mic):
+    audio_samples = np.array([[random.randint(-(2**(num_bits - 1)), 2**(num_bits-1)-1) for _ in range(num_samples)] for _ in range(num_mics)])
 
-    return audio_samples, audio_shifted, summed_output, expected_output
+    # The golden model gives each BRAM's output, the sum and the shifted output for every sample
+    expected_output, expected_valid, stages = delay_bram(audio_samples, mic_delays(num_mics, delay_per_mic), num_mics, return_stages=True)
+
+    return audio_samples, stages['delayed'], stages['summed'], expected_output, expected_valid
 
 
 async def setup_test(dut, num_mics, delay_per_mic):
@@ -39,10 +44,7 @@ async def setup_test(dut, num_mics, delay_per_mic):
     # Setup initial inputs
     dut.rst_in.value = 0
     dut.valid_in.value = 0
-    dut.delay_1.value = (num_mics - 1) * abs(delay_per_mic) if delay_per_mic < 0 else 0
-    dut.delay_2.value = (num_mics - 2) * abs(delay_per_mic) if delay_per_mic < 0 else delay_per_mic
-    dut.delay_3.value = (num_mics - 3) * abs(delay_per_mic) if delay_per_mic < 0 else delay_per_mic * 2
-    dut.delay_4.value = (num_mics - 4) * abs(delay_per_mic) if delay_per_mic < 0 else delay_per_mic * 3
+    dut.delay_1.value, dut.delay_2.value, dut.delay_3.value, dut.delay_4.value = mic_delays(num_mics, delay_per_mic)
     dut.audio_in_1.value = 0
     dut.audio_in_2.value = 0
     dut.audio_in_3.value = 0
@@ -57,15 +59,15 @@ async def setup_test(dut, num_mics, delay_per_mic):
 
 
 async def delay_and_sum_test_builder(dut, num_mics, num_bits, num_samples, delay_per_mic):
-    audio_samples, audio_shifted, summed_output, expected_output = create_expected_beamformer(num_mics, num_bits, num_samples, delay_per_mic)
+    audio_samples, audio_shifted, summed_output, expected_output, expected_valid = create_expected_beamformer(num_mics, num_bits, num_samples, delay_per_mic)
 
     # Apply test cases with random values
     for i in range(len(expected_output)):
         # Set random audio signals for each microphone
-        dut.audio_in_1.value = audio_samples[0][i]
-        dut.audio_in_2.value = audio_samples[1][i] if len(audio_samples) >= 2 else 0
-        dut.audio_in_3.value = audio_samples[2][i] if len(audio_samples) >= 3 else 0
-        dut.audio_in_4.value = audio_samples[3][i] if len(audio_samples) >= 4 else 0
+        dut.audio_in_1.value = int(audio_samples[0][i])
+        dut.audio_in_2.value = int(audio_samples[1][i]) if len(audio_samples) >= 2 else 0
+        dut.audio_in_3.value = int(audio_samples[2][i]) if len(audio_samples) >= 3 else 0
+        dut.audio_in_4.value = int(audio_samples[3][i]) if len(audio_samples) >= 4 else 0
         # Enable valid input
         dut.valid_in.value = 1
         
@@ -74,26 +76,23 @@ async def delay_and_sum_test_builder(dut, num_mics, num_bits, num_samples, delay
         await ClockCycles(dut.clk_in, 1)
         dut.valid_in.value = 0
         await ClockCycles(dut.clk_in, 3, rising=False)
-        assert dut.audio_out_mic1.value == audio_shifted[0][i] & 0x00FFFFFF 
+        assert int(dut.audio_out_mic1.value) == int(audio_shifted[0][i]) & 0x00FFFFFF
         if i >= abs(delay_per_mic):
-            assert dut.audio_out_mic2.value == audio_shifted[1][i] & 0x00FFFFFF 
+            assert int(dut.audio_out_mic2.value) == int(audio_shifted[1][i]) & 0x00FFFFFF
         if i >= 2*abs(delay_per_mic):
-            assert dut.audio_out_mic3.value == (audio_shifted[2][i] & 0x00FFFFFF if len(audio_samples) >= 3 else 0)
+            assert int(dut.audio_out_mic3.value) == (int(audio_shifted[2][i]) & 0x00FFFFFF if len(audio_samples) >= 3 else 0)
         if i >= 3*abs(delay_per_mic):
-            assert dut.audio_out_mic4.value == (audio_shifted[3][i] & 0x00FFFFFF if len(audio_samples) >= 4 else 0)
+            assert int(dut.audio_out_mic4.value) == (int(audio_shifted[3][i]) & 0x00FFFFFF if len(audio_samples) >= 4 else 0)
         # Following cycle summed_audio should be correct
         await ClockCycles(dut.clk_in, 1, rising=False)
         if i >= 3*abs(delay_per_mic):
-            assert dut.summed_audio.value == summed_output[i] & 0x03FFFFFF # (25 bits)
+            assert int(dut.summed_audio.value) == int(summed_output[i]) & 0x03FFFFFF # (25 bits)
         # Check that the output matches expected value
         await ClockCycles(dut.clk_in, 1, rising=False)
-        if i >= 3*abs(delay_per_mic):
-            assert dut.audio_out.value == expected_output[i] & 0x00FFFFFF
+        if expected_valid[i]:
+            assert int(dut.audio_out.value) == int(expected_output[i]) & 0x00FFFFFF
         # Check that the valid_out goes high after all signals have delayed
-        if i >= (num_mics-1)*abs(delay_per_mic):
-            assert dut.valid_out.value == 1
-        else:
-            assert dut.valid_out.value == 0
+        assert dut.valid_out.value == int(expected_valid[i])
 
         await ClockCycles(dut.clk_in, 1, rising=False)
         assert dut.valid_out.value == 0
@@ -101,69 +100,51 @@ async def delay_and_sum_test_builder(dut, num_mics, num_bits, num_samples, delay
 
 @cocotb.test
 async def dss_small_test(dut):
-    await setup_test(dut, NUM_MICS, 2)
-    await delay_and_sum_test_builder(dut, NUM_MICS, 8, 50, 2)
+    num_mics = hdl_parameter(dut, "NUM_MICS")
+    await setup_test(dut, num_mics, 2)
+    await delay_and_sum_test_builder(dut, num_mics, 8, 50, 2)
 
 @cocotb.test
 async def dss_test_delay_changes(dut):
+    num_mics = hdl_parameter(dut, "NUM_MICS")
     delay_per_mic = 2
 
-    await setup_test(dut, NUM_MICS, delay_per_mic)
-    await delay_and_sum_test_builder(dut, NUM_MICS, 8, 25, delay_per_mic)
+    await setup_test(dut, num_mics, delay_per_mic)
+    await delay_and_sum_test_builder(dut, num_mics, 8, 25, delay_per_mic)
 
     delay_per_mic = 4
 
-    dut.delay_1.value = (NUM_MICS - 1) * abs(delay_per_mic) if delay_per_mic < 0 else 0
-    dut.delay_2.value = (NUM_MICS - 2) * abs(delay_per_mic) if delay_per_mic < 0 else delay_per_mic
-    dut.delay_3.value = (NUM_MICS - 3) * abs(delay_per_mic) if delay_per_mic < 0 else delay_per_mic * 2
-    dut.delay_4.value = (NUM_MICS - 4) * abs(delay_per_mic) if delay_per_mic < 0 else delay_per_mic * 3
+    dut.delay_1.value, dut.delay_2.value, dut.delay_3.value, dut.delay_4.value = mic_delays(num_mics, delay_per_mic)
 
-    await delay_and_sum_test_builder(dut, NUM_MICS, 8, 25, delay_per_mic)
+    await delay_and_sum_test_builder(dut, num_mics, 8, 25, delay_per_mic)
 
 @cocotb.test
 async def dss_small_test_2(dut):
-    await setup_test(dut, NUM_MICS, 4)
-    await delay_and_sum_test_builder(dut, NUM_MICS, 8, 50, 4)
+    num_mics = hdl_parameter(dut, "NUM_MICS")
+    await setup_test(dut, num_mics, 4)
+    await delay_and_sum_test_builder(dut, num_mics, 8, 50, 4)
 
 @cocotb.test
 async def dss_small_test_neg_delay(dut):
-    await setup_test(dut, NUM_MICS, -2)
-    await delay_and_sum_test_builder(dut, NUM_MICS, 8, 50, -2)
+    num_mics = hdl_parameter(dut, "NUM_MICS")
+    await setup_test(dut, num_mics, -2)
+    await delay_and_sum_test_builder(dut, num_mics, 8, 50, -2)
 
 @cocotb.test
 async def dss_real_test(dut):
-    await setup_test(dut, NUM_MICS, 6)
-    await delay_and_sum_test_builder(dut, NUM_MICS, 24, 200, 6)
-
-
-def delay_and_sum_runner():
-    """Simulate the tdm receiver using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "delay_bram.sv", proj_path / "hdl" / "evt_counter.sv", proj_path / "hdl" / "xilinx_true_dual_port_read_first_2_clock_ram.v"]
-    build_test_args = ["-Wall"]
-    parameters = {'NUM_MICS': NUM_MICS} 
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="delay_bram",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="delay_bram",
-        test_module="test_delay_and_sum_2",
-        test_args=run_test_args,
-        waves=True
-    )
+    num_mics = hdl_parameter(dut, "NUM_MICS")
+    await setup_test(dut, num_mics, 6)
+    await delay_and_sum_test_builder(dut, num_mics, 24, 200, 6)
+
+
+# Parameter sets run_regression.py runs this testbench with
+PARAMETER_MATRIX = {'NUM_MICS': [2, 3, 4]}
 
+def delay_and_sum_runner(parameters=None, **options):
+    """Simulate delay_bram using the Python runner."""
+    sources = [HDL_PATH / "delay_bram.sv", HDL_PATH / "evt_counter.sv", HDL_PATH / "xilinx_true_dual_port_read_first_2_clock_ram.v"]
+    parameters = {'NUM_MICS': NUM_MICS, **(parameters or {})}
+    return run_testbench("delay_bram", "test_delay_and_sum_2", sources, parameters, **options)
 
 if __name__ == "__main__":
     delay_and_sum_runner()
\ No newline at end of file
@@ -8,13 +8,16 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, run_testbench
 import numpy as np
 
 import matplotlib.pyplot as plt
 import scipy
 import scipy.signal as signal
 
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from pdm_model import pdm_modulate
+
 # Global Constants
 SAMPLE_RATE = 39062.5  # Audio sample rate in Hz
 OVERSAMPLE_FACTOR = 128
@@ -23,21 +26,6 @@ DURATION = 0.002  # Test duration in seconds
 AMPLITUDE = (2**23) - 1  # Max amplitude for 24-bit signed audio
 FREQUENCY = 1000  # 1 kHz sine wave
 
-@cocotb.coroutine
-async def clock_divider(clock, divider, trigger_signal):
-    """
-    Clock divider coroutine.
-    """
-    count = 0
-    while True:
-        await RisingEdge(clock)  # Wait for a rising edge of the input clock
-        if count == divider-1:
-            count = 0
-            trigger_signal.value = 1 if trigger_signal.value == 0 else 0  # Toggle the tri
-        else:
-            #trigger_signal.value =  0
-            count+=1
-
 # Helper function to generate a sine wave
 def generate_sine_wave(amplitude, frequency, sample_rate, duration, plot = False):
     """Generate a sine wave with specified parameters."""
@@ -67,9 +55,6 @@ def plot_results(pdm_output, sine_wave, time_axis, duration = DURATION, amplitud
     duration - duration of sine wave
     amplitude - max amplitude of sine wave
     """
-    new_pdm = []
-    for i in pdm_output:
-        new_pdm.extend([i]*128*20)
     # basically like applying a low pass filter, this will give us a better visual rep for what it will sound like
     window_size = 128  # A larger window size for better smoothing
     filtered_pdm_output = np.convolve(pdm_output, np.ones(window_size)/window_size, mode='same') -.5 # go down .5 so graphs overlap better
@@ -97,14 +82,13 @@ def plot_results(pdm_output, sine_wave, time_axis, duration = DURATION, amplitud
 async def test_pdm_modulator(dut):
     """Test the PDM modulator with various inputs."""
 
-    # Create a 1 MHz clock (example clock frequency, adjust to match your module)
+    # 100 MHz clock, as on the board
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
 
+    # sample_in at OVERSAMPLE_RATE (5 MHz), rising on clk_in falling edges so the DUT sees each rise on the next rising edge
+    await FallingEdge(dut.clk_in)
+    cocotb.start_soon(Clock(dut.sample_in, 1e9 / OVERSAMPLE_RATE, units="ns").start())
 
-    # Start the clock divider coroutine
-    cocotb.start_soon(clock_divider(dut.clk_in, 20, dut.sample_in))
-
-    
 
     # Generate test data: a sine wave
     sine_wave = generate_sine_wave(AMPLITUDE, FREQUENCY, SAMPLE_RATE, DURATION)
@@ -116,20 +100,23 @@ async def test_pdm_modulator(dut):
     pdm_output = []  # Collect the PDM output for plotting
     time_axis = np.linspace(0, DURATION, int(total_samples))  # Time axis for plotting
 
-    # Reset the DUT
+    # Hold reset until the first sample_in edge, so the first tick the DUT processes is the first sample
     dut.rst_in.value = 1
-    await RisingEdge(dut.clk_in)  # Wait for 1 clock edge
-    await FallingEdge(dut.clk_in)
+    dut.audio_in.value = 0
+    await RisingEdge(dut.sample_in)
     dut.rst_in.value = 0
     # Feed the sine wave into the DUT
     for i, sample in enumerate(sine_wave):
         for _ in range(OVERSAMPLE_FACTOR):
             dut.audio_in.value = int(sample)
-            await RisingEdge(dut.sample_in)
+            # pdm_out updates on the clock edge after sample_in rises
+            await RisingEdge(dut.clk_in)
+            await ReadOnly()
 
             # Collect PDM output
             pdm_output.append(dut.pdm_out.value.integer)
             total_high += dut.pdm_out.value.integer
+            await RisingEdge(dut.sample_in)
 
         # Print progress for debugging
         if i % 10 == 0:
@@ -144,6 +131,13 @@ async def test_pdm_modulator(dut):
     except:
         print("couldn't plot")
 
+    # Check every bit against the model of the error-feedback loop
+    expected_pdm, _ = pdm_modulate(sine_wave, OVERSAMPLE_FACTOR)
+    mismatches = np.flatnonzero(np.array(pdm_output) != expected_pdm)
+    assert len(mismatches) == 0, (
+        f"{len(mismatches)} PDM bits differ from the model, first at tick {mismatches[0] if len(mismatches) else None}"
+    )
+
     # Check that the PDM density matches the input signal
     assert abs(pdm_density - expected_density) < 0.01, (
         f"PDM density {pdm_density} deviates from expected density {expected_density}"
@@ -151,34 +145,11 @@ async def test_pdm_modulator(dut):
     cocotb.log.info(f"PDM density test passed: {pdm_density:.4f}")
 
 
-def pdm_runner():
-    """Simulate the tdm receiver using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "pdm.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {'BIT_WIDTH': 24} #!!!change these to do different versions
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="pdm",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="pdm",
-        test_module="test_pdm",
-        test_args=run_test_args,
-        waves=True
-    )
-
+def pdm_runner(parameters=None, **options):
+    """Simulate the pdm modulator using the Python runner."""
+    sources = [HDL_PATH / "pdm.sv"]
+    parameters = {'BIT_WIDTH': 24, **(parameters or {})}
+    return run_testbench("pdm", "test_pdm", sources, parameters, **options)
 
 if __name__ == "__main__":
     pdm_runner()
\ No newline at end of file
@@ -1,17 +1,23 @@
 import serial
 import numpy as np
 import matplotlib.pyplot as plt
-import wave
 import librosa
 import librosa.display
 import soundfile as sf
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "sim"))
+from sim_beamforming import delay_and_sum_samples
+from wav_export import save_wave
 
 # note: we will need to change our BAUD rate to match the clock we run our UART transmission at.
 # we will also need to change SAMPLE_RATE to the correct value.
 # however, we will keep it consistent with the BAUD/sampling rate from the audio sampling lab for now.
 
 # Set up serial communication
-SERIAL_PORT_NAME = "/dev/ttyUSB1" #"/dev/cu.usbserial-88742923021D1"
+SERIAL_PORT_NAME = os.getenv("SERIAL_PORT", "/dev/ttyUSB1") #"/dev/cu.usbserial-88742923021D1"
 BAUD_RATE = 921600
 SAMPLE_RATE = 39062.5 # capturing samples at 8 kHz; will change
 AUDIO_LENGTH = 3 # set to record 6 seconds of audio
@@ -22,17 +28,15 @@ MODE = 0       # Mode 0 (normal sample rate and byte length)
 
 EFF_SAMPLE_RATE = SAMPLE_RATE if MODE == 0 else SAMPLE_RATE / 2
 
-ser = serial.Serial(SERIAL_PORT_NAME,BAUD_RATE)
-print("Serial port initialized")
+# Opened by open_serial() rather than at import, so the helpers here can be imported
+# (e.g. by async_capture sessions) without claiming a board's port
+ser = None
 
-def save_bytes_as_wave(filename, samples):
-    with wave.open(f'{filename}.wav', 'wb') as wf:
-        wf.setframerate(EFF_SAMPLE_RATE)
-        wf.setnchannels(1)
-        wf.setsampwidth(BYTES)
-        for sample in samples:
-            wf.writeframes(sample)
-        print(f"Recording saved to {filename}.wav")
+def open_serial(port_name=SERIAL_PORT_NAME):
+    global ser
+    ser = serial.Serial(port_name, BAUD_RATE)
+    print(f"Serial port {port_name} initialized")
+    return ser
 
 def collect_audio(mic_0_data, mic_1_data):
     """
@@ -52,9 +56,9 @@ def collect_audio(mic_0_data, mic_1_data):
         mic_0_data.append(val_mic_0)
         mic_1_data.append(val_mic_1)
 
-    save_bytes_as_wave('mic_0', mic_0_data)
+    save_wave('mic_0', np.frombuffer(b''.join(mic_0_data), dtype='<i2'), EFF_SAMPLE_RATE)
     if MODE == 1:
-        save_bytes_as_wave('mic_1', mic_1_data)
+        save_wave('mic_1', np.frombuffer(b''.join(mic_1_data), dtype='<i2'), EFF_SAMPLE_RATE)
 
 def beamforming_delay(angle, distance_between_microphones, num_microphones):
     """
@@ -91,31 +95,19 @@ def delay_and_sum(mic_signals, delays):
     - numpy array: The beamformed output signal.
     """
 
-    # Find the maximum length of the input signals
-    max_len = max((delays[i] * EFF_SAMPLE_RATE) + len(mic_signals[i]) for i in range(len(mic_signals)))
-
-    # Apply delays (in samples) and sum
-    output_signal = np.zeros(int(max_len))
-    delayed_outputs = [np.zeros(int(max_len)) for i in range(len(mic_signals))]
-    sample_idx = 0
-
-    for signal, delay in zip(mic_signals, delays):
+    # Calculate the number of samples to delay
+    delay_samples = [int(delay * EFF_SAMPLE_RATE) for delay in delays]
+    print(f"Number of delay samples: {delay_samples} for delays, {delays}, at {EFF_SAMPLE_RATE}")
 
-        # Calculate the number of samples to delay
-        delay_samples = int(delay * EFF_SAMPLE_RATE)  # Assuming 44.1 KHz sample rate
-        print(f"Number of delay samples: {delay_samples} for delay, {delay}, at {EFF_SAMPLE_RATE}")
-        signal_len = len(signal)
-
-        for i in range (delay_samples, delay_samples + signal_len):
-            delayed_outputs[sample_idx][i] = signal[i-delay_samples]
-            output_signal[i] += signal[i-delay_samples]
-
-        sample_idx += 1
+    # Apply delays (in samples) and sum with the vectorized engine
+    output_signal, delayed_outputs = delay_and_sum_samples(np.array(mic_signals), delay_samples, return_delayed=True)
 
     return output_signal / len(mic_signals), delayed_outputs
 
 # Example usage
 if __name__ == "__main__":
+    open_serial(sys.argv[1] if len(sys.argv) > 1 else SERIAL_PORT_NAME)
+
     # Load the audio signals from different microphones
 
     # Load audio signals from files or capture recording from the microphone array
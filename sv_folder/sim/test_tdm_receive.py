@@ -5,97 +5,63 @@ import sys
 from math import log
 import logging
 from pathlib import Path
+import numpy as np
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
-
-
-@cocotb.coroutine
-async def clock_divider(clock, divider, trigger_signal):
-    """
-    Clock divider coroutine.
-    """
-    count = 0
-    while True:
-        await RisingEdge(clock)  # Wait for a rising edge of the input clock
-        if count == divider-1:
-            count = 0
-            trigger_signal.value = 1 if trigger_signal.value == 0 else 0  # Toggle the tri
-        else:
-            #trigger_signal.value =  0
-            count+=1
-
-@cocotb.coroutine
-async def clock_divider_neg(clock, divider, trigger_signal):
-    """
-    Clock divider coroutine.
-    """
-    count = 0
-    while True:
-        await FallingEdge(clock)  # Wait for a rising edge of the input clock
-        if count == divider-1:
-            count = 0
-            trigger_signal.value =  1 #if trigger_signal.value == 0 else 0  # Toggle the tri
-        else:
-            trigger_signal.value = 0
-            count+=1
+from sim_runner import HDL_PATH, hdl_parameter, run_testbench
+from transactors import SCK_PERIOD_NS, TdmSource
 
+SAMPLE_PATTERN = [1,0,1,0,  0,0,1,0,  0,0,0,1,   1,0,0,0,   0,1,0,0,   1,1,0,0  ]
+SLOT_CYCLES = 32 # sck cycles per TDM slot (TOTAL_CYCLES + 1)
+STREAM_FRAMES = int(os.getenv("TDM_FRAMES", "200")) # frames test_stream sends (TDM_FRAMES=39063 is a second of audio)
 
+def slot_pattern(bit_width):
+    """The first bit_width bits of SAMPLE_PATTERN (repeated if needed) and the value they shift in as"""
+    bits = [SAMPLE_PATTERN[i % len(SAMPLE_PATTERN)] for i in range(bit_width)]
+    return bits, int(''.join(map(str, bits)), 2)
 
-@cocotb.test()
-async def test_single_microphone(dut):
-    """ Test if data from a single microphone is received correctly. """
-
-
-    dut._log.info("Starting...")
+async def setup_test(dut):
+    """Start clk_in and the TDM source, reset the DUT, and return the source"""
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    
-    await FallingEdge(dut.clk_in)
-    dut.sck_in.value = 0
-    dut.ws_in.value = 0
-    dut.active.value=0
-    await RisingEdge(dut.clk_in)
-
+    source = TdmSource(dut.sck_in, dut.ws_in, dut.sd_in, bit_width=hdl_parameter(dut, "BIT_WIDTH"),
+                       slot_cycles=SLOT_CYCLES).start()
     dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,2)
+    await ClockCycles(dut.clk_in, 2)
     dut.rst_in.value = 0
+    return source
 
-    # Start the clock divider coroutine
-    cocotb.start_soon(clock_divider(dut.clk_in, 50, dut.sck_in))
-
-    cocotb.start_soon(clock_divider_neg(dut.sck_in, 128, dut.ws_in))
-
-    
+async def receive_frame(dut, slots):
+    """Wait for audio_valid_out and return the slots samples tdm_receive latched"""
+    frame_ns = (slots * SLOT_CYCLES + 2) * SCK_PERIOD_NS
+    await with_timeout(RisingEdge(dut.audio_valid_out), 2 * frame_ns, 'ns')
+    await ReadOnly()
+    return [int(dut.audio_out[k].value) for k in range(slots)]
 
-    # Generate 24 bits of random data for a single microphone
-    sample_data = [1,0,1,0,  0,0,1,0,  0,0,0,1,   1,0,0,0,   0,1,0,0,   1,1,0,0  ]
-    expected_value = 0b101000100001100001001100 #int(''.join(map(str, sample_data)), 2)
 
+@cocotb.test()
+async def test_single_microphone(dut):
+    """ Test if data from a single microphone is received correctly. """
 
-    # Send the ws_in pulse
-    await RisingEdge(dut.ws_in)
-    
-    
-    # Send the sample data bit-by-bit on the rising edge of sck_in
-    for bit in sample_data:
-        await FallingEdge(dut.sck_in)
-        dut.sd_in.value= bit
-        await RisingEdge(dut.sck_in)
-    
 
+    dut._log.info("Starting...")
+    bit_width, slots = hdl_parameter(dut, "BIT_WIDTH"), hdl_parameter(dut, "SLOTS")
+    source = await setup_test(dut)
 
-    # Check if the received data matches the expected value
-    await RisingEdge(dut.sck_in)  # Allow time for `audio_valid` signal to propagate
-    #assert dut.audio_valid_out.value == 1, "audio_valid should be high after receiving 24 bits"
-    print(dut.audio_out.value[0].integer)
-    assert dut.audio_out.value[0].integer == expected_value, f"Expected {expected_value}, but got {dut.audio_out.value[0]}"
+    # Generate BIT_WIDTH bits of data for a single microphone
+    sample_data, expected_value = slot_pattern(bit_width)
+    source.send([expected_value] + [0] * (slots - 1))
 
+    # Wait for the ws_in pulse, its rising sck edge, then the sample bits on the following ones
+    await RisingEdge(dut.ws_in)
+    await ClockCycles(dut.sck_in, bit_width + 2)  # Allow time for the last bit to propagate
+    assert dut.audio_out[0].value.integer == expected_value, f"Expected {expected_value}, but got {dut.audio_out[0].value}"
 
-    for i in range(9):
-        await RisingEdge(dut.sck_in)
+    await ClockCycles(dut.sck_in, SLOT_CYCLES - bit_width + 1)
     assert dut.curr_slot.value == 1, "curr slot should now be 1"
-   
+
+    received = await receive_frame(dut, slots)
+    assert received == [expected_value] + [0] * (slots - 1), f"Expected only slot 0 to carry {expected_value}, got {received}"
 
 
 @cocotb.test()
@@ -103,65 +69,17 @@ async def test_four_microphones(dut):
     """ Test if data from four microphones is received correctly. """
 
 
-   
-    
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    
-    await FallingEdge(dut.clk_in)
-    dut.sck_in.value = 0
-    dut.ws_in.value = 0
-    dut.active.value=0
-    await RisingEdge(dut.clk_in)
-
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,2)
-    dut.rst_in.value = 0
-
-    # Start the clock divider coroutine
-    cocotb.start_soon(clock_divider(dut.clk_in, 50, dut.sck_in))
+    bit_width, slots = hdl_parameter(dut, "BIT_WIDTH"), hdl_parameter(dut, "SLOTS")
+    source = await setup_test(dut)
 
-    cocotb.start_soon(clock_divider_neg(dut.sck_in, 128, dut.ws_in))
-
-    
-
-    # Generate 24 bits of random data for a single microphone
-    sample_data = [1,0,1,0,  0,0,1,0,  0,0,0,1,   1,0,0,0,   0,1,0,0,   1,1,0,0  ]
-    expected_value = 0b101000100001100001001100 #int(''.join(map(str, sample_data)), 2)
-
-
-    # Send the ws_in pulse
-    await RisingEdge(dut.ws_in)
-
-
-    for i in range(4):
-        #assert dut.curr_slot.value == (i)%4, f"curr slot should now be {(i%4)}, but got {dut.curr_slot.value}"
-        # Send the sample data bit-by-bit on the rising edge of sck_in
-        for bit in sample_data:
-            await FallingEdge(dut.sck_in)
-            dut.sd_in.value= bit
-            await RisingEdge(dut.sck_in)
-
-        if i ==3:
-            # Check if the received data matches the expected value
-            await RisingEdge(dut.sck_in)  # Allow time for `audio_valid` signal to propagate
-            assert dut.audio_valid_out.value == 1, f"audio_valid should be high after receiving all mics, failed on {i} signal"
-
-            audio_out_list = dut.audio_out.value
-           
-            # Unpack the array (24 bits per element)
-            for k in range(4):
-                audio_sample = audio_out_list[k]
-                assert audio_sample == expected_value, f"Expected {expected_value}, but got {audio_sample}"
-        else:
-            await RisingEdge(dut.sck_in)  # Allow time for `audio_valid` signal to propagate
-        
-
-
-        for j in range(7):
-            await RisingEdge(dut.sck_in)
-    
+    # The same BIT_WIDTH bits of data in every slot
+    sample_data, expected_value = slot_pattern(bit_width)
+    source.send([expected_value] * slots)
 
+    received = await receive_frame(dut, slots)
+    for k in range(slots):
+        assert received[k] == expected_value, f"Expected {expected_value}, but got {received[k]} in slot {k}"
 
 
 @cocotb.test()
@@ -170,93 +88,48 @@ async def test_two_samples_four_microphones(dut):
 
 
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    
-    await FallingEdge(dut.clk_in)
-    dut.sck_in.value = 0
-    dut.ws_in.value = 0
-    dut.active.value=0
-    await RisingEdge(dut.clk_in)
-
-    # Start the clock divider coroutine
-    cocotb.start_soon(clock_divider(dut.clk_in, 50, dut.sck_in))
-
-    cocotb.start_soon(clock_divider_neg(dut.sck_in, 128, dut.ws_in))
-
-    
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,2)
-    dut.rst_in.value = 0
-
-    # Generate 24 bits of random data for a single microphone
-    sample_data = [1,0,1,0,  0,0,1,0,  0,0,0,1,   1,0,0,0,   0,1,0,0,   1,1,0,0  ]
-    expected_value = 0b101000100001100001001100 #int(''.join(map(str, sample_data)), 2)
+    bit_width, slots = hdl_parameter(dut, "BIT_WIDTH"), hdl_parameter(dut, "SLOTS")
+    source = await setup_test(dut)
 
+    # Two frames back to back, a different sample in every slot
+    sample_data, expected_value = slot_pattern(bit_width)
+    mask = (1 << bit_width) - 1
+    frames = [[(expected_value + 1000 * k + 7 * n) & mask for k in range(slots)] for n in range(2)]
+    source.send(np.array(frames).T)
 
-    
+    for n in range(2):
+        received = await receive_frame(dut, slots)
+        assert received == frames[n], f"Frame {n}: expected {frames[n]}, but got {received}"
 
 
-    for _ in range(2):
-        # Send the ws_in pulse
-        await RisingEdge(dut.ws_in)
-        
+@cocotb.test()
+async def test_stream(dut):
+    """ Stream STREAM_FRAMES frames of random samples back to back and check every frame tdm_receive latches. """
 
 
-        for i in range(4):
-            #assert dut.curr_slot.value == (i)%4, f"curr slot should now be {(i%4)}, but got {dut.curr_slot.value}"
-            # Send the sample data bit-by-bit on the rising edge of sck_in
-            for bit in sample_data:
-                await FallingEdge(dut.sck_in)
-                dut.sd_in.value= bit
-                await RisingEdge(dut.sck_in)
+    dut._log.info("Starting...")
+    bit_width, slots = hdl_parameter(dut, "BIT_WIDTH"), hdl_parameter(dut, "SLOTS")
+    source = await setup_test(dut)
 
-            if i == 3:
-                # Check if the received data matches the expected value
-                await RisingEdge(dut.sck_in)  # Allow time for `audio_valid` signal to propagate
-                assert dut.audio_valid_out.value == 1, f"audio_valid should be high after receiving all mics, failed on {i} signal"
-                audio_out_list = dut.audio_out.value
-           
-                # Unpack the array (24 bits per element)
-                for k in range(4):
-                    audio_sample = audio_out_list[k]
-                    assert audio_sample == expected_value, f"Expected {expected_value}, but got {audio_sample}"
-            else:
-                await RisingEdge(dut.sck_in)  # Allow time for `audio_valid` signal to propagate
-            for j in range(7):
-                await RisingEdge(dut.sck_in)
-   
+    rng = np.random.default_rng(random.getrandbits(32))
+    samples = rng.integers(0, 1 << bit_width, size=(slots, STREAM_FRAMES), dtype=np.int64)
+    source.send(samples)
 
+    for n in range(STREAM_FRAMES):
+        received = await receive_frame(dut, slots)
+        assert received == samples[:, n].tolist(), f"Frame {n}: expected {samples[:, n].tolist()}, but got {received}"
+    await source.wait_idle()
+    assert source.frames_sent == STREAM_FRAMES
 
 
+# Parameter sets run_regression.py runs this testbench with
+PARAMETER_MATRIX = {'BIT_WIDTH': [16, 24], 'SLOTS': [2, 4, 8]}
 
-def tdm_receive_runner():
+def tdm_receive_runner(parameters=None, **options):
     """Simulate the tdm receiver using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "tdm_receive.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {'BIT_WIDTH': 24, 'SLOTS':4} #!!!change these to do different versions
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="tdm_receive",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="tdm_receive",
-        test_module="test_tdm_receive",
-        test_args=run_test_args,
-        waves=True
-    )
-
+    sources = [HDL_PATH / "tdm_receive.sv"]
+    parameters = {'BIT_WIDTH': 24, 'SLOTS': 4, **(parameters or {})}
+    return run_testbench("tdm_receive", "test_tdm_receive", sources, parameters, **options)
 
 if __name__ == "__main__":
     tdm_receive_runner()
\ No newline at end of file
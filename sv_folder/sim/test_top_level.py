@@ -0,0 +1,45 @@
+import cocotb
+import random
+import sys
+from pathlib import Path
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.triggers import Timer, ClockCycles
+from sim_runner import HDL_PATH, run_testbench
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from datapath_model import LUT_PATH, angle_delay_lut
+
+@cocotb.test()
+async def test_angle_delays(dut):
+    # sw picks the angle code; top_level's angle_delay_lut should hand delay_bram the generated table's delays
+    cocotb.start_soon(Clock(dut.clk_100mhz, 10, units="ns").start())
+    dut.btn.value = 1
+    dut.uart_rxd.value = 1
+    await ClockCycles(dut.clk_100mhz, 3)
+    dut.btn.value = 0
+
+    with np.load(LUT_PATH) as lut:
+        num_angles, angle_bits = len(lut['angles']), int(lut['angle_bits'])
+    angles = list(range(num_angles)) + [random.randint(num_angles, (1 << angle_bits) - 1) for _ in range(3)]
+    expected_delays = angle_delay_lut(np.array(angles))
+
+    for angle, expected in zip(angles, expected_delays):
+        dut.sw.value = angle
+        await Timer(1, units="ns")
+
+        computed = [int(dut.delay_sum_shift.delay_1.value), int(dut.delay_sum_shift.delay_2.value),
+                    int(dut.delay_sum_shift.delay_3.value), int(dut.delay_sum_shift.delay_4.value)]
+        assert computed == list(expected), f"Test failed for angle={angle}: expected {list(expected)}, got {computed}"
+
+
+def top_level_runner(parameters=None, **options):
+    """Simulate top_level using the Python runner."""
+    sources = [HDL_PATH / name for name in (
+        "top_level.sv", "counter_neg.sv", "tdm_receive.sv", "ang_to_ascii.sv", "angle_delay_lut.sv",
+        "seven_segment_controller.sv", "bto7s.sv", "delay_bram.sv", "evt_counter.sv",
+        "xilinx_true_dual_port_read_first_2_clock_ram.v", "uart_byte_transmit.sv", "uart_transmit.sv", "pdm.sv")]
+    return run_testbench("top_level", "test_top_level", sources, parameters, **options)
+
+if __name__ == "__main__":
+    top_level_runner()
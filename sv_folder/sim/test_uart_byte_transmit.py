@@ -8,7 +8,14 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, hdl_parameter, run_testbench
+from transactors import UartSink
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from datapath_model import uart_frame_bytes
+
+NUM_BYTES = 3
+BIT_PERIOD_NS = 20 # 50 MBaud from a 100 MHz clock
 
 async def send_transmission(dut, msg):
     """Helper function to send a msg over uart"""
@@ -32,48 +39,38 @@ async def send_transmission(dut, msg):
 # does correct transmission occur lsb first 
 @cocotb.test()
 async def test_transmission(dut):
-    """Test that the data line remains high when not transmitting data"""
+    """Test that each frame goes out 7 bits at a time, lsb first, with only the last byte's alignment bit set"""
     dut._log.info("Starting test_transmission")
     # Start a 100 Mhz Clk
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start()) 
 
+    dut.trigger_in.value = 0
     dut.rst_in.value = 1
     await ClockCycles(dut.clk_in, 1)
     dut.rst_in.value = 0
 
-    await send_transmission(dut, 0xdeadbe)
+    num_bytes = hdl_parameter(dut, "NUM_BYTES")
+    sink = UartSink(dut.tx_wire_out, BIT_PERIOD_NS).start()
+    messages = [0xdeadbe & ((1 << (7 * num_bytes)) - 1)] + [random.getrandbits(7 * num_bytes) for _ in range(5)]
+    for msg in messages:
+        await send_transmission(dut, msg)
+        received = await with_timeout(sink.recv(), 700 * num_bytes, 'ns')
+        expected = [int(byte) for byte in uart_frame_bytes([msg], num_bytes)]
+        assert received == expected, f"sent {msg:#x}: got bytes {received}, expected {expected}"
+        assert UartSink.payload(received) == msg
+        await FallingEdge(dut.busy_out)
 
     await ClockCycles(dut.clk_in, 100)
    
 
-def uart_byte_transmit_runner():
+# Parameter sets run_regression.py runs this testbench with
+PARAMETER_MATRIX = {'NUM_BYTES': [1, 2, 3, 9]}
+
+def uart_byte_transmit_runner(parameters=None, **options):
     """Simulate the uart transmit module using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "uart_byte_transmit.sv"]
-    sources += [proj_path / "hdl" / "uart_transmit.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {'INPUT_CLOCK_FREQ': 100_000_000, 'BAUD_RATE': 50_000_000, 'NUM_BYTES': 3} # Baud rate corresponds to 2 clk cycles per bit
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="uart_byte_transmit",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="uart_byte_transmit",
-        test_module="test_uart_byte_transmit",
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [HDL_PATH / "uart_byte_transmit.sv", HDL_PATH / "uart_transmit.sv"]
+    parameters = {'INPUT_CLOCK_FREQ': 100_000_000, 'BAUD_RATE': 50_000_000, 'NUM_BYTES': NUM_BYTES, **(parameters or {})} # Baud rate corresponds to 2 clk cycles per bit
+    return run_testbench("uart_byte_transmit", "test_uart_byte_transmit", sources, parameters, **options)
 
 if __name__ == "__main__":
     uart_byte_transmit_runner()
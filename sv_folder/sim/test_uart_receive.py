@@ -8,7 +8,7 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, run_testbench
 
 
 
@@ -87,33 +87,11 @@ async def test_a(dut):
     
 
 
-def uart_receive_runner():
+def uart_receive_runner(parameters=None, **options):
     """Simulate the uart receiver using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "uart_receive.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {'INPUT_CLOCK_FREQ': 10, 'BAUD_RATE':1} #!!!change these to do different versions
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="uart_receive",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="uart_receive",
-        test_module="test_uart_receive",
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [HDL_PATH / "uart_receive.sv"]
+    parameters = {'INPUT_CLOCK_FREQ': 10, 'BAUD_RATE': 1, **(parameters or {})}
+    return run_testbench("uart_receive", "test_uart_receive", sources, parameters, **options)
 
 if __name__ == "__main__":
     uart_receive_runner()
\ No newline at end of file
@@ -8,7 +8,7 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from sim_runner import HDL_PATH, run_testbench
 
 
 @cocotb.test()
@@ -29,10 +29,10 @@ async def test_a(dut):
     await  FallingEdge(dut.clk_in)
 
     # check values are reset properly and tx is high
-    assert dut.bit_counter.value ==0
-    assert dut.cycle_counter.value ==0
+    assert dut.uart_bit_count.value ==0
+    assert dut.uart_rate_count.value ==0
     assert dut.busy_out.value ==0
-    assert dut.tx_wire_out == 1
+    assert dut.tx_wire_out.value == 1
 
 
     dut._log.info("Setting Trigger")
@@ -91,33 +91,11 @@ async def test_a(dut):
     
 
 
-def uart_transmit_runner():
+def uart_transmit_runner(parameters=None, **options):
     """Simulate the uart transmit using the Python runner."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "uart_transmit.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {'INPUT_CLOCK_FREQ': 10, 'BAUD_RATE':1} #!!!change these to do different versions
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="uart_transmit",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="uart_transmit",
-        test_module="test_uart_transmit",
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [HDL_PATH / "uart_transmit.sv"]
+    parameters = {'INPUT_CLOCK_FREQ': 10, 'BAUD_RATE': 1, **(parameters or {})}
+    return run_testbench("uart_transmit", "test_uart_transmit", sources, parameters, **options)
 
 if __name__ == "__main__":
     uart_transmit_runner()
\ No newline at end of file
@@ -0,0 +1,223 @@
+import sys
+from pathlib import Path
+
+import cocotb
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.queue import Queue
+from cocotb.triggers import Edge, Event, FallingEdge, First, RisingEdge, Timer
+from cocotb.utils import get_sim_steps, get_sim_time
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from datapath_model import ALIGNMENT_BIT, BIT_WIDTH, PAYLOAD_BITS, SLOT_CYCLES, tdm_pack
+
+SCK_PERIOD_NS = 200 # 5 MHz, 128 sck cycles per 39062.5 Hz frame as on the board
+UART_DATA_BITS = 8
+
+# Frame-level drivers and monitors for the testbenches. Each one wakes Python only when
+# a line changes (or once per transaction), instead of on every clock edge, so long
+# stimulus stays cheap; the clocks themselves come from cocotb's Clock.
+
+async def sample_line(signal, sample_times):
+    """
+    Reads a signal's level at future simulation times, waking only on its edges.
+
+    Parameters:
+    - signal: cocotb handle of a 1-bit signal.
+    - sample_times (numpy array): increasing simulation times to sample at, in sim steps (all in the future).
+
+    Returns:
+    - numpy array: the signal's level at each sample time (uint8).
+    """
+    times, levels = [get_sim_time("step")], [int(signal.value)]
+    end = int(sample_times[-1])
+    while True:
+        remaining = end - get_sim_time("step")
+        if remaining <= 0:
+            break
+        timer = Timer(remaining, "step")
+        if await First(Edge(signal), timer) is timer:
+            break
+        times.append(get_sim_time("step"))
+        levels.append(int(signal.value))
+    return np.array(levels, dtype=np.uint8)[np.searchsorted(times, sample_times, side="right") - 1]
+
+class TdmSource:
+    """
+    Drives a TDM microphone bus (sck, ws, sd) from whole frames of samples.
+
+    sck runs from a cocotb Clock. send() serializes frames with datapath_model.tdm_pack,
+    and the driver then only wakes up when ws or sd change, holding each level for a
+    Timer. Frames queued back to back go out back to back, each frame's ws edge
+    taking the last padding edge of the one before it; otherwise the bus idles low.
+    """
+
+    def __init__(self, sck, ws, sd, sck_period_ns=SCK_PERIOD_NS, bit_width=BIT_WIDTH, slot_cycles=SLOT_CYCLES):
+        """
+        Parameters:
+        - sck, ws, sd: cocotb handles of the bus signals (all driven).
+        - sck_period_ns (float): sck period, in ns.
+        - bit_width (int): bits per sample.
+        - slot_cycles (int): sck cycles per slot.
+        """
+        self.sck, self.ws, self.sd = sck, ws, sd
+        self.sck_period_ns = sck_period_ns
+        self.bit_width = bit_width
+        self.slot_cycles = slot_cycles
+        self.frames_sent = 0
+        self.queue = Queue()
+        self.idle = Event()
+        self.idle.set()
+
+    def start(self):
+        """Starts sck and the driver (with ws and sd low); returns self"""
+        self.ws.value = 0
+        self.sd.value = 0
+        cocotb.start_soon(Clock(self.sck, self.sck_period_ns, units="ns").start(start_high=False))
+        cocotb.start_soon(self._drive())
+        return self
+
+    def send(self, samples):
+        """
+        Queues frames to send.
+
+        Parameters:
+        - samples (numpy array): (slots, num_frames) samples, or one frame of slots samples
+          (only the low bit_width bits are sent).
+        """
+        samples = np.asarray(samples, dtype=np.int64)
+        self.queue.put_nowait(samples.reshape(-1, 1) if samples.ndim == 1 else samples)
+        self.idle.clear()
+
+    async def wait_idle(self):
+        """Waits until every queued frame has been sent"""
+        await self.idle.wait()
+
+    async def _drive(self):
+        period = get_sim_steps(self.sck_period_ns, "ns")
+        aligned = False
+        while True:
+            samples = await self.queue.get()
+            if not aligned:
+                # Levels for rising edge n are set on the falling edge before it
+                await FallingEdge(self.sck)
+            # Drop tdm_pack's extra padding edge: the next frame's ws edge (or idle) takes it
+            ws, sd = (bits[:-1] for bits in tdm_pack(samples, self.bit_width, self.slot_cycles))
+            changes = np.flatnonzero((ws[1:] != ws[:-1]) | (sd[1:] != sd[:-1])) + 1
+            starts = np.concatenate(([0], changes))
+            ends = np.append(changes, len(sd))
+            for start, end in zip(starts, ends):
+                self.ws.value = int(ws[start])
+                self.sd.value = int(sd[start])
+                await Timer(int(end - start) * period, "step")
+            self.ws.value = 0
+            self.sd.value = 0
+            self.frames_sent += samples.shape[1]
+            aligned = not self.queue.empty()
+            if not aligned:
+                self.idle.set()
+
+class UartSink:
+    """
+    Collects the frames a UART transmitter (uart_transmit / uart_byte_transmit) sends on an 8N1 line.
+
+    Each byte is decoded from the times of the line's edges, so the monitor wakes only
+    a few times per byte. A frame ends at the byte with ALIGNMENT_BIT set, as the host
+    decoders (sim/uart_decode.py) find them; with frames=False every byte is its own
+    frame, for plain byte streams.
+    """
+
+    def __init__(self, tx, bit_period_ns, frames=True):
+        """
+        Parameters:
+        - tx: cocotb handle of the transmit line.
+        - bit_period_ns (float): UART bit period, in ns (1e9 / baud rate).
+        - frames (bool): group bytes into frames by their alignment bit.
+        """
+        self.tx = tx
+        self.bit_period = get_sim_steps(bit_period_ns, "ns")
+        self.frames = frames
+        self.bytes = []
+        self.queue = Queue()
+        self._frame = []
+
+    def start(self):
+        """Starts the monitor; returns self"""
+        cocotb.start_soon(self._monitor())
+        return self
+
+    async def recv(self):
+        """
+        Waits for the next frame.
+
+        Returns:
+        - list of int: the frame's bytes.
+        """
+        return await self.queue.get()
+
+    @staticmethod
+    def payload(frame):
+        """The field a frame carries: PAYLOAD_BITS per byte, first byte lowest, as uart_byte_transmit splits it"""
+        return sum((byte & 0x7F) << (PAYLOAD_BITS * i) for i, byte in enumerate(frame))
+
+    async def _monitor(self):
+        while True:
+            await FallingEdge(self.tx)
+            start = get_sim_time("step")
+            # The middle of each data bit, then of the stop bit
+            sample_times = start + ((np.arange(UART_DATA_BITS + 1) + 1.5) * self.bit_period).astype(np.int64)
+            levels = await sample_line(self.tx, sample_times)
+            assert levels[-1] == 1, f"UART framing error: no stop bit at {get_sim_time('ns')} ns"
+            byte = int(levels[:-1] @ (1 << np.arange(UART_DATA_BITS)))
+            self.bytes.append(byte)
+            self._frame.append(byte)
+            if not self.frames or byte & ALIGNMENT_BIT:
+                self.queue.put_nowait(self._frame)
+                self._frame = []
+
+class I2sSink:
+    """
+    Collects the samples i2s_audio_out shifts out on sd, one per sample_valid pulse.
+
+    The load is taken from sample_valid at the next rising sck edge; the bit_width
+    bits that follow (MSB first, one per sck cycle) are read in the middle of each
+    cycle from sd's edges.
+    """
+
+    def __init__(self, sck, sd, sample_valid, sck_period_ns, bit_width=BIT_WIDTH):
+        """
+        Parameters:
+        - sck, sd, sample_valid: cocotb handles of the serial clock, serial data and load strobe.
+        - sck_period_ns (float): sck period, in ns.
+        - bit_width (int): bits per sample.
+        """
+        self.sck, self.sd, self.sample_valid = sck, sd, sample_valid
+        self.sck_period = get_sim_steps(sck_period_ns, "ns")
+        self.bit_width = bit_width
+        self.samples = []
+        self.queue = Queue()
+
+    def start(self):
+        """Starts the monitor; returns self"""
+        cocotb.start_soon(self._monitor())
+        return self
+
+    async def recv(self):
+        """
+        Waits for the next sample.
+
+        Returns:
+        - int: the sample's bit_width bits, as an unsigned value.
+        """
+        return await self.queue.get()
+
+    async def _monitor(self):
+        while True:
+            await RisingEdge(self.sample_valid)
+            await RisingEdge(self.sck)
+            start = get_sim_time("step")
+            sample_times = start + ((np.arange(self.bit_width) + 0.5) * self.sck_period).astype(np.int64)
+            bits = await sample_line(self.sd, sample_times)
+            sample = int(bits.astype(np.int64) @ (1 << np.arange(self.bit_width - 1, -1, -1, dtype=np.int64)))
+            self.samples.append(sample)
+            self.queue.put_nowait(sample)